@@ -4,6 +4,7 @@ from .models import (
     User, Supply, SupplyCategory, SupplyRequest, 
     QRScanLog, InventoryTransaction
 )
+from .table_versions import bump_table_versions
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -20,11 +21,13 @@ class UserAdmin(BaseUserAdmin):
     
     def approve_users(self, request, queryset):
         updated = queryset.update(approval_status='approved')
+        bump_table_versions(User)
         self.message_user(request, f'{updated} users were successfully approved.')
     approve_users.short_description = "Approve selected users"
     
     def reject_users(self, request, queryset):
         updated = queryset.update(approval_status='rejected')
+        bump_table_versions(User)
         self.message_user(request, f'{updated} users were successfully rejected.')
     reject_users.short_description = "Reject selected users"
 
@@ -9,18 +9,19 @@ from django.db.models import Q, Count, Sum, F, Value
 from django.db.models.functions import TruncDate, TruncWeek, TruncMonth, TruncYear
 from django.utils import timezone
 from datetime import timedelta, datetime
-import csv
 import json
+from itertools import chain
 from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
 from reportlab.lib import colors
 
 from .models import (
     User, Supply, SupplyRequest, BorrowedItem,
-    RequestorBorrowerAnalytics, UserActivityLog, MostRequestedItem
+    RequestorBorrowerAnalytics, UserActivityLog, MostRequestedItem,
+    UserDailyActivity, SupplyDailyActivity
 )
+from .exports import EXPORT_CHUNK_SIZE, csv_stream, ndjson_stream, streaming_response
+from .pdf_reports import PDFReport
+from .rollups import activity_totals, request_counts
 
 
 @login_required
@@ -123,12 +124,20 @@ def user_analytics_detail(request, user_id):
         activity_logs = activity_logs.filter(timestamp__gte=start, timestamp__lte=end)
     activity_logs = activity_logs.order_by('-timestamp')
     
-    # Statistics
-    total_requests = requests.count()
-    approved_requests = requests.filter(status='approved').count()
-    released_requests = requests.filter(status='released').count()
-    rejected_requests = requests.filter(status='rejected').count()
-    pending_requests = requests.filter(status='pending').count()
+    # Statistics, summed from the daily rollups; a search only narrows the
+    # requests, so their counts then come from the matching requests
+    totals = activity_totals(
+        UserDailyActivity,
+        (timezone.localdate(start), timezone.localdate(end)) if start and end else None,
+        user=user,
+    )
+    if search:
+        totals.update(request_counts(requests))
+    total_requests = totals['requests']
+    approved_requests = totals['approved_requests']
+    released_requests = totals['released_requests']
+    rejected_requests = totals['rejected_requests']
+    pending_requests = totals['pending_requests']
     
     # Calculate approval rate
     if total_requests > 0:
@@ -136,9 +145,9 @@ def user_analytics_detail(request, user_id):
     else:
         approval_rate = 0
     
-    total_borrowed = borrowed_items.count()
-    returned_items = borrowed_items.filter(returned_at__isnull=False).count()
-    unreturned_items = borrowed_items.filter(returned_at__isnull=True).count()
+    total_borrowed = totals['borrows']
+    returned_items = totals['returns']
+    unreturned_items = total_borrowed - returned_items
     overdue_items = borrowed_items.filter(
         returned_at__isnull=True,
         return_deadline__lt=timezone.now().date()
@@ -196,11 +205,12 @@ def user_analytics_modal(request, user_id):
     borrowed_items = BorrowedItem.objects.filter(borrower=user).order_by('-borrowed_at')
     
     # Statistics
-    total_requests = requests.count()
-    approved_requests = requests.filter(status='approved').count()
-    released_requests = requests.filter(status='released').count()
-    rejected_requests = requests.filter(status='rejected').count()
-    pending_requests = requests.filter(status='pending').count()
+    totals = activity_totals(UserDailyActivity, user=user)
+    total_requests = totals['requests']
+    approved_requests = totals['approved_requests']
+    released_requests = totals['released_requests']
+    rejected_requests = totals['rejected_requests']
+    pending_requests = totals['pending_requests']
     
     # Calculate approval rate
     if total_requests > 0:
@@ -208,9 +218,9 @@ def user_analytics_modal(request, user_id):
     else:
         approval_rate = 0
     
-    total_borrowed = borrowed_items.count()
-    returned_items = borrowed_items.filter(returned_at__isnull=False).count()
-    unreturned_items = borrowed_items.filter(returned_at__isnull=True).count()
+    total_borrowed = totals['borrows']
+    returned_items = totals['returns']
+    unreturned_items = total_borrowed - returned_items
     overdue_items = borrowed_items.filter(
         returned_at__isnull=True,
         return_deadline__lt=timezone.now().date()
@@ -285,34 +295,22 @@ def most_requested_items(request):
         start = None
         end = None
     
-    # Get most requested items
-    requested_items = SupplyRequest.objects.filter(status__in=['approved', 'released'])
+    # Per-supply totals, summed from the daily rollups
+    activity = SupplyDailyActivity.objects.all()
     if start and end:
-        requested_items = requested_items.filter(created_at__gte=start, created_at__lte=end)
-    
-    request_stats = requested_items.values('supply').annotate(
-        request_count=Count('supply'),
+        activity = activity.filter(day__gte=timezone.localdate(start), day__lte=timezone.localdate(end))
+    supply_stats = activity.values('supply').annotate(
+        request_count=Sum(F('approved_requests') + F('released_requests')),
+        total_quantity_requested=Sum('approved_quantity'),
+        borrow_count=Sum('borrows'),
+        total_quantity_borrowed=Sum('quantity_borrowed'),
         supply_name=F('supply__name'),
         supply_category=F('supply__category__name'),
         supply_quantity=F('supply__quantity'),
-        total_quantity_requested=Sum('quantity_requested')
-    ).order_by('-request_count')
-    
-    # Get most borrowed items
-    borrowed_items_qs = BorrowedItem.objects.all()
-    if start and end:
-        borrowed_items_qs = borrowed_items_qs.filter(borrowed_at__gte=start, borrowed_at__lte=end)
-    
-    borrow_stats = borrowed_items_qs.values('supply').annotate(
-        borrow_count=Count('supply'),
-        supply_name=F('supply__name'),
-        supply_category=F('supply__category__name'),
-        total_quantity_borrowed=Sum('borrowed_quantity')
-    ).order_by('-borrow_count')
+    ).filter(Q(request_count__gt=0) | Q(borrow_count__gt=0)).order_by()
     
-    # Combine stats
     all_supplies = {}
-    for item in request_stats:
+    for item in supply_stats:
         supply_id = item['supply']
         all_supplies[supply_id] = {
             'supply_id': supply_id,
@@ -321,27 +319,10 @@ def most_requested_items(request):
             'current_quantity': item['supply_quantity'],
             'request_count': item['request_count'],
             'total_quantity_requested': item['total_quantity_requested'] or 0,
-            'borrow_count': 0,
-            'total_quantity_borrowed': 0,
+            'borrow_count': item['borrow_count'],
+            'total_quantity_borrowed': item['total_quantity_borrowed'] or 0,
         }
     
-    for item in borrow_stats:
-        supply_id = item['supply']
-        if supply_id in all_supplies:
-            all_supplies[supply_id]['borrow_count'] = item['borrow_count']
-            all_supplies[supply_id]['total_quantity_borrowed'] = item['total_quantity_borrowed'] or 0
-        else:
-            all_supplies[supply_id] = {
-                'supply_id': supply_id,
-                'name': item['supply_name'],
-                'category': item['supply_category'],
-                'current_quantity': 0,
-                'request_count': 0,
-                'total_quantity_requested': 0,
-                'borrow_count': item['borrow_count'],
-                'total_quantity_borrowed': item['total_quantity_borrowed'] or 0,
-            }
-    
     # Sort by total activity
     sorted_supplies = sorted(
         all_supplies.values(),
@@ -380,7 +361,7 @@ def export_user_analytics(request, user_id):
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     
     user = get_object_or_404(User, pk=user_id, role='department_user')
-    format_type = request.GET.get('format', 'csv')  # csv or pdf
+    format_type = request.GET.get('format', 'csv')  # csv, ndjson or pdf
     
     # Get filters from request
     date_filter = request.GET.get('date_filter', 'all')
@@ -424,138 +405,152 @@ def export_user_analytics(request, user_id):
         requests = requests.filter(created_at__gte=start, created_at__lte=end)
         borrowed_items = borrowed_items.filter(borrowed_at__gte=start, borrowed_at__lte=end)
     
-    if format_type == 'csv':
-        return export_analytics_csv(user, requests, borrowed_items, date_filter)
+    if format_type in ('csv', 'ndjson'):
+        return export_analytics_csv(request, user, requests, borrowed_items, date_filter, fmt=format_type)
     else:
         return export_analytics_pdf(user, requests, borrowed_items, date_filter)
 
 
-def export_analytics_csv(user, requests, borrowed_items, date_filter):
-    """Export analytics as CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="analytics_{user.username}_{date_filter}.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Requests section
-    writer.writerow(['SUPPLY REQUESTS'])
-    writer.writerow(['Request ID', 'Supply', 'Quantity', 'Status', 'Purpose', 'Created Date'])
-    
-    for req in requests.order_by('-created_at'):
-        writer.writerow([
-            req.request_id,
-            req.supply.name,
-            req.quantity_requested,
-            req.get_status_display(),
-            req.purpose[:50],
-            req.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    writer.writerow([])
-    
-    # Borrowed items section
-    writer.writerow(['BORROWED ITEMS'])
-    writer.writerow(['Supply', 'Quantity', 'Borrowed Date', 'Return Deadline', 'Status', 'Returned Date'])
-    
-    for item in borrowed_items.order_by('-borrowed_at'):
-        status = 'Returned' if item.is_returned else ('Overdue' if item.is_overdue else 'Active')
-        writer.writerow([
-            item.supply.name,
-            item.borrowed_quantity,
-            item.borrowed_date.strftime('%Y-%m-%d'),
-            item.return_deadline.strftime('%Y-%m-%d') if item.return_deadline else 'N/A',
-            status,
-            item.returned_at.strftime('%Y-%m-%d') if item.returned_at else 'N/A'
-        ])
-    
-    writer.writerow([])
-    
-    # Summary stats
-    writer.writerow(['SUMMARY'])
-    writer.writerow(['Metric', 'Count'])
-    writer.writerow(['Total Requests', requests.count()])
-    writer.writerow(['Approved', requests.filter(status='approved').count()])
-    writer.writerow(['Released', requests.filter(status='released').count()])
-    writer.writerow(['Rejected', requests.filter(status='rejected').count()])
-    writer.writerow(['Pending', requests.filter(status='pending').count()])
-    writer.writerow(['Total Borrowed Items', borrowed_items.count()])
-    writer.writerow(['Returned Items', borrowed_items.filter(returned_at__isnull=False).count()])
-    writer.writerow(['Unreturned Items', borrowed_items.filter(returned_at__isnull=True).count()])
-    writer.writerow(['Overdue Items', borrowed_items.filter(returned_at__isnull=True, return_deadline__lt=timezone.now().date()).count()])
-    
-    return response
+def export_analytics_csv(request, user, requests, borrowed_items, date_filter, fmt='csv'):
+    """
+    Export analytics as streamed CSV (sectioned) or NDJSON (one record per
+    row, tagged with its section), optionally gzipped
+    """
+    status_labels = dict(SupplyRequest.STATUS_CHOICES)
+    today = timezone.now().date()
+
+    request_rows = requests.order_by('-created_at').values_list(
+        'request_id', 'supply__name', 'quantity_requested', 'status', 'purpose', 'created_at'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    borrowed_rows = borrowed_items.order_by('-borrowed_at').values_list(
+        'supply__name', 'borrowed_quantity', 'borrowed_date', 'return_deadline', 'returned_at'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    def iter_requests():
+        for request_id, supply_name, quantity, status, purpose, created_at in request_rows:
+            yield [
+                request_id,
+                supply_name,
+                quantity,
+                status_labels.get(status, status),
+                purpose[:50],
+                created_at.strftime('%Y-%m-%d %H:%M:%S')
+            ]
+
+    def iter_borrowed():
+        for supply_name, quantity, borrowed_date, return_deadline, returned_at in borrowed_rows:
+            if returned_at:
+                status = 'Returned'
+            elif return_deadline and today > return_deadline:
+                status = 'Overdue'
+            else:
+                status = 'Active'
+            yield [
+                supply_name,
+                quantity,
+                borrowed_date.strftime('%Y-%m-%d'),
+                return_deadline.strftime('%Y-%m-%d') if return_deadline else 'N/A',
+                status,
+                returned_at.strftime('%Y-%m-%d') if returned_at else 'N/A'
+            ]
+
+    def iter_summary():
+        # One aggregate per table instead of a count query per metric
+        request_counts = requests.aggregate(
+            total=Count('id'),
+            approved=Count('id', filter=Q(status='approved')),
+            released=Count('id', filter=Q(status='released')),
+            rejected=Count('id', filter=Q(status='rejected')),
+            pending=Count('id', filter=Q(status='pending')),
+        )
+        borrowed_counts = borrowed_items.aggregate(
+            total=Count('id'),
+            returned=Count('id', filter=Q(returned_at__isnull=False)),
+            unreturned=Count('id', filter=Q(returned_at__isnull=True)),
+            overdue=Count('id', filter=Q(returned_at__isnull=True, return_deadline__lt=today)),
+        )
+        yield ['Total Requests', request_counts['total']]
+        yield ['Approved', request_counts['approved']]
+        yield ['Released', request_counts['released']]
+        yield ['Rejected', request_counts['rejected']]
+        yield ['Pending', request_counts['pending']]
+        yield ['Total Borrowed Items', borrowed_counts['total']]
+        yield ['Returned Items', borrowed_counts['returned']]
+        yield ['Unreturned Items', borrowed_counts['unreturned']]
+        yield ['Overdue Items', borrowed_counts['overdue']]
+
+    if fmt == 'ndjson':
+        request_keys = ['request_id', 'supply', 'quantity', 'status', 'purpose', 'created_at']
+        borrowed_keys = ['supply', 'quantity', 'borrowed_date', 'return_deadline', 'status', 'returned_date']
+        records = chain(
+            ({'section': 'request', **dict(zip(request_keys, row))} for row in iter_requests()),
+            ({'section': 'borrowed_item', **dict(zip(borrowed_keys, row))} for row in iter_borrowed()),
+            ({'section': 'summary', 'metric': metric, 'count': count} for metric, count in iter_summary()),
+        )
+        chunks = ndjson_stream(records)
+    else:
+        chunks = csv_stream(chain(
+            [['SUPPLY REQUESTS'], ['Request ID', 'Supply', 'Quantity', 'Status', 'Purpose', 'Created Date']],
+            iter_requests(),
+            [[], ['BORROWED ITEMS'], ['Supply', 'Quantity', 'Borrowed Date', 'Return Deadline', 'Status', 'Returned Date']],
+            iter_borrowed(),
+            [[], ['SUMMARY'], ['Metric', 'Count']],
+            iter_summary(),
+        ))
+
+    return streaming_response(request, f'analytics_{user.username}_{date_filter}', fmt, chunks)
 
 
 def export_analytics_pdf(user, requests, borrowed_items, date_filter):
     """Export analytics as PDF"""
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="analytics_{user.username}_{date_filter}.pdf"'
-    
-    doc = SimpleDocTemplate(response, pagesize=landscape(letter))
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#343131'),
-        spaceAfter=12,
+    report = PDFReport(
+        f'User Analytics Report - {user.username}',
+        pagesize=landscape(letter),
+        title_size=16,
+        header_color=colors.HexColor('#343131'),
+        body_color=None,
+        grid_color=colors.grey,
     )
-    
-    # Title
-    elements.append(Paragraph(f'User Analytics Report - {user.username}', title_style))
-    elements.append(Spacer(1, 12))
+    status_labels = dict(SupplyRequest.STATUS_CHOICES)
+    today = timezone.now().date()
     
     # Requests table
-    elements.append(Paragraph('Supply Requests', styles['Heading2']))
-    request_data = [['Request ID', 'Supply', 'Qty', 'Status', 'Date']]
-    for req in requests.order_by('-created_at')[:20]:
-        request_data.append([
-            req.request_id,
-            req.supply.name[:30],
-            str(req.quantity_requested),
-            req.get_status_display(),
-            req.created_at.strftime('%Y-%m-%d'),
-        ])
-    
-    request_table = Table(request_data, colWidths=[1.5*inch, 2*inch, 0.7*inch, 1.2*inch, 1*inch])
-    request_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#343131')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-    ]))
-    elements.append(request_table)
-    elements.append(Spacer(1, 12))
+    report.heading('Supply Requests')
+    request_rows = requests.order_by('-created_at').values_list(
+        'request_id', 'supply__name', 'quantity_requested', 'status', 'created_at'
+    )[:20]
+    report.table(
+        [('Request ID', 1.5), ('Supply', 2), ('Qty', 0.7), ('Status', 1.2), ('Date', 1)],
+        ([request_id, supply_name[:30], quantity, status_labels.get(status, status), created_at.strftime('%Y-%m-%d')]
+         for request_id, supply_name, quantity, status, created_at in request_rows)
+    )
+    report.spacer()
     
     # Borrowed items table
-    elements.append(Paragraph('Borrowed Items', styles['Heading2']))
-    borrow_data = [['Supply', 'Qty', 'Borrowed', 'Return By', 'Status']]
-    for item in borrowed_items.order_by('-borrowed_at')[:20]:
-        status = 'Returned' if item.is_returned else ('Overdue' if item.is_overdue else 'Active')
-        borrow_data.append([
-            item.supply.name[:30],
-            str(item.borrowed_quantity),
-            item.borrowed_date.strftime('%Y-%m-%d'),
-            item.return_deadline.strftime('%Y-%m-%d') if item.return_deadline else 'N/A',
-            status,
-        ])
-    
-    borrow_table = Table(borrow_data, colWidths=[2*inch, 0.7*inch, 1.2*inch, 1.2*inch, 1.2*inch])
-    borrow_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#343131')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-    ]))
-    elements.append(borrow_table)
-    
-    doc.build(elements)
-    return response
+    report.heading('Borrowed Items')
+    borrow_rows = borrowed_items.order_by('-borrowed_at').values_list(
+        'supply__name', 'borrowed_quantity', 'borrowed_date', 'return_deadline', 'returned_at'
+    )[:20]
+    
+    def iter_borrowed():
+        for supply_name, quantity, borrowed_date, return_deadline, returned_at in borrow_rows:
+            if returned_at:
+                status = 'Returned'
+            elif return_deadline and today > return_deadline:
+                status = 'Overdue'
+            else:
+                status = 'Active'
+            yield [
+                supply_name[:30],
+                quantity,
+                borrowed_date.strftime('%Y-%m-%d'),
+                return_deadline.strftime('%Y-%m-%d') if return_deadline else 'N/A',
+                status,
+            ]
+    
+    report.table(
+        [('Supply', 2), ('Qty', 0.7), ('Borrowed', 1.2), ('Return By', 1.2), ('Status', 1.2)],
+        iter_borrowed()
+    )
+    
+    return report.response(f'analytics_{user.username}_{date_filter}.pdf')
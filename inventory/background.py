@@ -0,0 +1,57 @@
+"""
+Shared background thread pools.
+
+Work that should not hold up a request (QR rendering, report exports, CSV
+imports, image processing, catalog index builds, supply name index
+refreshes, analytics counter flushes) runs in a named pool, created on
+first use and shut down at exit. Every job closes its thread's database
+connection when it finishes.
+"""
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, workers=1):
+    """The thread pool ``name``, started with ``workers`` threads on first use"""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        return pool
+
+
+def _close_connection_after(func, args):
+    try:
+        return func(*args)
+    finally:
+        # Worker threads get their own connection; don't leak it
+        connection.close()
+
+
+def submit(pool_name, func, *args, workers=1):
+    """Run ``func(*args)`` in the pool ``pool_name`` now; returns its Future"""
+    return get_pool(pool_name, workers).submit(_close_connection_after, func, args)
+
+
+def run_after_commit(pool_name, func, *args, async_setting=None, workers=1):
+    """
+    Run ``func(*args)`` once the current transaction commits - in the pool
+    ``pool_name``, or inline when the setting named ``async_setting`` is False.
+    """
+    if async_setting is not None and not getattr(settings, async_setting, True):
+        transaction.on_commit(lambda: func(*args))
+    else:
+        transaction.on_commit(lambda: submit(pool_name, func, *args, workers=workers))
+
+
+@atexit.register
+def _shutdown_pools():
+    for pool in list(_pools.values()):
+        pool.shutdown(wait=False)
@@ -0,0 +1,142 @@
+"""
+Snapshot of the in-stock supplies offered by the request and borrow forms.
+
+The forms used to serialize every in-stock supply into the page on each GET.
+The snapshot holds that JSON once, split into consumables (request_create)
+and equipment and materials (borrow forms). It is served by
+``catalog_views.supply_catalog`` under a URL carrying its content hash, so
+browsers keep it until it changes.
+
+The snapshot is refreshed when the Supply or SupplyCategory table version
+changes.
+Refreshes are incremental: only supplies saved since the previous build,
+or whose category was, are read again, and a count and sum of ids catches
+deletions. A full rebuild runs when that check fails and every
+CATALOG_FULL_REBUILD_INTERVAL seconds as a safety net.
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Supply, SupplyCategory
+from .table_versions import table_versions
+
+CATALOG_SECTIONS = ('consumables', 'equipment', 'materials')
+CATALOG_META_KEY = 'supply-catalog:meta'
+CATALOG_ENTRIES_KEY = 'supply-catalog:entries'
+CATALOG_PAYLOAD_TIMEOUT = 24 * 3600
+CATALOG_FULL_REBUILD_INTERVAL = 3600
+# Rows saved shortly before the previous build are read again, in case
+# their transaction committed after it
+REBUILD_OVERLAP = timedelta(minutes=5)
+
+CATALOG_FIELDS = (
+    'id', 'name', 'quantity', 'unit', 'location', 'is_consumable',
+    'category__name', 'category__is_material',
+)
+
+_rebuild_lock = threading.Lock()
+
+
+def catalog_entry(supply):
+    """``(section, entry)`` for an in-stock supply, in the shape the forms' scripts expect"""
+    entry = {
+        'id': supply.pk,
+        'name': supply.name,
+        'stock': supply.quantity,
+        'unit': supply.unit or 'pieces',
+    }
+    if supply.is_consumable:
+        entry['is_consumable'] = True
+        return 'consumables', entry
+    entry.update({
+        'category': supply.category.name,
+        'location': supply.location,
+        'is_consumable': False,
+    })
+    return ('materials' if supply.category.is_material else 'equipment'), entry
+
+
+def _in_stock_stamp():
+    """Count and id sum of in-stock supplies, compared against the entries to notice deletions"""
+    totals = Supply.objects.filter(quantity__gt=0).aggregate(count=Count('id'), ids=Sum('id'))
+    return totals['count'], totals['ids'] or 0
+
+
+def _read_entries(previous):
+    """Entries by supply id, updated from ``previous`` when possible, else read in full"""
+    if previous is not None and time.time() - previous['full_built_at'] < CATALOG_FULL_REBUILD_INTERVAL:
+        since = previous['built_at'] - REBUILD_OVERLAP
+        entries = dict(previous['entries'])
+        changed_categories = SupplyCategory.objects.filter(updated_at__gte=since).values('pk')
+        changed = (
+            Supply.objects
+            .filter(Q(updated_at__gte=since) | Q(category__in=changed_categories))
+            .select_related('category')
+            .only(*CATALOG_FIELDS)
+        )
+        for supply in changed:
+            if supply.quantity > 0:
+                entries[supply.pk] = catalog_entry(supply)
+            else:
+                entries.pop(supply.pk, None)
+        if _in_stock_stamp() == (len(entries), sum(entries)):
+            return entries, previous['full_built_at']
+
+    rows = Supply.objects.filter(quantity__gt=0).select_related('category').only(*CATALOG_FIELDS)
+    entries = {supply.pk: catalog_entry(supply) for supply in rows.iterator(chunk_size=2000)}
+    return entries, time.time()
+
+
+def _rebuild(versions):
+    started = timezone.now()
+    entries, full_built_at = _read_entries(cache.get(CATALOG_ENTRIES_KEY))
+
+    sections = {section: [] for section in CATALOG_SECTIONS}
+    for section, entry in entries.values():
+        sections[section].append(entry)
+    for section in sections.values():
+        section.sort(key=lambda entry: entry['name'])
+    payload = json.dumps(sections, separators=(',', ':')).encode()
+    digest = hashlib.sha1(payload).hexdigest()[:16]
+
+    meta = {'versions': versions, 'digest': digest}
+    cache.set(CATALOG_ENTRIES_KEY, {
+        'entries': entries, 'built_at': started, 'full_built_at': full_built_at,
+    }, None)
+    cache.set(f'supply-catalog:payload:{digest}', payload, CATALOG_PAYLOAD_TIMEOUT)
+    cache.set(CATALOG_META_KEY, meta, None)
+    return meta, payload
+
+
+def _is_current(meta, versions):
+    return meta is not None and meta['versions'] == versions
+
+
+def current_catalog():
+    """``{'digest', ...}`` of the up-to-date snapshot, refreshing it first if the tables changed"""
+    versions = table_versions(Supply, SupplyCategory)
+    meta = cache.get(CATALOG_META_KEY)
+    if _is_current(meta, versions):
+        return meta
+    with _rebuild_lock:
+        meta = cache.get(CATALOG_META_KEY)
+        if _is_current(meta, versions):
+            return meta
+        return _rebuild(versions)[0]
+
+
+def catalog_payload(meta):
+    """Encoded JSON of the snapshot described by ``meta``"""
+    payload = cache.get(f'supply-catalog:payload:{meta["digest"]}')
+    if payload is None:
+        # Evicted: rebuilding reproduces the same bytes unless the data changed
+        with _rebuild_lock:
+            payload = _rebuild(table_versions(Supply, SupplyCategory))[1]
+    return payload
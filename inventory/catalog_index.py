@@ -0,0 +1,216 @@
+"""
+Read-only supply index shared by every worker through ``mmap``.
+
+Scanner lookups only need a few columns of one supply, so instead of a
+query (or a per-worker cache) each worker maps one compact file, which the
+OS keeps in memory once for all of them. Layout:
+
+- header: magic, record count, offset of the string area and the
+  Supply/SupplyCategory/BorrowedItem table versions it was built from
+- records sorted by id, fixed width (RECORD): id, quantity, minimum stock,
+  offsets/lengths of name and location in the string area, flags
+- string area: UTF-8 names and locations
+
+The file is written to a temporary name and renamed over the old one, so
+readers always see a complete index; they notice the new file by its inode.
+An index built from older table versions than the current ones is not
+used: the caller falls back to the database and a rebuild is queued.
+Saves and deletes of the indexed models queue one as well, in a background
+thread after commit (CATALOG_INDEX_ASYNC), coalescing bursts of writes.
+
+Staleness is judged by table versions. Without Redis they are read from
+the database cache, which costs about as much as the query the index
+saves, so CATALOG_INDEX_ENABLED defaults to on only when REDIS_URL is set.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import background
+from .models import BorrowedItem, Supply, SupplyCategory
+from .table_versions import table_versions
+
+INDEX_MAGIC = b'SUPIDX01'
+# magic, record count, reserved, string area offset, table versions
+HEADER = struct.Struct('<8sIIQQQQ')
+# id, quantity, min_stock_level, name offset, location offset, name length,
+# location length, flags
+RECORD = struct.Struct('<IIIIIHHB3x')
+RECORD_ID = struct.Struct('<I')
+
+FLAG_CONSUMABLE = 1
+FLAG_MATERIAL = 2
+FLAG_BORROWED = 4
+
+INDEXED_MODELS = (Supply, SupplyCategory, BorrowedItem)
+
+_build_lock = threading.Lock()
+_build_pending = False
+_mapped_lock = threading.Lock()
+_mapped = None
+
+
+def index_path():
+    return getattr(settings, 'CATALOG_INDEX_PATH', os.path.join(settings.BASE_DIR, 'catalog_index', 'supplies.idx'))
+
+
+def build_catalog_index():
+    """Write a fresh index file from the database; returns the number of supplies"""
+    versions = table_versions(*INDEXED_MODELS)
+    borrowed = set(
+        BorrowedItem.objects.filter(returned_at__isnull=True).values_list('supply_id', flat=True).distinct()
+    )
+    rows = (
+        Supply.objects.order_by('pk')
+        .values_list('id', 'quantity', 'min_stock_level', 'name', 'location', 'is_consumable', 'category__is_material')
+    )
+
+    records = bytearray()
+    strings = bytearray()
+    count = 0
+    for supply_id, quantity, min_stock_level, name, location, is_consumable, is_material in rows.iterator(chunk_size=2000):
+        name_bytes = name.encode()
+        location_bytes = (location or '').encode()
+        flags = (
+            (FLAG_CONSUMABLE if is_consumable else 0)
+            | (FLAG_MATERIAL if is_material else 0)
+            | (FLAG_BORROWED if supply_id in borrowed else 0)
+        )
+        records += RECORD.pack(
+            supply_id, quantity, min_stock_level,
+            len(strings), len(strings) + len(name_bytes), len(name_bytes), len(location_bytes), flags
+        )
+        strings += name_bytes + location_bytes
+        count += 1
+
+    path = index_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.supplies-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, count, 0, HEADER.size + len(records), *versions))
+            f.write(records)
+            f.write(strings)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def _map_index():
+    """``(mmap, header)`` of the current index file, remapped when the file was replaced"""
+    global _mapped
+    path = index_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _mapped_lock:
+        if _mapped is None or _mapped[0] != key:
+            if stat.st_size < HEADER.size:
+                return None
+            with open(path, 'rb') as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            header = HEADER.unpack_from(buf, 0)
+            if header[0] != INDEX_MAGIC:
+                return None
+            # Readers still holding the previous map keep it alive until they finish
+            _mapped = (key, buf, header)
+        return _mapped[1], _mapped[2]
+
+
+def indexed_supply(supply_id):
+    """
+    ``Supply`` carrying only the indexed columns (plus ``is_borrowed``),
+    or None when the index is missing or older than the data. Raises
+    Supply.DoesNotExist when the up-to-date index has no such supply.
+    """
+    if not getattr(settings, 'CATALOG_INDEX_ENABLED', False):
+        return None
+    mapped = _map_index()
+    if mapped is None:
+        queue_catalog_index_build()
+        return None
+    buf, (_, count, _, strings_offset, *versions) = mapped
+    if tuple(versions) != table_versions(*INDEXED_MODELS):
+        queue_catalog_index_build()
+        return None
+
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        record_id = RECORD_ID.unpack_from(buf, HEADER.size + mid * RECORD.size)[0]
+        if record_id < supply_id:
+            lo = mid + 1
+        elif record_id > supply_id:
+            hi = mid
+        else:
+            (_, quantity, min_stock_level, name_offset, location_offset,
+             name_length, location_length, flags) = RECORD.unpack_from(buf, HEADER.size + mid * RECORD.size)
+            name_start = strings_offset + name_offset
+            location_start = strings_offset + location_offset
+            supply = Supply(
+                pk=record_id,
+                name=buf[name_start:name_start + name_length].decode(),
+                location=buf[location_start:location_start + location_length].decode(),
+                quantity=quantity,
+                min_stock_level=min_stock_level,
+                is_consumable=bool(flags & FLAG_CONSUMABLE),
+            )
+            # Stands for an existing row, so related managers and FKs accept it
+            supply._state.adding = False
+            supply._state.db = Supply.objects.db
+            supply.is_material = bool(flags & FLAG_MATERIAL)
+            supply.is_borrowed = bool(flags & FLAG_BORROWED)
+            return supply
+    raise Supply.DoesNotExist(f'Supply {supply_id} is not in the catalog index')
+
+
+def _run_build():
+    global _build_pending
+    with _build_lock:
+        # Writes from here on need another build
+        _build_pending = False
+    # Other workers queue builds for the same writes; one at a time is enough
+    if not cache.add('catalog-index:building', True, 60):
+        return
+    try:
+        build_catalog_index()
+    except Exception as e:
+        print(f"[WARNING] Catalog index build failed: {type(e).__name__}: {e}")
+    finally:
+        cache.delete('catalog-index:building')
+
+
+def queue_catalog_index_build():
+    """
+    Rebuild the index after the current transaction commits - in the
+    background thread when CATALOG_INDEX_ASYNC is enabled, inline otherwise.
+    """
+    if not getattr(settings, 'CATALOG_INDEX_ENABLED', False):
+        return
+    if not getattr(settings, 'CATALOG_INDEX_ASYNC', True):
+        transaction.on_commit(_run_build)
+        return
+
+    def submit():
+        global _build_pending
+        with _build_lock:
+            if _build_pending:
+                return
+            _build_pending = True
+        # A single background thread, so builds never overlap within a process
+        background.submit('catalog-index', _run_build)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,29 @@
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, HttpResponseNotModified
+from django.shortcuts import redirect
+from django.views.decorators.http import require_safe
+
+from .catalog import catalog_payload, current_catalog
+from .file_serving import IMMUTABLE_CACHE_CONTROL
+
+
+@login_required
+@require_safe
+def supply_catalog(request, digest):
+    """
+    JSON of the in-stock supplies offered by the request and borrow forms.
+    The URL carries the snapshot's content hash, so the response is cached
+    for good; stale links are redirected to the current snapshot.
+    """
+    meta = current_catalog()
+    if digest != meta['digest']:
+        return redirect('supply_catalog', digest=meta['digest'])
+
+    etag = f'"{digest}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(catalog_payload(meta), content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
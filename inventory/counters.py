@@ -0,0 +1,158 @@
+"""
+Running analytics counters (RequestorBorrowerAnalytics, MostRequestedItem).
+
+Signals record what changed as deltas - ``add_counters(model, key,
+total_requests=1)`` - and the deltas are written with ``F()`` increments
+once the transaction commits, so concurrent requests never lose an update
+and a rolled back transaction never counts.
+
+Optionally (ANALYTICS_WRITE_BEHIND, off by default), committed deltas are
+buffered per row and written by a background thread every
+ANALYTICS_FLUSH_INTERVAL seconds: a burst of requests, borrows or returns
+costs one insert for the missing rows and one UPDATE per distinct set of
+deltas instead of a read and a full-row save per event. A failed write puts
+its deltas back in the buffer for the next attempt, and an ``atexit`` hook
+writes what is left at a clean exit; deltas buffered by a worker that is
+killed are lost, so run ``manage.py populate_analytics`` to recompute the
+counters from the raw tables after one.
+"""
+import atexit
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import background
+
+# Column each counter model is keyed by
+COUNTER_KEYS = {
+    'RequestorBorrowerAnalytics': 'user_id',
+    'MostRequestedItem': 'supply_id',
+}
+
+_buffer = {}
+_buffer_lock = threading.Lock()
+_flush_scheduled = False
+
+
+def add_counters(model, key, latest=None, **deltas):
+    """
+    Add ``deltas`` to the counters of ``model``'s row for ``key`` (a user or
+    supply id), creating the row if needed, once the current transaction
+    commits. ``latest`` maps timestamp fields to values to set.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if key is None or not (deltas or latest):
+        return
+    transaction.on_commit(partial(_stage, model, key, deltas, latest or {}))
+
+
+def _stage(model, key, deltas, latest):
+    """Write committed deltas now, or hand them to the write-behind buffer"""
+    if not getattr(settings, 'ANALYTICS_WRITE_BEHIND', False):
+        write_counters({(model, key): (Counter(deltas), dict(latest))})
+        return
+    _buffer_changes({(model, key): (deltas, latest)})
+
+
+def _buffer_changes(pending, schedule=True):
+    """Merge ``{(model, key): (deltas, latest)}`` into the buffer and schedule a flush"""
+    global _flush_scheduled
+    with _buffer_lock:
+        for row, (deltas, latest) in pending.items():
+            entry = _buffer.setdefault(row, (Counter(), {}))
+            entry[0].update(deltas)
+            for field, value in latest.items():
+                # A retried timestamp must not overwrite a newer one
+                if field not in entry[1] or value > entry[1][field]:
+                    entry[1][field] = value
+        schedule = schedule and not _flush_scheduled
+        _flush_scheduled = _flush_scheduled or schedule
+    if schedule:
+        # A single background thread writes the buffer
+        background.submit('analytics-counters', _flush_later)
+
+
+def _take_buffer():
+    global _buffer, _flush_scheduled
+    with _buffer_lock:
+        pending, _buffer = _buffer, {}
+        _flush_scheduled = False
+    return pending
+
+
+def _flush_later():
+    time.sleep(getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 1.0))
+    flush_counters()
+
+
+def flush_counters(retry=True):
+    """
+    Write every buffered delta now. If that fails they go back to the buffer,
+    for another attempt after ANALYTICS_FLUSH_INTERVAL unless ``retry`` is False.
+    """
+    pending = _take_buffer()
+    if not pending:
+        return
+    try:
+        write_counters(pending)
+    except Exception as e:
+        print(f"[WARNING] Analytics counter flush failed: {type(e).__name__}: {e}")
+        _buffer_changes(pending, schedule=retry)
+
+
+def write_counters(pending):
+    """
+    Apply ``{(model, key): (deltas, latest)}`` in one transaction: one
+    insert for the rows that don't exist yet, then one UPDATE per model and
+    distinct set of changes.
+    """
+    per_model = defaultdict(dict)
+    for (model, key), changes in pending.items():
+        per_model[model][key] = changes
+
+    now = timezone.now()
+    with transaction.atomic():
+        for model, rows in per_model.items():
+            key_field = COUNTER_KEYS[model.__name__]
+            existing = set(model.objects.filter(**{f'{key_field}__in': rows}).values_list(key_field, flat=True))
+            missing = set(rows) - existing
+            if missing:
+                # Skip rows whose user or supply was deleted in the meantime
+                owner = model._meta.get_field(key_field).related_model
+                live = owner.objects.filter(pk__in=missing).values_list('pk', flat=True)
+                model.objects.bulk_create(
+                    [model(**{key_field: key}) for key in live],
+                    ignore_conflicts=True,
+                )
+
+            groups = defaultdict(list)
+            for key, (deltas, latest) in rows.items():
+                signature = (
+                    tuple(sorted((field, delta) for field, delta in deltas.items() if delta)),
+                    tuple(sorted(latest.items())),
+                )
+                groups[signature].append(key)
+            for (deltas, latest), keys in groups.items():
+                updates = {
+                    # Counters are unsigned; a decrement never goes below zero
+                    field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, Value(0))
+                    for field, delta in deltas
+                }
+                updates.update(latest)
+                if updates:
+                    model.objects.filter(**{f'{key_field}__in': keys}).update(updated_at=now, **updates)
+
+
+@atexit.register
+def _flush_at_exit():
+    # The pools are shutting down, so nothing is scheduled from here
+    flush_counters(retry=False)
+    if _buffer:
+        print(f"[WARNING] {len(_buffer)} analytics counter rows not written; run manage.py populate_analytics")
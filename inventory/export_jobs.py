@@ -0,0 +1,149 @@
+"""
+Background report export jobs with reusable artifacts.
+
+A job renders one report (see ``reports.REPORTS``) in a worker thread and
+stores the file under MEDIA_ROOT/exports/. Jobs are keyed by report type,
+format, a hash of the filters and the current data version, so asking for
+the same export again returns the finished artifact - or the job already
+rendering it - instead of running the query and render a second time. Any
+write to the tables a report reads changes its data version, which makes
+old artifacts unreachable; they are pruned after EXPORT_ARTIFACT_TTL.
+"""
+import hashlib
+import json
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .background import run_after_commit
+from .exports import gzip_stream, tabular_chunks
+from .models import (
+    BorrowedItem, ExportJob, InventoryTransaction, Supply, SupplyCategory, SupplyRequest, User,
+)
+from .pdf_reports import SPOOL_MAX_SIZE
+from .reports import REPORTS, report_filters, report_pdf, report_table
+
+# Formats a job can produce; the value is also the artifact's file extension
+JOB_FORMATS = ('csv', 'csv.gz', 'ndjson', 'ndjson.gz', 'pdf')
+# Pending/running jobs older than this are assumed lost (e.g. worker restart)
+EXPORT_JOB_TIMEOUT = timedelta(minutes=30)
+
+# Tables each report reads, and the column that moves when a row changes
+REPORT_SOURCES = {
+    'supplies': [(Supply, 'updated_at'), (SupplyCategory, 'updated_at')],
+    'requests': [(SupplyRequest, 'updated_at'), (Supply, 'updated_at'), (User, 'updated_at'), (BorrowedItem, 'returned_at')],
+    'transactions': [(InventoryTransaction, None), (Supply, 'updated_at'), (User, 'updated_at')],
+}
+
+
+def data_version(report):
+    """
+    Fingerprint of the rows ``report`` reads: row count, highest id and latest
+    change time of each source table, in one aggregate query per table.
+    """
+    state = []
+    for model, changed_field in REPORT_SOURCES[report]:
+        aggregates = {'rows': Count('pk'), 'last_id': Max('pk')}
+        if changed_field:
+            aggregates['changed'] = Max(changed_field)
+        values = model.objects.order_by().aggregate(**aggregates)
+        state.append([model._meta.label, *(str(values[key]) for key in sorted(values))])
+    return hashlib.sha256(json.dumps(state).encode('utf-8')).hexdigest()[:16]
+
+
+def export_cache_key(report, export_format, filters, version):
+    payload = json.dumps([report, export_format, sorted(filters.items()), version])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def export_filename(job):
+    return f"{REPORTS[job.report_type]['basename']}.{job.export_format}"
+
+
+def enqueue_export(report, export_format, params, user=None):
+    """
+    Return a job for ``report`` in ``export_format`` with the filters in
+    ``params``: a finished or in-flight job for the same key when there is
+    one, otherwise a new job queued on the export pool.
+    """
+    filters = report_filters(report, params)
+    cache_key = export_cache_key(report, export_format, filters, data_version(report))
+
+    reusable = ExportJob.objects.filter(cache_key=cache_key).filter(
+        Q(status='completed') |
+        Q(status__in=['pending', 'running'], created_at__gte=timezone.now() - EXPORT_JOB_TIMEOUT)
+    ).first()
+    if reusable is not None:
+        if reusable.status != 'completed' or reusable.file.storage.exists(reusable.file.name):
+            return reusable
+
+    job = ExportJob.objects.create(
+        report_type=report,
+        export_format=export_format,
+        params=filters,
+        cache_key=cache_key,
+        requested_by=user,
+    )
+    run_after_commit(
+        'export-job', run_export_job, job.pk,
+        async_setting='EXPORT_JOBS_ASYNC', workers=getattr(settings, 'EXPORT_JOB_WORKERS', 2),
+    )
+    return job
+
+
+def _write_tabular(job, progress):
+    columns, rows = report_table(job.report_type, job.params, progress=progress)
+    fmt, _, compression = job.export_format.partition('.')
+    chunks = tabular_chunks(columns, rows, fmt)
+    chunks = gzip_stream(chunks) if compression else (chunk.encode('utf-8') for chunk in chunks)
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for chunk in chunks:
+        output.write(chunk)
+    output.seek(0)
+    return output
+
+
+def run_export_job(job_id):
+    """Render a pending job's artifact; progress and the outcome are written back to the row"""
+    claimed = ExportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = ExportJob.objects.get(pk=job_id)
+    jobs = ExportJob.objects.filter(pk=job_id)
+
+    def progress(rows_done):
+        jobs.update(rows_done=rows_done)
+
+    output = None
+    try:
+        jobs.update(rows_total=REPORTS[job.report_type]['queryset'](job.params).count())
+        if job.export_format == 'pdf':
+            output = report_pdf(job.report_type, job.params, progress=progress).finish()
+        else:
+            output = _write_tabular(job, progress)
+        job.file.save(f'{job.cache_key}.{job.export_format}', File(output), save=False)
+        jobs.update(status='completed', file=job.file.name, finished_at=timezone.now())
+    except Exception as e:
+        print(f"[WARNING] Export job {job_id} failed: {type(e).__name__}: {e}")
+        jobs.update(status='failed', error=f'{type(e).__name__}: {e}', finished_at=timezone.now())
+    finally:
+        if output is not None:
+            output.close()
+
+    prune_expired_exports()
+
+
+def prune_expired_exports():
+    """Delete jobs and artifacts older than EXPORT_ARTIFACT_TTL seconds"""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'EXPORT_ARTIFACT_TTL', 7 * 24 * 3600))
+    for job in ExportJob.objects.filter(created_at__lt=cutoff).exclude(status='running').iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
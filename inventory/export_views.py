@@ -0,0 +1,76 @@
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
+from .export_jobs import JOB_FORMATS, enqueue_export, export_filename
+from .file_serving import serve_file
+from .models import ExportJob
+from .reports import REPORTS
+
+
+def export_job_payload(job):
+    """JSON description of a job for the reports page to poll"""
+    payload = {
+        'id': str(job.pk),
+        'report': job.report_type,
+        'format': job.export_format,
+        'status': job.status,
+        'progress': job.progress,
+        'rows_done': job.rows_done,
+        'rows_total': job.rows_total,
+        'error': job.error,
+        'status_url': reverse('export_job_status', args=[job.pk]),
+    }
+    if job.status == 'completed':
+        payload['download_url'] = reverse('export_job_download', args=[job.pk])
+    return payload
+
+
+@login_required
+@require_POST
+def export_job_start(request):
+    """
+    Start (or reuse) a background export. Expects ``report`` and ``format``
+    plus the report's filters; ``gzip=1`` compresses CSV/NDJSON output.
+    """
+    if request.user.role not in ['admin', 'gso_staff']:
+        return JsonResponse({'error': 'You do not have permission to export reports.'}, status=403)
+
+    report = request.POST.get('report', '')
+    export_format = request.POST.get('format', 'csv')
+    if export_format != 'pdf' and request.POST.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        export_format += '.gz'
+    if report not in REPORTS or export_format not in JOB_FORMATS:
+        return JsonResponse({'error': 'Unknown report or format.'}, status=400)
+
+    job = enqueue_export(report, export_format, request.POST, user=request.user)
+    job.refresh_from_db()
+    return JsonResponse(export_job_payload(job), status=200 if job.status == 'completed' else 202)
+
+
+@login_required
+@require_GET
+def export_job_status(request, job_id):
+    if request.user.role not in ['admin', 'gso_staff']:
+        return JsonResponse({'error': 'You do not have permission to export reports.'}, status=403)
+
+    job = get_object_or_404(ExportJob, pk=job_id)
+    return JsonResponse(export_job_payload(job))
+
+
+@login_required
+@require_GET
+def export_job_download(request, job_id):
+    """Serve a finished export artifact"""
+    if request.user.role not in ['admin', 'gso_staff']:
+        raise Http404('Export not found')
+
+    job = get_object_or_404(ExportJob, pk=job_id, status='completed')
+    if not job.file or not job.file.storage.exists(job.file.name):
+        raise Http404('Export file has expired')
+
+    content_type = 'application/gzip' if job.export_format.endswith('.gz') else None
+    return serve_file(request, job.file.storage, job.file.name, content_type=content_type,
+                      as_attachment=True, filename=export_filename(job))
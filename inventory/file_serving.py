@@ -0,0 +1,97 @@
+"""
+Serving stored files once Django has decided the user may see them.
+
+With MEDIA_ACCEL set, the response only carries a header naming the file and
+the front server sends it, so no worker is tied up streaming bytes:
+
+- ``nginx``: ``X-Accel-Redirect: <MEDIA_ACCEL_PREFIX><name>``, where the
+  prefix is an ``internal`` location aliasing MEDIA_ROOT.
+- ``sendfile``: ``X-Sendfile: <absolute path>`` (Apache mod_xsendfile,
+  lighttpd).
+
+Otherwise a FileResponse is returned; WSGI servers that provide
+``wsgi.file_wrapper`` (gunicorn, uWSGI) send it with ``os.sendfile``.
+
+Every response carries a strong ETag built from a hash of the file's
+content, so browsers revalidate with a cheap 304. Hashes are cached by
+path, size and modification time, so a file is read once per change.
+"""
+import hashlib
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+
+# Cache-Control for files whose name is never reused for different content
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+# Files that can be replaced in place are revalidated against their ETag
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+FILE_ETAG_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def file_etag(name, path, stat):
+    """Quoted content hash of the file at ``path``, cached per size and mtime"""
+    cache_key = 'file-etag:' + hashlib.sha1(
+        f'{name}:{stat.st_size}:{stat.st_mtime_ns}'.encode()
+    ).hexdigest()
+    etag = cache.get(cache_key)
+    if etag is None:
+        with open(path, 'rb') as f:
+            etag = '"' + hashlib.file_digest(f, 'sha256').hexdigest()[:32] + '"'
+        cache.set(cache_key, etag, FILE_ETAG_CACHE_TIMEOUT)
+    return etag
+
+
+def serve_file(request, storage, name, cache_control=REVALIDATE_CACHE_CONTROL,
+               content_type=None, as_attachment=False, filename=None):
+    """
+    Response for the stored file ``name``: 304 when the client's copy is
+    current, else handed to the front server (MEDIA_ACCEL) or streamed.
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        # Remote storage: no local path to hash or hand off
+        if not storage.exists(name):
+            raise Http404('File not found')
+        response = FileResponse(storage.open(name, 'rb'), as_attachment=as_attachment,
+                                filename=filename or os.path.basename(name), content_type=content_type)
+        response['Cache-Control'] = cache_control
+        return response
+
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found')
+
+    etag = file_etag(name, path, stat)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        not_modified['Cache-Control'] = cache_control
+        return not_modified
+
+    content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    accel = getattr(settings, 'MEDIA_ACCEL', '')
+    if accel == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(name)
+    elif accel == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+    if as_attachment:
+        response['Content-Disposition'] = content_disposition_header(True, filename or os.path.basename(name))
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response
@@ -1,8 +1,78 @@
+import json
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from django.urls import reverse_lazy
 from .models import User, Supply, SupplyRequest, SupplyCategory, BorrowedItem
 from django.db.models import Q
 
+# Supplies each picker offers, by the ``scope`` the autocomplete endpoint accepts
+SUPPLY_SCOPES = {
+    'consumable': Q(quantity__gt=0, is_consumable=True),
+    # Equipment plus anything categorized as material, whatever its consumable flag
+    'borrowable': Q(quantity__gt=0) & (Q(is_consumable=False) | Q(category__is_material=True)),
+    'equipment': Q(quantity__gt=0, is_consumable=False),
+    'materials': Q(quantity__gt=0, category__is_material=True),
+    'all': Q(),
+}
+
+
+def supply_scope_queryset(scope):
+    return Supply.objects.filter(SUPPLY_SCOPES[scope]).select_related('category').order_by('name', 'pk')
+
+
+def supply_option_data(supply):
+    """What the pickers' scripts know about a supply once it is chosen"""
+    return {
+        'id': supply.pk,
+        'name': supply.name,
+        'label': f"{supply.name} ({supply.quantity} {supply.unit} available)",
+        'stock': supply.quantity,
+        'unit': supply.unit,
+        'min_stock': supply.min_stock_level,
+        'category': supply.category.name,
+        'location': supply.location,
+        'is_consumable': supply.is_consumable,
+        'is_material': supply.category.is_material,
+    }
+
+
+class SupplyAutocomplete(forms.Select):
+    """
+    Supply picker that renders only the chosen option. static/js/supply_autocomplete.js
+    turns it into a search box fetching matches page by page from
+    ``supply_autocomplete``, so the page no longer grows with the catalog.
+    """
+    class Media:
+        js = ['js/supply_autocomplete.js']
+
+    def __init__(self, scope, attrs=None, placeholder='Type to search supplies...'):
+        super().__init__(attrs)
+        self.scope = scope
+        self.placeholder = placeholder
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = f"{reverse_lazy('supply_autocomplete')}?scope={self.scope}"
+        attrs['data-placeholder'] = self.placeholder
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        selected = {str(v) for v in value if str(v) not in self.choices.field.empty_values}
+        options = [self.create_option(name, '', self.choices.field.empty_label or '', not selected, 0)]
+        for supply in self.choices.queryset.filter(pk__in=selected):
+            option = self.create_option(name, supply.pk, supply_option_data(supply)['label'], True, len(options))
+            option['attrs']['data-item'] = json.dumps(supply_option_data(supply))
+            options.append(option)
+        return [(None, options, 0)]
+
+
+class SupplyChoiceField(forms.ModelChoiceField):
+    """Supply from ``scope``, picked with SupplyAutocomplete; validating it reads one row"""
+    def __init__(self, scope, empty_label='-- Select a supply --', **kwargs):
+        kwargs.setdefault('widget', SupplyAutocomplete(scope))
+        super().__init__(queryset=supply_scope_queryset(scope), empty_label=empty_label, **kwargs)
+
 class CustomUserCreationForm(UserCreationForm):
     class Meta:
         model = User
@@ -132,30 +202,25 @@ class SupplyForm(forms.ModelForm):
         return instance
 
 class SupplyRequestForm(forms.ModelForm):
+    # Only CONSUMABLE items with available stock
+    supply = SupplyChoiceField(
+        'consumable',
+        empty_label='-- Select a consumable supply --',
+        widget=SupplyAutocomplete('consumable', attrs={'class': 'form-select'}),
+    )
+
     class Meta:
         model = SupplyRequest
         fields = ['supply', 'quantity_requested', 'purpose']
         widgets = {
-            'supply': forms.Select(attrs={'class': 'form-select'}),
             'quantity_requested': forms.NumberInput(attrs={'class': 'form-input'}),
             'purpose': forms.Textarea(attrs={'class': 'form-textarea', 'rows': 3}),
         }
     
     def __init__(self, *args, **kwargs):
-        user = kwargs.pop('user', None)
+        # Views still pass the user; every user gets the consumable scope
+        kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
-        if user:
-            # Filter supplies - only CONSUMABLE items with available stock
-            supply_field = self.fields['supply']
-            supply_field.queryset = Supply.objects.filter(quantity__gt=0, is_consumable=True).order_by('name')
-            
-            # Build choices with quantity info
-            choices = [('', '-- Select a consumable supply --')]
-            for supply in supply_field.queryset:
-                label = f"{supply.name} ({supply.quantity} {supply.unit} available)"
-                choices.append((supply.pk, label))
-            
-            supply_field.choices = choices
 
 class SupplyCategoryForm(forms.ModelForm):
     class Meta:
@@ -189,6 +254,17 @@ class QRScanForm(forms.Form):
 
 class BorrowRequestForm(forms.ModelForm):
     """Form for requesting to borrow items - requires GSO approval"""
+    # NON-CONSUMABLE items (equipment) and any supplies categorized as
+    # "materials" even if their is_consumable flag varies
+    supply = SupplyChoiceField(
+        'borrowable',
+        empty_label='-- Select item to borrow --',
+        widget=SupplyAutocomplete(
+            'borrowable',
+            attrs={'class': 'form-select block w-full px-4 py-2 border border-gray-300 rounded-lg', 'id': 'supply-select'},
+            placeholder='Search items by name...',
+        ),
+    )
     borrow_duration_days = forms.IntegerField(
         min_value=1,
         initial=3,
@@ -205,7 +281,6 @@ class BorrowRequestForm(forms.ModelForm):
         model = SupplyRequest
         fields = ['supply', 'quantity_requested', 'requested_location', 'purpose']
         widgets = {
-            'supply': forms.Select(attrs={'class': 'form-select', 'id': 'supply-select'}),
             'quantity_requested': forms.NumberInput(attrs={'class': 'form-input', 'min': '1'}),
             'purpose': forms.Textarea(attrs={
                 'class': 'form-textarea',
@@ -215,24 +290,6 @@ class BorrowRequestForm(forms.ModelForm):
             'requested_location': forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'Location where the equipment will be used (optional)'}),
         }
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Filter supplies - include NON-CONSUMABLE items (equipment) and any
-        # supplies categorized as "materials" even if their is_consumable flag varies.
-        supply_field = self.fields['supply']
-        supply_field.queryset = Supply.objects.filter(
-            quantity__gt=0
-        ).filter(
-            Q(is_consumable=False) | Q(category__is_material=True)
-        ).order_by('name')
-        
-        # Build choices with quantity info
-        choices = [('', '-- Select equipment to borrow --')]
-        for supply in supply_field.queryset:
-            label = f"{supply.name} ({supply.quantity} {supply.unit} available)"
-            choices.append((supply.pk, label))
-        
-        supply_field.choices = choices
 
 class BorrowedItemForm(forms.ModelForm):
     """Form for GSO staff to create borrowed item record after approval"""
@@ -280,9 +337,9 @@ class StockAdjustmentForm(forms.Form):
         ('damaged', '⚠️ Damaged Item'),
     ]
     
-    supply = forms.ModelChoiceField(
-        queryset=Supply.objects.all(),
-        widget=forms.Select(attrs={'class': 'form-select'}),
+    supply = SupplyChoiceField(
+        'all',
+        widget=SupplyAutocomplete('all', attrs={'class': 'form-select'}),
         label='Supply Item'
     )
     
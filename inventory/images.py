@@ -0,0 +1,241 @@
+"""
+Upload-time processing for supply images and profile pictures.
+
+After an image is saved, a background job (run once the transaction commits,
+like QR rendering) re-encodes the original without EXIF/XMP metadata, capped
+at IMAGE_MAX_DIMENSION, and writes WebP and JPEG derivatives at
+DERIVATIVE_SIZES next to it::
+
+    supply_images/drill.jpg
+    supply_images/derivatives/drill.jpg.96.webp
+    supply_images/derivatives/drill.jpg.96.jpg
+    ...
+
+What was produced is recorded in the model's ``*_variants`` JSON column, so
+templates can build ``srcset`` attributes without touching storage. Until
+the job has run (or when it fails) templates fall back to the original.
+"""
+import posixpath
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from .background import run_after_commit
+from .table_versions import bump_table_versions
+
+# Bounding box (longest side, px) of each derivative: list thumbnails and
+# avatars, detail-page images, and enlarged views
+DERIVATIVE_SIZES = (96, 320, 1024)
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Re-encoding options for the original, keyed by Pillow format
+ORIGINAL_SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+# Image field -> JSON field holding its derivatives, per model
+IMAGE_FIELDS = {
+    'Supply': {'image': 'image_variants'},
+    'User': {'profile_picture': 'profile_picture_variants'},
+}
+
+
+def derivative_name(source_name, size, ext):
+    directory, filename = posixpath.split(source_name)
+    return posixpath.join(directory, 'derivatives', f'{filename}.{size}.{ext}')
+
+
+def _flatten(image):
+    """RGB copy of ``image`` with any transparency composited onto white (for JPEG)"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, pil_format, options, icc_profile=None):
+    if pil_format == 'JPEG':
+        image = _flatten(image)
+    elif image.mode not in ('RGB', 'RGBA', 'L', 'LA') and pil_format == 'WEBP':
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    buffer = BytesIO()
+    # Metadata is only written when passed explicitly, so EXIF/XMP are dropped here
+    if icc_profile:
+        options = {**options, 'icc_profile': icc_profile}
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def process_image(storage, name):
+    """
+    Strip metadata from and cap the stored image ``name``, then write its
+    derivatives. Returns the variants record to store on the model.
+
+    A re-encoded original is saved under a new name next to ``name``, which
+    is left in place for the caller to delete once the row points at the new
+    file (see ``build_image_variants``).
+    """
+    max_dimension = getattr(settings, 'IMAGE_MAX_DIMENSION', 2048)
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        # Let JPEG decode at a reduced scale when the original is far larger than needed
+        image.draft('RGB', (max_dimension, max_dimension))
+        source_format = image.format
+        animated = getattr(image, 'is_animated', False)
+        exif = image.getexif()
+        has_metadata = bool(exif) or 'xmp' in image.info or 'XML:com.adobe.xmp' in image.info
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    pil_format = 'JPEG' if source_format == 'MPO' else source_format
+    oversized = max(image.size) > max_dimension
+    if not animated and pil_format in ORIGINAL_SAVE_OPTIONS and (has_metadata or oversized):
+        if oversized:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        data = _encode(image, pil_format, ORIGINAL_SAVE_OPTIONS[pil_format], icc_profile)
+        # The original name is taken, so storage picks a free one
+        source = storage.save(name, ContentFile(data))
+    else:
+        source = name
+
+    sizes = []
+    try:
+        for size in DERIVATIVE_SIZES:
+            if size >= max(image.size):
+                break
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size), Image.LANCZOS)
+            for ext, (derivative_format, options) in DERIVATIVE_FORMATS.items():
+                derivative = derivative_name(source, size, ext)
+                if storage.exists(derivative):
+                    storage.delete(derivative)
+                storage.save(derivative, ContentFile(_encode(thumbnail, derivative_format, options, icc_profile)))
+            sizes.append([size, thumbnail.width])
+    except Exception:
+        if source != name:
+            storage.delete(source)
+        raise
+    return {'source': source, 'width': image.width, 'height': image.height, 'sizes': sizes}
+
+
+def derivative_names(variants):
+    """Storage names of the derivative files described by a variants record"""
+    return [
+        derivative_name(variants['source'], size, ext)
+        for size, _ in (variants or {}).get('sizes', [])
+        for ext in DERIVATIVE_FORMATS
+    ]
+
+
+def delete_derivatives(storage, variants):
+    """Remove the derivative files described by a variants record"""
+    for name in derivative_names(variants):
+        storage.delete(name)
+
+
+def needs_processing(file, variants):
+    """True when ``variants`` does not describe the file currently stored in the field"""
+    return (variants or {}).get('source') != (file.name or None)
+
+
+def build_image_variants(model, pk, field_name):
+    """Process the image in ``field_name`` of one row and record its derivatives"""
+    variants_field = IMAGE_FIELDS[model.__name__][field_name]
+    obj = model.objects.filter(pk=pk).only('pk', field_name, variants_field).first()
+    if obj is None:
+        return
+    file, old_variants = getattr(obj, field_name), getattr(obj, variants_field)
+    if not needs_processing(file, old_variants):
+        return
+
+    if not file:
+        # Image was cleared: drop the record and the files it pointed at
+        model.objects.filter(pk=pk).update(**{variants_field: {}})
+        bump_table_versions(model)
+        delete_derivatives(file.storage, old_variants)
+        return
+
+    try:
+        variants = process_image(file.storage, file.name)
+    except Exception as e:
+        # Remember the failure so the original keeps being served without retries
+        print(f"[WARNING] Image processing failed for {file.name}: {type(e).__name__}: {e}")
+        variants = {'source': file.name, 'sizes': []}
+
+    # Only record the result if the image was not replaced in the meantime
+    updated = model.objects.filter(pk=pk, **{field_name: file.name}).update(**{
+        field_name: variants['source'],
+        variants_field: variants,
+    })
+    if not updated:
+        # Replaced in the meantime; drop what was written for the old upload
+        delete_derivatives(file.storage, variants)
+        if variants['source'] != file.name:
+            file.storage.delete(variants['source'])
+        return
+    bump_table_versions(model)
+    if variants['source'] != file.name:
+        # The row points at the re-encoded copy now
+        file.storage.delete(file.name)
+    if old_variants and old_variants.get('source') != variants['source']:
+        delete_derivatives(file.storage, old_variants)
+
+
+def queue_image_variants(instance, field_name):
+    """
+    Process ``instance``'s image after the current transaction commits - in
+    the thread pool when IMAGE_PROCESSING_ASYNC is enabled, inline otherwise.
+    """
+    model, pk = type(instance), instance.pk
+
+    def job():
+        try:
+            build_image_variants(model, pk, field_name)
+        except Exception as e:
+            print(f"[WARNING] Image processing failed: {type(e).__name__}: {e}")
+
+    run_after_commit(
+        'image-processing', job,
+        async_setting='IMAGE_PROCESSING_ASYNC', workers=getattr(settings, 'IMAGE_PROCESSING_THREADS', 1),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Template helpers
+# ---------------------------------------------------------------------------
+
+def image_srcset(file, variants, ext='webp'):
+    """``srcset`` value listing the ``ext`` derivatives of ``file``; empty until they exist"""
+    if not file or needs_processing(file, variants):
+        return ''
+    storage = file.storage
+    return ', '.join(
+        f'{storage.url(derivative_name(file.name, size, ext))} {width}w'
+        for size, width in variants.get('sizes', [])
+    )
+
+
+def image_sources(file, variants):
+    """
+    ``src`` plus WebP and JPEG ``srcset`` values for a ``<picture>`` element.
+    The original is listed last in the JPEG set so large displays can still
+    pick it.
+    """
+    webp_srcset = image_srcset(file, variants, 'webp')
+    jpeg_srcset = image_srcset(file, variants, 'jpg')
+    if jpeg_srcset and variants.get('width'):
+        jpeg_srcset += f', {file.url} {variants["width"]}w'
+    return {
+        'src': file.url,
+        'webp_srcset': webp_srcset,
+        'jpeg_srcset': jpeg_srcset,
+    }
@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
+from .models import ImportUpload
+from .supply_import import (
+    UploadOffsetMismatch, append_chunk, prune_stale_uploads, queue_upload_import, received_bytes,
+)
+
+
+def import_upload_payload(upload):
+    """JSON description of an upload for the import page to resume and poll"""
+    received = received_bytes(upload) if upload.status == 'uploading' else upload.size
+    return {
+        'id': str(upload.pk),
+        'filename': upload.filename,
+        'size': upload.size,
+        'received': received,
+        'status': upload.status,
+        'chunk_size': settings.IMPORT_CHUNK_SIZE,
+        'bytes_processed': upload.bytes_processed,
+        'rows_processed': upload.rows_processed,
+        'progress': int(upload.bytes_processed * 100 / upload.size) if upload.size else 100,
+        'result': upload.result,
+        'error': upload.error,
+        'status_url': reverse('import_upload_status', args=[upload.pk]),
+        'chunk_url': reverse('import_upload_chunk', args=[upload.pk]),
+        'complete_url': reverse('import_upload_complete', args=[upload.pk]),
+    }
+
+
+def _get_upload(request, upload_id):
+    if request.user.role not in ['admin', 'gso_staff']:
+        raise Http404('Upload not found')
+    return get_object_or_404(ImportUpload, pk=upload_id, uploaded_by=request.user)
+
+
+@login_required
+@require_POST
+def import_upload_start(request):
+    """Register a chunked upload; expects ``filename`` and ``size`` (bytes)"""
+    if request.user.role not in ['admin', 'gso_staff']:
+        return JsonResponse({'success': False, 'error': 'You do not have permission to import supplies.'}, status=403)
+
+    filename = request.POST.get('filename', '').strip()
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'File size is required'}, status=400)
+    if not filename.endswith('.csv'):
+        return JsonResponse({'success': False, 'error': 'Please upload a CSV file'}, status=400)
+    if size <= 0:
+        return JsonResponse({'success': False, 'error': 'CSV file is empty'}, status=400)
+    if size > settings.IMPORT_UPLOAD_MAX_SIZE:
+        max_mb = settings.IMPORT_UPLOAD_MAX_SIZE // (1024 * 1024)
+        return JsonResponse({'success': False, 'error': f'File size must be less than {max_mb}MB'}, status=400)
+
+    prune_stale_uploads()
+    upload = ImportUpload.objects.create(uploaded_by=request.user, filename=filename[:255], size=size)
+    return JsonResponse(import_upload_payload(upload), status=201)
+
+
+@login_required
+@require_GET
+def import_upload_status(request, upload_id):
+    return JsonResponse(import_upload_payload(_get_upload(request, upload_id)))
+
+
+@login_required
+@require_POST
+def import_upload_chunk(request, upload_id):
+    """
+    Append the raw request body at byte ``X-Upload-Offset``. Answers 409 with
+    the stored offset when it does not match, so the client can resume.
+    """
+    upload = _get_upload(request, upload_id)
+    if upload.status != 'uploading':
+        return JsonResponse(import_upload_payload(upload), status=409)
+    try:
+        offset = int(request.headers.get('X-Upload-Offset', ''))
+        length = int(request.headers.get('Content-Length', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'X-Upload-Offset and Content-Length are required'}, status=400)
+    if length > settings.IMPORT_CHUNK_SIZE:
+        return JsonResponse({'success': False, 'error': 'Chunk is too large'}, status=400)
+
+    try:
+        # Read the body as a stream; request.body would buffer it in memory
+        append_chunk(upload, offset, request, length)
+    except UploadOffsetMismatch:
+        return JsonResponse(import_upload_payload(upload), status=409)
+    # Keep active uploads from being pruned as stale
+    upload.save(update_fields=['updated_at'])
+    return JsonResponse(import_upload_payload(upload))
+
+
+@login_required
+@require_POST
+def import_upload_complete(request, upload_id):
+    """Start importing once every byte has arrived"""
+    upload = _get_upload(request, upload_id)
+    if upload.status == 'uploading':
+        if received_bytes(upload) != upload.size:
+            return JsonResponse(import_upload_payload(upload), status=409)
+        claimed = ImportUpload.objects.filter(pk=upload.pk, status='uploading').update(status='processing')
+        if claimed:
+            queue_upload_import(upload)
+        upload.refresh_from_db()
+    return JsonResponse(import_upload_payload(upload), status=202)
@@ -0,0 +1,195 @@
+"""
+Printable QR label sheets.
+
+Labels are laid out on Avery-style grids. Each distinct QR code is drawn as
+a small 1-bit image built from the cached QR module matrix, which the PDF
+stores once however often it is placed. Rows are read from the database in
+chunks.
+
+reportlab keeps every finished page in memory until the document is saved,
+so sheets are rendered in segments of LABEL_SEGMENT_PAGES pages, each a
+document of its own: a run that fits in one segment is a single PDF, a
+larger one a ZIP of part PDFs written one after the other. Memory is bound
+by the segment size, not the number of labels. Output goes to a spooled
+temporary file that the view streams back.
+"""
+import shutil
+import tempfile
+import zipfile
+from itertools import groupby, islice
+
+from PIL import Image
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from .pdf_reports import fit_text
+from .qr_rendering import qr_matrix, request_group_id, request_qr_spec, supply_qr_payload
+
+# Avery US-letter label templates: grid, label size and pitch (inches)
+LABEL_TEMPLATES = {
+    'avery5160': {
+        'name': 'Avery 5160 - 1" x 2-5/8" (30 per sheet)',
+        'columns': 3, 'rows': 10,
+        'width': 2.625, 'height': 1.0,
+        'left': 0.1875, 'top': 0.5,
+        'h_pitch': 2.75, 'v_pitch': 1.0,
+    },
+    'avery5163': {
+        'name': 'Avery 5163 - 2" x 4" (10 per sheet)',
+        'columns': 2, 'rows': 5,
+        'width': 4.0, 'height': 2.0,
+        'left': 0.15625, 'top': 0.5,
+        'h_pitch': 4.1875, 'v_pitch': 2.0,
+    },
+    'avery22805': {
+        'name': 'Avery 22805 - 1-1/2" square (24 per sheet)',
+        'columns': 4, 'rows': 6,
+        'width': 1.5, 'height': 1.5,
+        'left': 0.625, 'top': 0.5,
+        'h_pitch': 1.8125, 'v_pitch': 1.6875,
+    },
+}
+DEFAULT_LABEL_TEMPLATE = 'avery5160'
+
+LABEL_PADDING = 0.06 * inch
+LABEL_FONT = 'Helvetica'
+LABEL_FONT_BOLD = 'Helvetica-Bold'
+ROW_CHUNK_SIZE = 500
+# Pages per rendered document; larger runs are split into parts
+LABEL_SEGMENT_PAGES = 50
+# Spooled output stays in memory up to this size, then moves to disk
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+
+def supply_labels(supplies):
+    """Yield (qr_data, title, subtitle) for each supply in the queryset"""
+    rows = supplies.order_by('category__name', 'name', 'pk').values_list(
+        'pk', 'name', 'location'
+    ).iterator(chunk_size=ROW_CHUNK_SIZE)
+    for supply_id, name, location in rows:
+        yield supply_qr_payload(supply_id, name), name, f"ID: {supply_id} | {location}"
+
+
+def request_labels(supply_requests):
+    """
+    Yield (qr_data, title, subtitle) for the requests in the queryset. Requests
+    submitted together (same user, same minute) share one batch label.
+    """
+    rows = supply_requests.select_related('user', 'supply').only(
+        'id', 'request_id', 'user_id', 'user__username', 'supply_id', 'supply__name',
+        'quantity_requested', 'purpose', 'created_at'
+    ).order_by('user_id', 'created_at', 'pk').iterator(chunk_size=ROW_CHUNK_SIZE)
+    for group_id, items in groupby(rows, key=request_group_id):
+        items = list(items)
+        first = items[0]
+        if len(items) > 1:
+            spec = request_qr_spec(first, group_id=group_id)
+            subtitle = f"Batch {group_id} | {len(items)} items"
+        else:
+            spec = request_qr_spec(first)
+            subtitle = f"{first.request_id} | {first.supply.name}"
+        yield spec['qr_data'], first.user.username, subtitle
+
+
+def _qr_image(qr_data):
+    """
+    The QR matrix as a 1-bit image, one pixel per module. reportlab stores
+    each distinct image once and reuses it wherever it is drawn again.
+    """
+    modules = qr_matrix(qr_data, border=2)
+    image = Image.new('1', (len(modules), len(modules)), 1)
+    image.putdata([0 if dark else 1 for row in modules for dark in row])
+    return ImageReader(image)
+
+
+def _draw_qr(pdf, qr_data, x, y, size):
+    """Draw the QR code with its bottom-left corner at (x, y)"""
+    pdf.drawImage(_qr_image(qr_data), x, y, size, size)
+
+
+def _draw_label(pdf, label, x, y, width, height):
+    qr_data, title, subtitle = label
+    inner_height = height - 2 * LABEL_PADDING
+    inner_width = width - 2 * LABEL_PADDING
+
+    if width >= 1.8 * height:
+        # Wide label: QR on the left, text to the right
+        qr_size = inner_height
+        _draw_qr(pdf, qr_data, x + LABEL_PADDING, y + LABEL_PADDING, qr_size)
+        text_x = x + 2 * LABEL_PADDING + qr_size
+        text_width = inner_width - qr_size - LABEL_PADDING
+        title_size = min(11, max(6, inner_height / 4))
+        text_y = y + height / 2
+        pdf.setFont(LABEL_FONT_BOLD, title_size)
+        pdf.drawString(text_x, text_y + 2, fit_text(title, LABEL_FONT_BOLD, title_size, text_width))
+        pdf.setFont(LABEL_FONT, title_size - 2)
+        pdf.drawString(text_x, text_y - title_size, fit_text(subtitle, LABEL_FONT, title_size - 2, text_width))
+    else:
+        # Square label: QR on top, title underneath
+        title_size = 6
+        qr_size = min(inner_width, inner_height - title_size - 2)
+        _draw_qr(pdf, qr_data, x + (width - qr_size) / 2, y + height - LABEL_PADDING - qr_size, qr_size)
+        pdf.setFont(LABEL_FONT, title_size)
+        pdf.drawCentredString(
+            x + width / 2, y + LABEL_PADDING,
+            fit_text(f"{title} ({subtitle.split(' | ')[0]})", LABEL_FONT, title_size, inner_width)
+        )
+
+
+def _render_segment(labels, spec, title):
+    """One PDF of ``labels`` laid out per ``spec``, as a spooled file positioned at its start"""
+    per_page = spec['columns'] * spec['rows']
+    page_height = letter[1]
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    pdf = canvas.Canvas(output, pagesize=letter, pageCompression=1)
+    pdf.setTitle(title)
+
+    for index, label in enumerate(labels):
+        slot = index % per_page
+        if slot == 0 and index > 0:
+            pdf.showPage()
+        column, row = slot % spec['columns'], slot // spec['columns']
+        x = (spec['left'] + column * spec['h_pitch']) * inch
+        y = page_height - (spec['top'] + row * spec['v_pitch'] + spec['height']) * inch
+        _draw_label(pdf, label, x, y, spec['width'] * inch, spec['height'] * inch)
+
+    if not labels:
+        pdf.setFont(LABEL_FONT, 12)
+        pdf.drawString(inch, page_height - inch, 'No items matched the selected filters.')
+    pdf.showPage()
+    pdf.save()
+    output.seek(0)
+    return output
+
+
+def build_label_sheet(labels, template=DEFAULT_LABEL_TEMPLATE, title='QR Labels', basename='qr_labels'):
+    """
+    Lay ``labels`` out on label sheets and return ``(file, count, parts)``
+    where ``file`` is a spooled temporary file positioned at its start: the
+    PDF when ``parts`` is 1, otherwise a ZIP of ``basename``-partN.pdf files
+    of LABEL_SEGMENT_PAGES pages each.
+    """
+    spec = LABEL_TEMPLATES[template]
+    segment_size = spec['columns'] * spec['rows'] * LABEL_SEGMENT_PAGES
+    labels = iter(labels)
+
+    segment = list(islice(labels, segment_size))
+    following = list(islice(labels, segment_size))
+    if not following:
+        return _render_segment(segment, spec, title), len(segment), 1
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    count = parts = 0
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+        while segment:
+            parts += 1
+            count += len(segment)
+            rendered = _render_segment(segment, spec, f'{title} (part {parts})')
+            with rendered, archive.open(f'{basename}-part{parts}.pdf', 'w') as member:
+                shutil.copyfileobj(rendered, member)
+            segment, following = following, list(islice(labels, segment_size))
+    output.seek(0)
+    return output, count, parts
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from inventory.images import IMAGE_FIELDS, build_image_variants, needs_processing
+from inventory.models import Supply, User
+
+
+class Command(BaseCommand):
+    help = 'Strip metadata from, cap and build resized copies of existing supply images and profile pictures'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild images that already have resized copies',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Rows read from the database per query (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        for model in (Supply, User):
+            for field_name, variants_field in IMAGE_FIELDS[model.__name__].items():
+                total += self.backfill(model, field_name, variants_field, options)
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {total} image(s) in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def backfill(self, model, field_name, variants_field, options):
+        rows = (
+            model.objects
+            .exclude(Q(**{f'{field_name}__isnull': True}) | Q(**{field_name: ''}))
+            .only('pk', field_name, variants_field)
+            .order_by('pk')
+        )
+        processed = 0
+        for obj in rows.iterator(chunk_size=options['batch_size']):
+            if not options['force'] and not needs_processing(getattr(obj, field_name), getattr(obj, variants_field)):
+                continue
+            if options['force']:
+                # Clear the record so build_image_variants redoes the work
+                model.objects.filter(pk=obj.pk).update(**{variants_field: {}})
+            build_image_variants(model, obj.pk, field_name)
+            processed += 1
+            if processed % 100 == 0:
+                self.stdout.write(f'  {model.__name__}.{field_name}: {processed} processed')
+        self.stdout.write(f'{model.__name__}.{field_name}: {processed} processed')
+        return processed
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.qr_rendering import (
+    RENDER_BACKENDS, qr_matrix, _label_row, render_request_qr, render_supply_qr,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark QR render time and PNG size for each available rendering backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=200,
+            help='Number of codes to render per layout and backend (default: 200)',
+        )
+        parser.add_argument(
+            '--backend',
+            action='append',
+            help='Backend to benchmark (repeatable). Defaults to all available backends.',
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+        backends = options['backend'] or list(RENDER_BACKENDS)
+        unknown = [name for name in backends if name not in RENDER_BACKENDS]
+        if unknown:
+            raise CommandError(
+                f"Unknown or unavailable backend(s): {', '.join(unknown)}. "
+                f"Available: {', '.join(RENDER_BACKENDS)}"
+            )
+
+        layouts = {
+            'supply': lambda i, backend: render_supply_qr(
+                i, f'Benchmark Supply Item {i}', backend=backend
+            ),
+            'request': lambda i, backend: render_request_qr(
+                f'BORROW-{i}-1-{i}',
+                [
+                    'INDIVIDUAL BORROWING REQUEST',
+                    f'Item: Benchmark Supply Item {i}',
+                    'Quantity: 1',
+                    'Requester: benchmark',
+                    f'ID: REQ-BENCH-{i:08d}',
+                ],
+                backend=backend,
+            ),
+        }
+
+        self.stdout.write(f'Rendering {count} codes per layout and backend')
+        self.stdout.write(f"{'layout':<10}{'backend':<10}{'ms/code':>10}{'avg bytes':>12}")
+
+        for layout, render in layouts.items():
+            for backend in backends:
+                # Start each run cold so cached matrices/labels don't skew results
+                qr_matrix.cache_clear()
+                _label_row.cache_clear()
+
+                total_bytes = 0
+                start = time.perf_counter()
+                for i in range(1, count + 1):
+                    total_bytes += len(render(i, backend))
+                elapsed = time.perf_counter() - start
+
+                self.stdout.write(
+                    f'{layout:<10}{backend:<10}{elapsed * 1000 / count:>10.2f}{total_bytes // count:>12}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('QR benchmark complete'))
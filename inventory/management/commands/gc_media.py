@@ -0,0 +1,198 @@
+import os
+import posixpath
+import shutil
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+
+from inventory.images import IMAGE_FIELDS, derivative_names
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete (or move to a quarantine directory) media files that no database row refers to, '
+        'such as QR codes of deleted supplies and regenerated request QR codes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report orphaned files without touching them (use -v 2 to list them)',
+        )
+        parser.add_argument(
+            '--quarantine',
+            metavar='DIR',
+            help='Move orphaned files under DIR (keeping their media path) instead of deleting them',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help='Keep files modified within this many seconds; they may belong to a save in progress (default: 3600)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Orphans re-checked against the database and removed per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--dir',
+            action='append',
+            default=[],
+            help='Extra directory under MEDIA_ROOT to collect (repeatable); upload directories are always included',
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, FileSystemStorage):
+            raise CommandError('gc_media only supports file system storage')
+
+        self.root = os.path.abspath(settings.MEDIA_ROOT)
+        self.options = options
+        self.quarantine = os.path.abspath(options['quarantine']) if options['quarantine'] else None
+        self.file_fields = [
+            (model, field.name)
+            for model in apps.get_models()
+            for field in model._meta.get_fields()
+            if isinstance(field, models.FileField)
+        ]
+        directories = sorted({
+            field.upload_to.strip('/').split('/')[0]
+            for model in apps.get_models()
+            for field in model._meta.get_fields()
+            if isinstance(field, models.FileField) and isinstance(field.upload_to, str) and field.upload_to.strip('/')
+        } | {directory.strip('/') for directory in options['dir']})
+
+        started = time.perf_counter()
+        referenced = self.referenced_names()
+        self.stdout.write(f'{len(referenced)} file(s) referenced by the database')
+
+        cutoff = time.time() - options['min_age']
+        self.stats = {}
+        batch = []
+        for directory in directories:
+            stats = self.stats[directory] = {'scanned': 0, 'recent': 0, 'orphaned': 0, 'bytes': 0}
+            for name, size, mtime in self.walk(directory):
+                stats['scanned'] += 1
+                if name in referenced:
+                    continue
+                if mtime > cutoff:
+                    stats['recent'] += 1
+                    continue
+                batch.append((directory, name, size))
+                if len(batch) >= options['batch_size']:
+                    self.collect(batch)
+                    batch = []
+        if batch:
+            self.collect(batch)
+
+        self.report(time.perf_counter() - started)
+
+    def referenced_names(self):
+        """Every media name stored in a file field, plus the resized copies of images"""
+        referenced = set()
+        for model, field_name in self.file_fields:
+            names = (
+                model.objects
+                .exclude(**{f'{field_name}__isnull': True})
+                .exclude(**{field_name: ''})
+                .values_list(field_name, flat=True)
+            )
+            referenced.update(names.iterator(chunk_size=2000))
+        for model, field_name, variants_field in self.variant_fields():
+            for variants in model.objects.exclude(**{variants_field: {}}).values_list(variants_field, flat=True).iterator(chunk_size=2000):
+                referenced.update(derivative_names(variants))
+        return referenced
+
+    def variant_fields(self):
+        for model in apps.get_app_config('inventory').get_models():
+            for field_name, variants_field in IMAGE_FIELDS.get(model.__name__, {}).items():
+                yield model, field_name, variants_field
+
+    def walk(self, directory):
+        """``(name, size, mtime)`` for every regular file under ``directory``, via os.scandir"""
+        pending = [os.path.join(self.root, directory)]
+        while pending:
+            path = pending.pop()
+            if self.quarantine and os.path.abspath(path) == self.quarantine:
+                continue
+            try:
+                entries = os.scandir(path)
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        name = os.path.relpath(entry.path, self.root).replace(os.sep, '/')
+                        yield name, stat.st_size, stat.st_mtime
+
+    def still_referenced(self, names):
+        """Names in ``names`` that a row started pointing at since the initial scan"""
+        found = set()
+        for model, field_name in self.file_fields:
+            found.update(model.objects.filter(**{f'{field_name}__in': names}).values_list(field_name, flat=True))
+        # Resized copies are checked through the image they were made from
+        sources = {
+            posixpath.join(posixpath.dirname(posixpath.dirname(name)), posixpath.basename(name).rsplit('.', 2)[0])
+            for name in names if '/derivatives/' in name
+        }
+        if sources:
+            for model, field_name, variants_field in self.variant_fields():
+                rows = model.objects.filter(**{f'{field_name}__in': sources}).values_list(variants_field, flat=True)
+                for variants in rows:
+                    found.update(derivative_names(variants))
+        return found
+
+    def collect(self, batch):
+        keep = self.still_referenced([name for _, name, _ in batch])
+        for directory, name, size in batch:
+            if name in keep:
+                continue
+            stats = self.stats[directory]
+            path = os.path.join(self.root, name)
+            if self.options['dry_run']:
+                if self.options['verbosity'] >= 2:
+                    self.stdout.write(f'  orphan: {name} ({size} bytes)')
+            else:
+                try:
+                    if self.quarantine:
+                        target = os.path.join(self.quarantine, name)
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        shutil.move(path, target)
+                    else:
+                        os.remove(path)
+                except FileNotFoundError:
+                    continue
+            stats['orphaned'] += 1
+            stats['bytes'] += size
+        if not self.options['dry_run'] and self.options['verbosity'] >= 1:
+            action = 'quarantined' if self.quarantine else 'deleted'
+            total = sum(stats['orphaned'] for stats in self.stats.values())
+            self.stdout.write(f'  {total} file(s) {action} so far')
+
+    def report(self, elapsed):
+        if self.options['dry_run']:
+            action = 'would be removed'
+        elif self.quarantine:
+            action = f'moved to {self.quarantine}'
+        else:
+            action = 'deleted'
+        self.stdout.write(f"{'directory':<24}{'scanned':>10}{'orphaned':>10}{'MB':>10}{'too new':>10}")
+        for directory, stats in self.stats.items():
+            self.stdout.write(
+                f"{directory:<24}{stats['scanned']:>10}{stats['orphaned']:>10}"
+                f"{stats['bytes'] / (1024 * 1024):>10.1f}{stats['recent']:>10}"
+            )
+        orphaned = sum(stats['orphaned'] for stats in self.stats.values())
+        size = sum(stats['bytes'] for stats in self.stats.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{orphaned} orphaned file(s), {size / (1024 * 1024):.1f} MB {action} in {elapsed:.1f}s'
+        ))
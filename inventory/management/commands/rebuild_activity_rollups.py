@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.rollups import rebuild_activity_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily user and supply activity rollups from the raw requests and borrows'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = rebuild_activity_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows} activity row(s) in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,61 @@
+import posixpath
+
+from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
+from django.http import Http404
+from django.views.decorators.http import require_safe
+
+from .file_serving import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, serve_file
+from .models import SupplyRequest
+
+# Uploaded photos may be re-encoded in place right after upload, so keep
+# browser copies briefly and revalidate against the ETag after that
+IMAGE_CACHE_CONTROL = 'private, max-age=3600'
+
+
+def _can_view_borrowing_qr(user, name):
+    if user.role in ['admin', 'gso_staff']:
+        return True
+    # Batch requests share one file, so any of the user's requests may point at it
+    return SupplyRequest.objects.filter(user=user, borrowing_qr_code=name).exists()
+
+
+def _is_staff(user, name):
+    return user.role in ['admin', 'gso_staff']
+
+
+def _any_user(user, name):
+    return True
+
+
+# Top-level media directory -> (access check, Cache-Control). Stored QR codes
+# are never overwritten (storage picks a new name instead), so they are
+# cached for good.
+MEDIA_ACCESS = {
+    'supply_images': (_any_user, IMAGE_CACHE_CONTROL),
+    'profile_pictures': (_any_user, IMAGE_CACHE_CONTROL),
+    'profile_pics': (_any_user, IMAGE_CACHE_CONTROL),
+    'qr_codes': (_any_user, IMMUTABLE_CACHE_CONTROL),
+    'borrowing_qr_codes': (_can_view_borrowing_qr, IMMUTABLE_CACHE_CONTROL),
+    'exports': (_is_staff, REVALIDATE_CACHE_CONTROL),
+}
+
+
+@login_required
+@require_safe
+def protected_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT after checking the user may see it. Unknown
+    directories and files the user may not see both answer 404.
+    """
+    name = posixpath.normpath(path)
+    if name.startswith(('/', '..')) or name == '.':
+        raise Http404('File not found')
+
+    directory = name.split('/', 1)[0]
+    if directory not in MEDIA_ACCESS:
+        raise Http404('File not found')
+    can_view, cache_control = MEDIA_ACCESS[directory]
+    if not can_view(request.user, name):
+        raise Http404('File not found')
+    return serve_file(request, default_storage, name, cache_control=cache_control)
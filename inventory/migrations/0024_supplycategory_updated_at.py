@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0023_supply_image_variants_user_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplycategory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
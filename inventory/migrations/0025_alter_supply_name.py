@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0024_supplycategory_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='supply',
+            name='name',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:42
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+# A frozen copy of the counters as rollups.py defined them for this migration
+REQUEST_STATUS_FIELDS = {
+    'pending': 'pending_requests',
+    'approved': 'approved_requests',
+    'released': 'released_requests',
+    'rejected': 'rejected_requests',
+}
+GRANTED_STATUSES = ('approved', 'released')
+COUNTER_FIELDS = (
+    'requests', 'pending_requests', 'approved_requests', 'released_requests', 'rejected_requests',
+    'quantity_requested', 'approved_quantity', 'borrows', 'returns', 'quantity_borrowed',
+)
+
+
+def backfill_activity_rollups(apps, schema_editor):
+    """Build the daily activity rows from the existing requests and borrows"""
+    SupplyRequest = apps.get_model('inventory', 'SupplyRequest')
+    BorrowedItem = apps.get_model('inventory', 'BorrowedItem')
+    UserDailyActivity = apps.get_model('inventory', 'UserDailyActivity')
+    SupplyDailyActivity = apps.get_model('inventory', 'SupplyDailyActivity')
+
+    for model, owner_field, borrower_field in (
+        (UserDailyActivity, 'user_id', 'borrower_id'),
+        (SupplyDailyActivity, 'supply_id', 'supply_id'),
+    ):
+        rows = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+        requests = (
+            SupplyRequest.objects.order_by()
+            .annotate(day=TruncDate('created_at'))
+            .values(owner_field, 'day', 'status')
+            .annotate(count=Count('pk'), quantity=Sum('quantity_requested'))
+        )
+        for group in requests:
+            row = rows[(group[owner_field], group['day'])]
+            row['requests'] += group['count']
+            row['quantity_requested'] += group['quantity']
+            if group['status'] in REQUEST_STATUS_FIELDS:
+                row[REQUEST_STATUS_FIELDS[group['status']]] += group['count']
+            if group['status'] in GRANTED_STATUSES:
+                row['approved_quantity'] += group['quantity']
+        borrows = (
+            BorrowedItem.objects.order_by()
+            .annotate(day=TruncDate('borrowed_at'))
+            .values(borrower_field, 'day')
+            .annotate(
+                count=Count('pk'),
+                returned=Count('pk', filter=Q(returned_at__isnull=False)),
+                quantity=Sum('borrowed_quantity'),
+            )
+        )
+        for group in borrows:
+            row = rows[(group[borrower_field], group['day'])]
+            row['borrows'] += group['count']
+            row['returns'] += group['returned']
+            row['quantity_borrowed'] += group['quantity']
+
+        model.objects.bulk_create(
+            [model(**{owner_field: owner_id, 'day': day}, **counters) for (owner_id, day), counters in rows.items()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0025_alter_supply_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplyDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('requests', models.IntegerField(default=0)),
+                ('pending_requests', models.IntegerField(default=0)),
+                ('approved_requests', models.IntegerField(default=0)),
+                ('released_requests', models.IntegerField(default=0)),
+                ('rejected_requests', models.IntegerField(default=0)),
+                ('quantity_requested', models.IntegerField(default=0)),
+                ('approved_quantity', models.IntegerField(default=0, help_text='Quantity of the approved and released requests')),
+                ('borrows', models.IntegerField(default=0)),
+                ('returns', models.IntegerField(default=0)),
+                ('quantity_borrowed', models.IntegerField(default=0)),
+                ('supply', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='inventory.supply')),
+            ],
+            options={
+                'verbose_name_plural': 'Supply Daily Activity',
+                'indexes': [models.Index(fields=['day'], name='inventory_s_day_fc8c8d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('supply', 'day'), name='unique_supply_daily_activity')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('requests', models.IntegerField(default=0)),
+                ('pending_requests', models.IntegerField(default=0)),
+                ('approved_requests', models.IntegerField(default=0)),
+                ('released_requests', models.IntegerField(default=0)),
+                ('rejected_requests', models.IntegerField(default=0)),
+                ('quantity_requested', models.IntegerField(default=0)),
+                ('approved_quantity', models.IntegerField(default=0, help_text='Quantity of the approved and released requests')),
+                ('borrows', models.IntegerField(default=0)),
+                ('returns', models.IntegerField(default=0)),
+                ('quantity_borrowed', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'User Daily Activity',
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='unique_user_daily_activity')],
+            },
+        ),
+        migrations.RunPython(backfill_activity_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:07
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0026_supplydailyactivity_userdailyactivity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supply',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='supply_name_lower_idx'),
+        ),
+    ]
@@ -1,14 +1,16 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 import math
-import qrcode
-from io import BytesIO
-from django.core.files import File
-from PIL import Image, ImageDraw
 import uuid
 
+from .qr_rendering import (
+    render_request_qr, render_supply_qr, request_qr_spec,
+    store_request_qr, store_supply_qr,
+)
+
 class User(AbstractUser):
     ROLE_CHOICES = [
         ('admin', 'Admin'),
@@ -27,6 +29,9 @@ class User(AbstractUser):
     phone = models.CharField(max_length=20, blank=True, null=True)
     approval_status = models.CharField(max_length=20, choices=APPROVAL_STATUS_CHOICES, default='approved')
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    # Resized copies of profile_picture, filled in by inventory.images
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
@@ -44,6 +49,7 @@ class SupplyCategory(models.Model):
     description = models.TextField(blank=True)
     is_material = models.BooleanField(default=False, help_text='Mark category as materials (e.g., tables, chairs) so they can be borrowed as equipment')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name_plural = "Supply Categories"
@@ -52,7 +58,8 @@ class SupplyCategory(models.Model):
         return self.name
 
 class Supply(models.Model):
-    name = models.CharField(max_length=200)
+    # Indexed for the pickers' prefix search and name ordering
+    name = models.CharField(max_length=200, db_index=True)
     description = models.TextField()
     category = models.ForeignKey(SupplyCategory, on_delete=models.CASCADE, related_name='supplies')
     quantity = models.PositiveIntegerField(default=0)
@@ -61,6 +68,8 @@ class Supply(models.Model):
     cost_per_unit = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True)
     image = models.ImageField(upload_to='supply_images/', blank=True, null=True, help_text="Product image or photo")
+    # Resized copies of image, filled in by inventory.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     location = models.CharField(max_length=100, default='Main Storage')
     is_consumable = models.BooleanField(default=False, help_text="Check if this item is consumable (e.g., paper, pens). Unchecked means non-consumable (e.g., equipment)")
     serial_number = models.CharField(max_length=100, blank=True, null=True, help_text="Serial number or code for tracking")
@@ -71,6 +80,10 @@ class Supply(models.Model):
     
     class Meta:
         verbose_name_plural = "Supplies"
+        indexes = [
+            # Range scans for the pickers' case-insensitive prefix search
+            models.Index(Lower('name'), name='supply_name_lower_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.quantity} {self.unit})"
@@ -90,42 +103,7 @@ class Supply(models.Model):
     
     def generate_qr_code(self):
         if not self.qr_code:
-            qr_data = f"SUPPLY-{self.id}-{self.name}"
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Convert PIL image to RGB if it's not already
-            img = img.convert('RGB') if hasattr(img, 'convert') else img
-            
-            # Get the size of the QR code image
-            img_width, img_height = img.size
-            
-            # Create a canvas with enough space for the QR code and text
-            canvas_width = max(300, img_width + 100)
-            canvas_height = img_height + 100
-            canvas = Image.new('RGB', (canvas_width, canvas_height), 'white')
-            draw = ImageDraw.Draw(canvas)
-            
-            # Center the QR code on the canvas
-            x_offset = (canvas_width - img_width) // 2
-            y_offset = 20
-            canvas.paste(img, (x_offset, y_offset))
-            
-            # Add supply name and ID
-            text_y = y_offset + img_height + 10
-            draw.text((20, text_y), f"{self.name[:30]}...", fill='black')
-            draw.text((20, text_y + 20), f"ID: {self.id}", fill='black')
-            
-            buffer = BytesIO()
-            canvas.save(buffer, 'PNG')
-            buffer.seek(0)
-            
-            filename = f'supply_{self.id}_qr.png'
-            self.qr_code.save(filename, File(buffer), save=False)
-            self.save()
+            store_supply_qr(self, render_supply_qr(self.id, self.name))
 
 class SupplyRequest(models.Model):
     STATUS_CHOICES = [
@@ -162,72 +140,17 @@ class SupplyRequest(models.Model):
             self.request_id = f"REQ-{timezone.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
         super().save(*args, **kwargs)
     
-    def generate_borrowing_qr_code(self, group_id=None):
+    def generate_borrowing_qr_code(self, group_id=None, batch_ids=None):
         """
         Generate a QR code for requests. Supports single and batch requests,
         both for borrowing and consumable supplies.
+
+        Renders synchronously; use ``qr_rendering.queue_request_qr`` to render
+        off the request path.
         """
-        is_borrowing = self.purpose.startswith('[BORROWING]')
-        prefix = "BORROW" if is_borrowing else "SUPPLY-REQ"
-        
-        # Create QR code data
-        if group_id:
-            qr_data = f"{prefix}-BATCH-{group_id}"
-            label_id = f"Batch: {group_id}"
-        else:
-            qr_data = f"{prefix}-{self.id}-{self.user.id}-{self.supply.id}"
-            label_id = f"Request ID: {self.request_id}"
-        
-        # Generate QR code
-        qr = qrcode.QRCode(version=1, box_size=20, border=5)
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert PIL image to RGB if it's not already
-        img = img.convert('RGB') if hasattr(img, 'convert') else img
-        
-        # Get the size of the QR code image
-        img_width, img_height = img.size
-        
-        # Create a canvas with enough space for the QR code and text
-        canvas_width = max(500, img_width + 100)
-        canvas_height = img_height + (150 if not group_id else 120)
-        canvas = Image.new('RGB', (canvas_width, canvas_height), 'white')
-        draw = ImageDraw.Draw(canvas)
-        
-        # Center the QR code on the canvas
-        x_offset = (canvas_width - img_width) // 2
-        y_offset = 20
-        canvas.paste(img, (x_offset, y_offset))
-        
-        # Add request details
-        text_y = y_offset + img_height + 20
-        if group_id:
-            msg = "BATCH BORROWING REQUEST" if is_borrowing else "BATCH SUPPLY REQUEST"
-            draw.text((40, text_y), msg, fill='black')
-            draw.text((40, text_y + 25), f"Group ID: {group_id}", fill='black')
-            draw.text((40, text_y + 50), f"Requested by: {self.user.username}", fill='black')
-        else:
-            msg = "INDIVIDUAL BORROWING REQUEST" if is_borrowing else "INDIVIDUAL SUPPLY REQUEST"
-            draw.text((40, text_y), msg, fill='black')
-            draw.text((40, text_y + 25), f"Item: {self.supply.name[:30]}", fill='black')
-            draw.text((40, text_y + 50), f"Quantity: {self.quantity_requested}", fill='black')
-            draw.text((40, text_y + 75), f"Requester: {self.user.username}", fill='black')
-            draw.text((40, text_y + 100), f"ID: {self.request_id}", fill='black')
-        
-        buffer = BytesIO()
-        canvas.save(buffer, 'PNG')
-        buffer.seek(0)
-        
-        if group_id:
-            filename = f'{"borrowing" if is_borrowing else "supply"}_batch_{group_id}_qr.png'
-        else:
-            filename = f'{"borrowing" if is_borrowing else "supply"}_{self.id}_qr.png'
-            
-        self.borrowing_qr_code.save(filename, File(buffer), save=False)
-        self.save()
+        spec = request_qr_spec(self, group_id=group_id)
+        png_bytes = render_request_qr(spec['qr_data'], spec['lines'], is_batch=spec['is_batch'])
+        store_request_qr(self, spec, png_bytes, batch_ids=batch_ids)
 
 class QRScanLog(models.Model):
     ACTION_CHOICES = [
@@ -492,3 +415,123 @@ class MostRequestedItem(models.Model):
     
     def __str__(self):
         return f"{self.supply.name} - Requests: {self.request_count}, Borrows: {self.borrow_count}"
+
+class DailyActivity(models.Model):
+    """
+    Requests made and items borrowed on one day, kept up to date as their
+    status changes (see rollups.py). Counters are signed so a correction
+    applied to a row that predates the rollups never fails a write.
+    """
+    day = models.DateField()
+    requests = models.IntegerField(default=0)
+    pending_requests = models.IntegerField(default=0)
+    approved_requests = models.IntegerField(default=0)
+    released_requests = models.IntegerField(default=0)
+    rejected_requests = models.IntegerField(default=0)
+    quantity_requested = models.IntegerField(default=0)
+    approved_quantity = models.IntegerField(default=0, help_text="Quantity of the approved and released requests")
+    borrows = models.IntegerField(default=0)
+    returns = models.IntegerField(default=0)
+    quantity_borrowed = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+class UserDailyActivity(DailyActivity):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activity')
+
+    class Meta:
+        verbose_name_plural = "User Daily Activity"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_user_daily_activity'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} on {self.day}"
+
+class SupplyDailyActivity(DailyActivity):
+    supply = models.ForeignKey(Supply, on_delete=models.CASCADE, related_name='daily_activity')
+
+    class Meta:
+        verbose_name_plural = "Supply Daily Activity"
+        constraints = [
+            models.UniqueConstraint(fields=['supply', 'day'], name='unique_supply_daily_activity'),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.supply.name} on {self.day}"
+
+class ExportJob(models.Model):
+    """
+    A report export rendered in the background. Finished artifacts are reused
+    by later jobs with the same report, format, filters and data version.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    report_type = models.CharField(max_length=30)
+    export_format = models.CharField(max_length=10)
+    params = models.JSONField(default=dict, blank=True)
+    cache_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    rows_done = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', blank=True, null=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.report_type} {self.export_format} export ({self.status})"
+
+    @property
+    def progress(self):
+        """Percent complete, or None while the row count is unknown"""
+        if self.status == 'completed':
+            return 100
+        if not self.rows_total:
+            return None
+        return min(99, int(self.rows_done * 100 / self.rows_total))
+
+class ImportUpload(models.Model):
+    """
+    A supply CSV uploaded in resumable chunks. The bytes are appended to a part
+    file under IMPORT_UPLOAD_DIR and parsed in the background once complete.
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    bytes_processed = models.BigIntegerField(default=0)
+    rows_processed = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
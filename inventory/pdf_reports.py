@@ -0,0 +1,200 @@
+"""
+Tabular PDF report engine.
+
+Tables are drawn straight onto the reportlab canvas one fixed-height row at
+a time and paginated here, instead of handing a single platypus ``Table``
+with every row to ``doc.build``. Rows can come from a queryset iterator,
+each page is compressed as soon as it is full, and the output is spooled to
+a temporary file.
+
+reportlab still keeps every finished page until the document is saved
+(about 50 MB per 100k rows), so a table stops after PDF_MAX_ROWS rows with
+a note pointing to the CSV/NDJSON exports, which stream any number of rows.
+"""
+import tempfile
+from itertools import islice
+
+from django.http import FileResponse
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+# Spooled output stays in memory up to this size, then moves to disk
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+MARGIN = 0.6 * inch
+ROW_HEIGHT = 14
+HEADER_ROW_HEIGHT = 20
+FONT = 'Helvetica'
+FONT_BOLD = 'Helvetica-Bold'
+BODY_FONT_SIZE = 8
+HEADER_FONT_SIZE = 10
+# Rows a table draws before it is cut off, which caps a report's memory
+PDF_MAX_ROWS = 20000
+
+
+def fit_text(text, font, size, max_width):
+    """Truncate ``text`` with an ellipsis so it fits within ``max_width`` points"""
+    if stringWidth(text, font, size) <= max_width:
+        return text
+    # Bisect on the longest prefix that still fits with the ellipsis
+    low, high = 0, len(text) - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if stringWidth(text[:middle] + '...', font, size) <= max_width:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + '...'
+
+
+class PDFReport:
+    """
+    Tabular PDF report drawn page by page.
+
+    Usage::
+
+        report = PDFReport('Supplies Report', subtitle='Filters Applied: ...')
+        report.table([('ID', 1), ('Name', 3)], rows)
+        return report.response('supplies_report.pdf')
+    """
+
+    def __init__(self, title, pagesize=A4, subtitle=None, title_size=18,
+                 header_color=colors.grey, body_color=colors.beige, grid_color=colors.black):
+        self.title = title
+        self.pagesize = pagesize
+        self.header_color = header_color
+        self.body_color = body_color
+        self.grid_color = grid_color
+        self.output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self.canvas = canvas.Canvas(self.output, pagesize=pagesize, pageCompression=1)
+        self.canvas.setTitle(title)
+        self.page_number = 1
+        self.width, self.height = pagesize
+        self.y = self.height - MARGIN
+
+        # Title block on the first page only
+        self.canvas.setFont(FONT_BOLD, title_size)
+        self.canvas.drawCentredString(self.width / 2, self.y - title_size, title)
+        self.y -= title_size + 24
+        if subtitle:
+            self.canvas.setFont(FONT, 10)
+            self.canvas.drawString(MARGIN, self.y - 10, fit_text(subtitle, FONT, 10, self.width - 2 * MARGIN))
+            self.y -= 24
+
+    def _footer(self):
+        self.canvas.setFont(FONT, 8)
+        self.canvas.setFillColor(colors.grey)
+        self.canvas.drawRightString(
+            self.width - MARGIN, MARGIN / 2, f'{self.title} - Page {self.page_number}'
+        )
+        self.canvas.setFillColor(colors.black)
+
+    def _new_page(self):
+        self._footer()
+        self.canvas.showPage()
+        self.page_number += 1
+        self.y = self.height - MARGIN
+
+    def heading(self, text, size=13):
+        """Section heading; starts a new page if there is no room for it and a few rows"""
+        if self.y - size - 8 - HEADER_ROW_HEIGHT - 3 * ROW_HEIGHT < MARGIN:
+            self._new_page()
+        self.canvas.setFont(FONT_BOLD, size)
+        self.canvas.drawString(MARGIN, self.y - size, text)
+        self.y -= size + 10
+
+    def spacer(self, height=12):
+        self.y -= height
+
+    def _draw_row(self, cells, widths, height, font, size, fill, text_color):
+        bottom = self.y - height
+        # One filled and stroked rect per row; column rules are drawn per page segment
+        self.canvas.setFillColor(fill if fill is not None else colors.white)
+        self.canvas.rect(MARGIN, bottom, sum(widths), height, stroke=1, fill=1)
+        self.canvas.setFillColor(text_color)
+        self.canvas.setFont(font, size)
+        text_y = bottom + (height - size) / 2 + 1
+        x = MARGIN
+        for cell, width in zip(cells, widths):
+            text = fit_text(str(cell), font, size, width - 4)
+            self.canvas.drawString(x + (width - stringWidth(text, font, size)) / 2, text_y, text)
+            x += width
+        self.y = bottom
+
+    def _draw_column_rules(self, widths, top):
+        """Vertical grid lines between columns from ``top`` down to the current row"""
+        x = MARGIN
+        lines = []
+        for width in widths[:-1]:
+            x += width
+            lines.append((x, top, x, self.y))
+        if lines:
+            self.canvas.lines(lines)
+
+    def table(self, columns, rows, max_rows=PDF_MAX_ROWS):
+        """
+        Draw a table. ``columns`` is a list of ``(header, weight)`` pairs; the
+        weights share out the printable width. ``rows`` may be any iterable of
+        cell sequences - it is consumed one row at a time, up to ``max_rows``;
+        a note under the table says when rows were left out. The header row is
+        repeated on every page. Returns the number of rows drawn.
+        """
+        rows = iter(rows)
+        available = self.width - 2 * MARGIN
+        total_weight = sum(weight for _, weight in columns)
+        widths = [available * weight / total_weight for _, weight in columns]
+        headers = [header for header, _ in columns]
+
+        def draw_header():
+            top = self.y
+            self._draw_row(headers, widths, HEADER_ROW_HEIGHT, FONT_BOLD, HEADER_FONT_SIZE,
+                           self.header_color, colors.whitesmoke)
+            return top
+
+        self.canvas.setStrokeColor(self.grid_color)
+        if self.y - HEADER_ROW_HEIGHT - ROW_HEIGHT < MARGIN:
+            self._new_page()
+        segment_top = draw_header()
+
+        count = 0
+        for count, row in enumerate(islice(rows, max_rows), start=1):
+            if self.y - ROW_HEIGHT < MARGIN:
+                self._draw_column_rules(widths, segment_top)
+                self._new_page()
+                self.canvas.setStrokeColor(self.grid_color)
+                segment_top = draw_header()
+            self._draw_row(row, widths, ROW_HEIGHT, FONT, BODY_FONT_SIZE, self.body_color, colors.black)
+
+        if count == 0:
+            self._draw_column_rules(widths, segment_top)
+            self._draw_row(['No records found'], [available], ROW_HEIGHT, FONT, BODY_FONT_SIZE,
+                           self.body_color, colors.black)
+        else:
+            self._draw_column_rules(widths, segment_top)
+        self.canvas.setFillColor(colors.black)
+        if count == max_rows and next(rows, None) is not None:
+            if self.y - ROW_HEIGHT - 4 < MARGIN:
+                self._new_page()
+            self.canvas.setFont(FONT_BOLD, BODY_FONT_SIZE)
+            self.canvas.drawString(
+                MARGIN, self.y - ROW_HEIGHT,
+                f'Only the first {max_rows:,} rows are shown. Export as CSV or NDJSON for the full report.'
+            )
+            self.y -= ROW_HEIGHT + 4
+        return count
+
+    def finish(self):
+        """Close the document and return the spooled file, rewound"""
+        self._footer()
+        self.canvas.showPage()
+        self.canvas.save()
+        self.output.seek(0)
+        return self.output
+
+    def response(self, filename):
+        """Finish the document and stream it back as an attachment"""
+        return FileResponse(self.finish(), as_attachment=True, filename=filename,
+                            content_type='application/pdf')
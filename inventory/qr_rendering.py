@@ -0,0 +1,474 @@
+"""
+QR code rendering and background rendering pools.
+
+The render functions in this module are pure (plain arguments in, PNG bytes
+out) so they can run in a worker thread on the request path or be fanned out
+across cores with a process pool for bulk jobs. Results are written back to
+the database with single-column updates instead of full model saves.
+
+Two rendering backends produce the same layout:
+
+- ``numpy``: upscales the QR module matrix with NumPy, composites cached
+  label rows and encodes a 1-bit PNG. Default when NumPy is installed.
+- ``pil``: draws through the qrcode PIL factory onto an RGB canvas.
+"""
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+import qrcode
+from PIL import Image, ImageDraw
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+
+from .background import run_after_commit
+from .table_versions import bump_table_versions
+
+# Optional NumPy import for the vectorized renderer
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError as e:
+    NUMPY_AVAILABLE = False
+    print(f"[WARNING] NumPy not available, using PIL QR renderer: {type(e).__name__}: {e}")
+
+
+_process_pool = None
+_pool_lock = threading.Lock()
+
+# Supplies rendered per process-pool task, and written back per bulk_update
+RENDER_CHUNK_SIZE = 50
+BULK_BATCH_SIZE = 500
+
+
+# ---------------------------------------------------------------------------
+# Pure renderers
+# ---------------------------------------------------------------------------
+
+def supply_qr_payload(supply_id, name):
+    """QR payload encoded for a supply item"""
+    return f"SUPPLY-{supply_id}-{name}"
+
+
+def supply_qr_filename(supply_id):
+    return f'supply_{supply_id}_qr.png'
+
+
+def supply_qr_lines(supply_id, name):
+    """Label lines drawn under a supply QR code"""
+    return [f"{name[:30]}...", f"ID: {supply_id}"]
+
+
+def supply_qr_spec(supply):
+    """Render arguments for a supply QR code, in the same shape as ``request_qr_spec``"""
+    return {
+        'qr_data': supply_qr_payload(supply.pk, supply.name),
+        'lines': supply_qr_lines(supply.pk, supply.name),
+        'layout': 'supply',
+        'is_batch': False,
+        'filename': supply_qr_filename(supply.pk),
+    }
+
+
+def request_group_id(supply_request):
+    """Group id shared by requests submitted together (same user, same minute)"""
+    return f"{supply_request.user_id}-{supply_request.created_at.strftime('%Y%m%d%H%M')}"
+
+
+def request_qr_spec(supply_request, group_id=None):
+    """
+    Build the render arguments for a request QR code.
+
+    Returns a dict with the QR payload, the label lines drawn under the code,
+    the layout name, whether it is a batch code and the storage filename.
+    """
+    is_borrowing = supply_request.purpose.startswith('[BORROWING]')
+    prefix = "BORROW" if is_borrowing else "SUPPLY-REQ"
+    kind = "borrowing" if is_borrowing else "supply"
+
+    if group_id:
+        msg = "BATCH BORROWING REQUEST" if is_borrowing else "BATCH SUPPLY REQUEST"
+        return {
+            'qr_data': f"{prefix}-BATCH-{group_id}",
+            'lines': [
+                msg,
+                f"Group ID: {group_id}",
+                f"Requested by: {supply_request.user.username}",
+            ],
+            'layout': 'request_batch',
+            'is_batch': True,
+            'filename': f'{kind}_batch_{group_id}_qr.png',
+        }
+
+    msg = "INDIVIDUAL BORROWING REQUEST" if is_borrowing else "INDIVIDUAL SUPPLY REQUEST"
+    return {
+        'qr_data': f"{prefix}-{supply_request.id}-{supply_request.user_id}-{supply_request.supply_id}",
+        'lines': [
+            msg,
+            f"Item: {supply_request.supply.name[:30]}",
+            f"Quantity: {supply_request.quantity_requested}",
+            f"Requester: {supply_request.user.username}",
+            f"ID: {supply_request.request_id}",
+        ],
+        'layout': 'request',
+        'is_batch': False,
+        'filename': f'{kind}_{supply_request.id}_qr.png',
+    }
+
+
+# Canvas layout per kind of code, shared by every renderer
+QR_LAYOUTS = {
+    'supply': {
+        'box_size': 10, 'min_width': 300, 'extra_height': 100,
+        'text_gap': 10, 'text_x': 20, 'line_height': 20,
+    },
+    'request': {
+        'box_size': 20, 'min_width': 500, 'extra_height': 150,
+        'text_gap': 20, 'text_x': 40, 'line_height': 25,
+    },
+    'request_batch': {
+        'box_size': 20, 'min_width': 500, 'extra_height': 120,
+        'text_gap': 20, 'text_x': 40, 'line_height': 25,
+    },
+}
+
+# Bump when the rendered output changes so content-addressed URLs change too
+QR_LAYOUT_VERSION = 1
+
+
+@lru_cache(maxsize=1024)
+def qr_matrix(data, border=5):
+    """
+    Module matrix for ``data`` as a tuple of rows of booleans (True = dark),
+    including a quiet zone of ``border`` modules.
+    """
+    qr = qrcode.QRCode(version=1, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return tuple(tuple(row) for row in qr.get_matrix())
+
+
+def _layout_geometry(modules, layout):
+    """Canvas size and QR/label offsets for a matrix of ``modules`` rows"""
+    img_size = modules * layout['box_size']
+    canvas_width = max(layout['min_width'], img_size + 100)
+    canvas_height = img_size + layout['extra_height']
+    x_offset = (canvas_width - img_size) // 2
+    y_offset = 20
+    text_y = y_offset + img_size + layout['text_gap']
+    return canvas_width, canvas_height, x_offset, y_offset, text_y
+
+
+def _render_png_pil(qr_data, lines, layout):
+    qr = qrcode.QRCode(version=1, box_size=layout['box_size'], border=5)
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    # Convert PIL image to RGB if it's not already
+    img = img.convert('RGB') if hasattr(img, 'convert') else img
+
+    # Create a canvas with enough space for the QR code and text
+    canvas_width, canvas_height, x_offset, y_offset, text_y = _layout_geometry(
+        img.size[1] // layout['box_size'], layout
+    )
+    canvas = Image.new('RGB', (canvas_width, canvas_height), 'white')
+    draw = ImageDraw.Draw(canvas)
+
+    # Center the QR code on the canvas
+    canvas.paste(img, (x_offset, y_offset))
+
+    # Add label lines
+    for index, line in enumerate(lines):
+        draw.text((layout['text_x'], text_y + layout['line_height'] * index), line, fill='black')
+
+    buffer = BytesIO()
+    canvas.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=1024)
+def _label_row(text, width, height, x):
+    """
+    One line of label text as a read-only 1-bit array (True = white). Rows are
+    cached because headers, usernames and item names repeat across codes.
+    """
+    strip = Image.new('1', (width, height), 1)
+    ImageDraw.Draw(strip).text((x, 0), text, fill=0)
+    row = np.asarray(strip, dtype=bool)
+    row.flags.writeable = False
+    return row
+
+
+def _render_png_numpy(qr_data, lines, layout):
+    modules = np.asarray(qr_matrix(qr_data), dtype=bool)
+    box_size = layout['box_size']
+    qr_pixels = np.repeat(np.repeat(modules, box_size, axis=0), box_size, axis=1)
+    img_size = qr_pixels.shape[0]
+    canvas_width, canvas_height, x_offset, y_offset, text_y = _layout_geometry(len(modules), layout)
+
+    # Center the QR code on the canvas (1-bit: True is white)
+    canvas = np.ones((canvas_height, canvas_width), dtype=bool)
+    canvas[y_offset:y_offset + img_size, x_offset:x_offset + img_size] = ~qr_pixels
+
+    line_height = layout['line_height']
+    for index, line in enumerate(lines):
+        top = text_y + line_height * index
+        if top >= canvas_height:
+            break
+        row = _label_row(line, canvas_width, line_height, layout['text_x'])
+        canvas[top:top + line_height] = row[:canvas_height - top]
+
+    buffer = BytesIO()
+    Image.fromarray(canvas).save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+RENDER_BACKENDS = {
+    'pil': _render_png_pil,
+}
+if NUMPY_AVAILABLE:
+    RENDER_BACKENDS['numpy'] = _render_png_numpy
+
+
+def get_render_backend(backend=None):
+    """
+    Resolve a backend name (argument, then the QR_RENDER_BACKEND setting)
+    to its ``(qr_data, lines, layout) -> PNG bytes`` renderer.
+    """
+    backend = backend or getattr(settings, 'QR_RENDER_BACKEND', None)
+    if backend is None:
+        backend = 'numpy' if NUMPY_AVAILABLE else 'pil'
+    if backend not in RENDER_BACKENDS:
+        print(f"[WARNING] QR render backend '{backend}' not available, using PIL")
+        backend = 'pil'
+    return RENDER_BACKENDS[backend]
+
+
+def render_qr_png(qr_data, lines, layout, backend=None):
+    """Render a labelled QR code with the named layout and return PNG bytes"""
+    return get_render_backend(backend)(qr_data, tuple(lines), QR_LAYOUTS[layout])
+
+
+def render_supply_qr(supply_id, name, backend=None):
+    """Render the labelled QR image for a supply and return PNG bytes"""
+    return render_qr_png(
+        supply_qr_payload(supply_id, name), supply_qr_lines(supply_id, name), 'supply', backend=backend
+    )
+
+
+def render_request_qr(qr_data, lines, is_batch=False, backend=None):
+    """Render the labelled QR image for a supply/borrowing request and return PNG bytes"""
+    return render_qr_png(qr_data, lines, 'request_batch' if is_batch else 'request', backend=backend)
+
+
+def render_qr_svg(qr_data, lines, layout):
+    """
+    Render a labelled QR code with the named layout as SVG. Dark modules are
+    merged into horizontal runs so each row is a handful of path segments.
+    """
+    layout = QR_LAYOUTS[layout]
+    modules = qr_matrix(qr_data)
+    box_size = layout['box_size']
+    canvas_width, canvas_height, x_offset, y_offset, text_y = _layout_geometry(len(modules), layout)
+
+    segments = []
+    for row_index, row in enumerate(modules):
+        y = y_offset + row_index * box_size
+        col = 0
+        while col < len(row):
+            if not row[col]:
+                col += 1
+                continue
+            start = col
+            while col < len(row) and row[col]:
+                col += 1
+            width = (col - start) * box_size
+            segments.append(f"M{x_offset + start * box_size} {y}h{width}v{box_size}h-{width}z")
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{canvas_width}" height="{canvas_height}" '
+        f'viewBox="0 0 {canvas_width} {canvas_height}" shape-rendering="crispEdges">',
+        f'<rect width="{canvas_width}" height="{canvas_height}" fill="#fff"/>',
+        f'<path fill="#000" d="{"".join(segments)}"/>',
+    ]
+    for index, line in enumerate(lines):
+        parts.append(
+            f'<text x="{layout["text_x"]}" y="{text_y + layout["line_height"] * index}" '
+            f'dominant-baseline="hanging" font-family="monospace" font-size="11">{escape(line)}</text>'
+        )
+    parts.append('</svg>')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def qr_spec_digest(spec):
+    """Content hash of everything that affects the rendered image of ``spec``"""
+    key = json.dumps(
+        [QR_LAYOUT_VERSION, spec['layout'], spec['qr_data'], list(spec['lines'])],
+        separators=(',', ':')
+    )
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:20]
+
+
+def _render_supply_batch(rows):
+    """Process-pool entry point: render a list of (id, name) rows"""
+    return [(supply_id, render_supply_qr(supply_id, name)) for supply_id, name in rows]
+
+
+# ---------------------------------------------------------------------------
+# Pools
+# ---------------------------------------------------------------------------
+
+def get_process_pool():
+    """Shared process pool used to fan bulk QR rendering out across cores"""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            # spawn avoids forking a process that holds DB connections and threads
+            _process_pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'QR_RENDER_PROCESSES', None) or os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
+
+
+@atexit.register
+def _shutdown_pool():
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_in_background(func, *args):
+    """
+    Run ``func`` after the current transaction commits - in the thread pool when
+    QR_RENDER_ASYNC is enabled, inline otherwise.
+    """
+    def job():
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"[WARNING] QR rendering failed: {type(e).__name__}: {e}")
+
+    run_after_commit(
+        'qr-render', job,
+        async_setting='QR_RENDER_ASYNC', workers=getattr(settings, 'QR_RENDER_THREADS', 2),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Write-back
+# ---------------------------------------------------------------------------
+
+def store_supply_qr(supply, png_bytes):
+    """Save a rendered supply QR image and persist only the qr_code column"""
+    supply.qr_code.save(supply_qr_filename(supply.pk), ContentFile(png_bytes), save=False)
+    supply.save(update_fields=['qr_code'])
+
+
+def store_request_qr(supply_request, spec, png_bytes, batch_ids=None):
+    """
+    Save a rendered request QR image and point the request (and every other
+    request in ``batch_ids``) at it with a single-column update.
+    """
+    from .models import SupplyRequest
+
+    supply_request.borrowing_qr_code.save(spec['filename'], ContentFile(png_bytes), save=False)
+    supply_request.save(update_fields=['borrowing_qr_code'])
+    if batch_ids:
+        SupplyRequest.objects.filter(pk__in=batch_ids).exclude(pk=supply_request.pk).update(
+            borrowing_qr_code=supply_request.borrowing_qr_code.name
+        )
+        bump_table_versions(SupplyRequest)
+
+
+def _generate_supply_qr(supply_id):
+    from .models import Supply
+
+    supply = Supply.objects.filter(pk=supply_id).only('id', 'name', 'qr_code').first()
+    if supply is None or supply.qr_code:
+        return
+    store_supply_qr(supply, render_supply_qr(supply.pk, supply.name))
+
+
+def _generate_request_qr(request_id, group_id, batch_ids):
+    from .models import SupplyRequest
+
+    supply_request = SupplyRequest.objects.select_related('user', 'supply').filter(pk=request_id).first()
+    if supply_request is None:
+        return
+    spec = request_qr_spec(supply_request, group_id=group_id)
+    png_bytes = render_request_qr(spec['qr_data'], spec['lines'], is_batch=spec['is_batch'])
+    store_request_qr(supply_request, spec, png_bytes, batch_ids=batch_ids)
+
+
+def generate_supply_qr_codes(supply_ids):
+    """
+    Render QR codes for many supplies, fanning the rendering out to the process
+    pool and writing results back in batches. Returns the number generated.
+    """
+    from .models import Supply
+
+    rows = list(
+        Supply.objects.filter(pk__in=supply_ids)
+        .filter(Q(qr_code='') | Q(qr_code__isnull=True))
+        .order_by('pk')
+        .values_list('id', 'name')
+    )
+    if not rows:
+        return 0
+
+    chunks = [rows[i:i + RENDER_CHUNK_SIZE] for i in range(0, len(rows), RENDER_CHUNK_SIZE)]
+    if len(chunks) > 1 and getattr(settings, 'QR_RENDER_PROCESSES', None) != 0:
+        results = get_process_pool().map(_render_supply_batch, chunks)
+    else:
+        results = map(_render_supply_batch, chunks)
+
+    generated = 0
+    batch = []
+    for rendered in results:
+        for supply_id, png_bytes in rendered:
+            supply = Supply(pk=supply_id)
+            supply.qr_code.save(supply_qr_filename(supply_id), ContentFile(png_bytes), save=False)
+            batch.append(supply)
+        if len(batch) >= BULK_BATCH_SIZE:
+            Supply.objects.bulk_update(batch, ['qr_code'])
+            generated += len(batch)
+            batch = []
+    if batch:
+        Supply.objects.bulk_update(batch, ['qr_code'])
+        generated += len(batch)
+    if generated:
+        bump_table_versions(Supply)
+    return generated
+
+
+# ---------------------------------------------------------------------------
+# Request-path entry points
+# ---------------------------------------------------------------------------
+
+def queue_supply_qr(supply):
+    """Render a supply QR code in the background once the current transaction commits"""
+    _run_in_background(_generate_supply_qr, supply.pk)
+
+
+def queue_request_qr(supply_request, group_id=None, batch_ids=None):
+    """
+    Render a request QR code in the background once the current transaction
+    commits. For batch codes pass the ids of every request in the batch so
+    they all point at the same image.
+    """
+    _run_in_background(_generate_request_qr, supply_request.pk, group_id, list(batch_ids or []))
+
+
+def queue_supply_qr_bulk(supply_ids):
+    """Render QR codes for many supplies in the background (bulk generation and imports)"""
+    _run_in_background(generate_supply_qr_codes, list(supply_ids))
@@ -0,0 +1,148 @@
+from datetime import timedelta
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.shortcuts import redirect, get_object_or_404
+from django.utils import timezone
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from .label_sheets import (
+    DEFAULT_LABEL_TEMPLATE, LABEL_TEMPLATES, build_label_sheet, request_labels, supply_labels,
+)
+from .models import Supply, SupplyRequest
+from .qr_rendering import (
+    qr_spec_digest, render_qr_png, render_qr_svg,
+    request_group_id, request_qr_spec, supply_qr_spec,
+)
+
+# Rendered images are content-addressed, so they never go stale in the cache
+QR_IMAGE_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+QR_IMAGE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+QR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def is_batch_request(supply_request):
+    """True when other requests were submitted together with this one (same user, same minute)"""
+    minute = supply_request.created_at.replace(second=0, microsecond=0)
+    return SupplyRequest.objects.filter(
+        user_id=supply_request.user_id,
+        created_at__gte=minute,
+        created_at__lt=minute + timedelta(minutes=1)
+    ).count() > 1
+
+
+def qr_spec_for(obj, batch=None):
+    """Render spec for a Supply or SupplyRequest; ``batch`` skips the batch lookup when known"""
+    if isinstance(obj, Supply):
+        return supply_qr_spec(obj)
+    if batch is None:
+        batch = is_batch_request(obj)
+    return request_qr_spec(obj, group_id=request_group_id(obj) if batch else None)
+
+
+def qr_image_url(obj, fmt='png', batch=None):
+    """Content-addressed URL of the QR image for a Supply or SupplyRequest"""
+    kind = 'supply' if isinstance(obj, Supply) else 'request'
+    digest = qr_spec_digest(qr_spec_for(obj, batch=batch))
+    return reverse('qr_image', kwargs={'kind': kind, 'pk': obj.pk, 'digest': digest, 'fmt': fmt})
+
+
+@login_required
+@require_GET
+def qr_image(request, kind, pk, digest, fmt):
+    """
+    Serve a QR code image rendered on demand. The URL carries a hash of the
+    payload and label text, so responses are cached by content and carry a
+    strong ETag; stale links are redirected to the current image.
+    """
+    if fmt not in QR_CONTENT_TYPES:
+        raise Http404('Unknown QR image format')
+
+    if kind == 'supply':
+        obj = get_object_or_404(Supply.objects.only('id', 'name'), pk=pk)
+    elif kind == 'request':
+        obj = get_object_or_404(SupplyRequest.objects.select_related('user', 'supply'), pk=pk)
+        if request.user.role == 'department_user' and obj.user_id != request.user.id:
+            raise Http404('QR code not found')
+    else:
+        raise Http404('Unknown QR code type')
+
+    spec = qr_spec_for(obj)
+    current_digest = qr_spec_digest(spec)
+    if digest != current_digest:
+        return redirect(reverse('qr_image', kwargs={'kind': kind, 'pk': pk, 'digest': current_digest, 'fmt': fmt}))
+
+    etag = f'"{digest}.{fmt}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        cache_key = f'qr-image:{digest}.{fmt}'
+        content = cache.get(cache_key)
+        if content is None:
+            if fmt == 'svg':
+                content = render_qr_svg(spec['qr_data'], spec['lines'], spec['layout'])
+            else:
+                content = render_qr_png(spec['qr_data'], spec['lines'], spec['layout'])
+            cache.set(cache_key, content, QR_IMAGE_CACHE_TIMEOUT)
+
+        response = HttpResponse(content, content_type=QR_CONTENT_TYPES[fmt])
+        if request.GET.get('download'):
+            filename = spec['filename'].rsplit('.', 1)[0] + f'.{fmt}'
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    response['ETag'] = etag
+    response['Cache-Control'] = QR_IMAGE_CACHE_CONTROL
+    return response
+
+
+@login_required
+@require_GET
+def qr_label_sheet(request):
+    """
+    Printable PDF of QR labels on an Avery-style sheet.
+
+    ``kind=supply`` (default) prints one label per supply, ``kind=request``
+    one label per approved/released request or batch. Both can be filtered
+    by ``category`` (id) and ``location`` (contains). Runs longer than
+    LABEL_SEGMENT_PAGES pages come back as a ZIP of part PDFs.
+    """
+    if request.user.role not in ['admin', 'gso_staff']:
+        messages.error(request, 'You do not have permission to print QR labels.')
+        return redirect('supply_list')
+
+    template = request.GET.get('template', DEFAULT_LABEL_TEMPLATE)
+    if template not in LABEL_TEMPLATES:
+        template = DEFAULT_LABEL_TEMPLATE
+    kind = request.GET.get('kind', 'supply')
+    category = request.GET.get('category', '')
+    location = request.GET.get('location', '').strip()
+
+    if kind == 'request':
+        queryset = SupplyRequest.objects.filter(status__in=['approved', 'released'])
+        if category.isdigit():
+            queryset = queryset.filter(supply__category_id=int(category))
+        if location:
+            queryset = queryset.filter(supply__location__icontains=location)
+        labels = request_labels(queryset)
+    else:
+        kind = 'supply'
+        queryset = Supply.objects.all()
+        if category.isdigit():
+            queryset = queryset.filter(category_id=int(category))
+        if location:
+            queryset = queryset.filter(location__icontains=location)
+        labels = supply_labels(queryset)
+
+    basename = f"qr_labels_{kind}_{timezone.now().strftime('%Y%m%d_%H%M%S')}"
+    output, _, parts = build_label_sheet(
+        labels, template=template, title=f'{kind.title()} QR Labels', basename=basename
+    )
+    if parts > 1:
+        return FileResponse(output, as_attachment=True, filename=f'{basename}.zip', content_type='application/zip')
+    return FileResponse(output, as_attachment=True, filename=f'{basename}.pdf', content_type='application/pdf')
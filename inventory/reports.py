@@ -0,0 +1,268 @@
+"""
+Report definitions shared by the export views and background export jobs.
+
+Each report knows how to filter its queryset from a plain dict of filter
+values (``request.GET`` works too), which columns it exports as CSV/NDJSON
+and how it is laid out as a PDF table. Keeping this in one place means a
+download rendered inline and one rendered by an export job are identical,
+and the reports page shows the same rows a page at a time.
+"""
+from datetime import datetime, timedelta
+
+from django.core.paginator import Paginator
+from django.db.models import Count, Exists, F, OuterRef, Q
+
+from .exports import EXPORT_CHUNK_SIZE
+from .models import BorrowedItem, InventoryTransaction, Supply, SupplyCategory, SupplyRequest, User
+from .pdf_reports import PDFReport
+from .table_versions import cached_for_tables
+
+# Rows per page of the report tables on the reports page
+REPORT_PAGE_SIZE = 25
+
+
+def _filter_dates(queryset, params):
+    """Apply the ``date_from``/``date_to`` (YYYY-MM-DD, inclusive) filters on created_at"""
+    date_from = params.get('date_from', '')
+    date_to = params.get('date_to', '')
+    if date_from:
+        try:
+            queryset = queryset.filter(created_at__gte=datetime.strptime(date_from, '%Y-%m-%d'))
+        except ValueError:
+            pass
+    if date_to:
+        try:
+            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
+            queryset = queryset.filter(created_at__lt=date_to_obj)
+        except ValueError:
+            pass
+    return queryset
+
+
+def supplies_queryset(params):
+    supplies = Supply.objects.select_related('category')
+    search_query = params.get('search', '')
+    if search_query:
+        supplies = supplies.filter(
+            Q(name__icontains=search_query) |
+            Q(description__icontains=search_query) |
+            Q(category__name__icontains=search_query)
+        )
+    return _filter_dates(supplies, params).order_by('pk')
+
+
+def requests_queryset(params):
+    requests = SupplyRequest.objects.select_related('user', 'supply', 'approved_by')
+    search_query = params.get('search', '')
+    if search_query:
+        requests = requests.filter(
+            Q(request_id__icontains=search_query) |
+            Q(supply__name__icontains=search_query) |
+            Q(user__username__icontains=search_query)
+        )
+    requests = _filter_dates(requests, params)
+
+    status_filter = params.get('status', '')
+    if status_filter:
+        # Support regular SupplyRequest.status values
+        if status_filter in dict(SupplyRequest.STATUS_CHOICES).keys():
+            requests = requests.filter(status=status_filter)
+        # Support borrowed/returned pseudo-statuses which are derived from BorrowedItem
+        elif status_filter in ['borrowed', 'returned']:
+            # Build an Exists subquery to find BorrowedItem matching the request's supply and user
+            borrowed_qs = BorrowedItem.objects.filter(
+                supply=OuterRef('supply'),
+                borrower=OuterRef('user')
+            )
+            if status_filter == 'borrowed':
+                borrowed_qs = borrowed_qs.filter(returned_at__isnull=True)
+            else:
+                borrowed_qs = borrowed_qs.filter(returned_at__isnull=False)
+
+            requests = requests.filter(Exists(borrowed_qs), purpose__startswith='[BORROWING]')
+        else:
+            # Unrecognized status - no results
+            requests = requests.none()
+    return requests
+
+
+def transactions_queryset(params):
+    transactions = InventoryTransaction.objects.select_related('supply', 'performed_by')
+    search_query = params.get('search', '')
+    if search_query:
+        transactions = transactions.filter(
+            Q(supply__name__icontains=search_query) |
+            Q(reason__icontains=search_query) |
+            Q(performed_by__username__icontains=search_query)
+        )
+    return _filter_dates(transactions, params)
+
+
+# Report registry. ``filters`` are the GET parameters a report honours;
+# ``tables`` are the models its rows are read from (for cached totals) and
+# ``ordering`` is how the reports page lists them;
+# ``columns`` pairs CSV headers with NDJSON keys for ``fields``;
+# ``pdf_columns`` are (header, width weight) for ``pdf_fields``, and
+# ``pdf_row`` turns one ``pdf_fields`` tuple into the printed cells.
+REPORTS = {
+    'supplies': {
+        'title': 'Supplies Report',
+        'basename': 'supplies_report',
+        'filters': ('search', 'date_from', 'date_to'),
+        'queryset': supplies_queryset,
+        'tables': (Supply, SupplyCategory),
+        'ordering': ('pk',),
+        'columns': [
+            ('ID', 'id'), ('Name', 'name'), ('Category', 'category'), ('Description', 'description'),
+            ('Quantity', 'quantity'), ('Min Stock Level', 'min_stock_level'), ('Unit', 'unit'),
+            ('Cost Per Unit', 'cost_per_unit'), ('Location', 'location'),
+            ('Created At', 'created_at'), ('Updated At', 'updated_at'),
+        ],
+        'fields': (
+            'id', 'name', 'category__name', 'description', 'quantity', 'min_stock_level',
+            'unit', 'cost_per_unit', 'location', 'created_at', 'updated_at',
+        ),
+        'pdf_columns': [
+            ('ID', 0.6), ('Name', 2.5), ('Category', 1.6), ('Quantity', 1),
+            ('Min Stock', 1), ('Unit', 1), ('Location', 1.8),
+        ],
+        'pdf_fields': ('id', 'name', 'category__name', 'quantity', 'min_stock_level', 'unit', 'location'),
+        'pdf_row': lambda row: [row[0], row[1], row[2] or '', *row[3:]],
+    },
+    'requests': {
+        'title': 'Supply Requests Report',
+        'basename': 'requests_report',
+        'filters': ('search', 'date_from', 'date_to', 'status'),
+        'queryset': requests_queryset,
+        'tables': (SupplyRequest, Supply, User, BorrowedItem),
+        'ordering': ('-created_at', '-pk'),
+        'columns': [
+            ('Request ID', 'request_id'), ('User', 'user'), ('Supply', 'supply'),
+            ('Quantity Requested', 'quantity_requested'), ('Purpose', 'purpose'), ('Status', 'status'),
+            ('Approved By', 'approved_by'), ('Approved At', 'approved_at'),
+            ('Released By', 'released_by'), ('Released At', 'released_at'),
+            ('Created At', 'created_at'), ('Updated At', 'updated_at'),
+        ],
+        'fields': (
+            'request_id', 'user__username', 'supply__name', 'quantity_requested', 'purpose', 'status',
+            'approved_by__username', 'approved_at', 'released_by__username', 'released_at',
+            'created_at', 'updated_at',
+        ),
+        'pdf_columns': [
+            ('Request ID', 2), ('User', 1.4), ('Supply', 2.4), ('Quantity', 0.9), ('Status', 1), ('Created', 1.1),
+        ],
+        'pdf_fields': ('request_id', 'user__username', 'supply__name', 'quantity_requested', 'status', 'created_at'),
+        'pdf_row': lambda row: [*row[:4], row[4].title(), row[5].strftime('%Y-%m-%d')],
+    },
+    'transactions': {
+        'title': 'Inventory Transactions Report',
+        'basename': 'transactions_report',
+        'filters': ('search', 'date_from', 'date_to'),
+        'queryset': transactions_queryset,
+        'tables': (InventoryTransaction, Supply, User),
+        'ordering': ('-created_at', '-pk'),
+        'columns': [
+            ('ID', 'id'), ('Supply', 'supply'), ('Transaction Type', 'transaction_type'),
+            ('Quantity', 'quantity'), ('Previous Quantity', 'previous_quantity'),
+            ('New Quantity', 'new_quantity'), ('Reason', 'reason'),
+            ('Performed By', 'performed_by'), ('Created At', 'created_at'),
+        ],
+        'fields': (
+            'id', 'supply__name', 'transaction_type', 'quantity', 'previous_quantity',
+            'new_quantity', 'reason', 'performed_by__username', 'created_at',
+        ),
+        'pdf_columns': [
+            ('Supply', 2.4), ('Type', 1.1), ('Quantity', 0.9), ('Previous', 0.9), ('New', 0.9),
+            ('Performed By', 1.4), ('Date', 1.1),
+        ],
+        'pdf_fields': (
+            'supply__name', 'transaction_type', 'quantity', 'previous_quantity', 'new_quantity',
+            'performed_by__username', 'created_at',
+        ),
+        'pdf_row': lambda row: [row[0], row[1].title(), *row[2:6], row[6].strftime('%Y-%m-%d')],
+    },
+}
+
+
+def report_filters(report, params):
+    """The filter values ``report`` honours, as a plain dict without blanks"""
+    return {
+        key: str(params.get(key, '')).strip()
+        for key in REPORTS[report]['filters']
+        if str(params.get(key, '')).strip()
+    }
+
+
+class CountedPaginator(Paginator):
+    """Paginator given its total up front (e.g. from the cache) instead of running a COUNT"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+def report_page(report, params, page):
+    """
+    Page ``page`` of ``report`` for the reports page. The total row count
+    is cached until one of the report's tables changes.
+    """
+    spec = REPORTS[report]
+    filters = report_filters(report, params)
+    rows = spec['queryset'](filters).order_by(*spec['ordering'])
+    total = cached_for_tables(f'report-total:{report}', spec['tables'], (sorted(filters.items()),), rows.count)
+    return CountedPaginator(rows, REPORT_PAGE_SIZE, total).get_page(page)
+
+
+def report_kpis():
+    """Summary counts of the reports overview, one aggregate per table, cached until the tables change"""
+    def compute():
+        kpis = Supply.objects.aggregate(
+            total_supplies=Count('pk'),
+            low_stock_items=Count('pk', filter=Q(quantity__lte=F('min_stock_level'))),
+        )
+        kpis.update(SupplyRequest.objects.order_by().aggregate(
+            total_requests=Count('pk'),
+            pending_requests=Count('pk', filter=Q(status='pending')),
+            released_requests=Count('pk', filter=Q(status='released')),
+        ))
+        return kpis
+
+    return cached_for_tables('report-kpis', (Supply, SupplyRequest), (), compute)
+
+
+def report_table(report, params, progress=None):
+    """
+    ``(columns, rows)`` for a CSV/NDJSON export of ``report``. Rows are read
+    from the database cursor; ``progress(n)`` is called as rows are consumed.
+    """
+    spec = REPORTS[report]
+    rows = spec['queryset'](params).values_list(*spec['fields']).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if progress is not None:
+        rows = _counted(rows, progress)
+    return spec['columns'], rows
+
+
+def report_pdf(report, params, progress=None):
+    """Draw ``report`` as a PDFReport and return it (call ``response()`` or ``finish()``)"""
+    spec = REPORTS[report]
+    labels = {'search': 'Search', 'date_from': 'From', 'date_to': 'To', 'status': 'Status'}
+    filters = [f"{labels[key]}: {value}" for key, value in report_filters(report, params).items()]
+    pdf = PDFReport(
+        spec['title'],
+        subtitle="Filters Applied: " + " | ".join(filters) if filters else None
+    )
+    rows = spec['queryset'](params).values_list(*spec['pdf_fields']).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if progress is not None:
+        rows = _counted(rows, progress)
+    pdf.table(spec['pdf_columns'], (spec['pdf_row'](row) for row in rows))
+    return pdf
+
+
+def _counted(rows, progress):
+    """Pass ``rows`` through, reporting the running count every EXPORT_CHUNK_SIZE rows"""
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        if count % EXPORT_CHUNK_SIZE == 0:
+            progress(count)
+        yield row
+    progress(count)
@@ -0,0 +1,187 @@
+"""
+Daily activity rollups behind the requestor/borrower analytics.
+
+UserDailyActivity and SupplyDailyActivity hold one row per user (supply)
+per day: the requests made that day, split by their current status, and the
+items borrowed that day and how many of them have come back. The analytics
+views sum the rows of a date range instead of counting raw requests and
+borrows, so a year is at most a few hundred rows per user or supply.
+
+Requests count on the day they were made and borrows on the day they were
+borrowed, as the views filter them, so a later approval or return adjusts
+the row of that original day. Rows are adjusted with ``F()`` increments:
+
+- saves and deletes go through ``track_request``/``track_borrow``
+  (signals.py), which move an instance's contribution from the state stored
+  before the write (``_rollup_state``) to its new state
+- queryset updates (batch approvals and returns) call them with the updated
+  instances and the state they were in before the update
+
+``rebuild_activity_rollups`` recomputes every row from the raw tables
+(``manage.py rebuild_activity_rollups``).
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+REQUEST_STATUS_FIELDS = {
+    'pending': 'pending_requests',
+    'approved': 'approved_requests',
+    'released': 'released_requests',
+    'rejected': 'rejected_requests',
+}
+GRANTED_STATUSES = ('approved', 'released')
+COUNTER_FIELDS = (
+    'requests', 'pending_requests', 'approved_requests', 'released_requests', 'rejected_requests',
+    'quantity_requested', 'approved_quantity', 'borrows', 'returns', 'quantity_borrowed',
+)
+
+
+def _day(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def request_state(request):
+    """What ``request`` contributes to the rollups, or None if it isn't saved"""
+    if request.pk is None or request.created_at is None:
+        return None
+    return (request.user_id, request.supply_id, _day(request.created_at), request.status, request.quantity_requested)
+
+
+def borrow_state(item):
+    """What ``item`` contributes to the rollups, or None if it isn't saved"""
+    if item.pk is None or item.borrowed_at is None:
+        return None
+    return (item.borrower_id, item.supply_id, _day(item.borrowed_at), item.returned_at is not None, item.borrowed_quantity)
+
+
+def _request_counters(status, quantity):
+    counters = {'requests': 1, 'quantity_requested': quantity}
+    if status in REQUEST_STATUS_FIELDS:
+        counters[REQUEST_STATUS_FIELDS[status]] = 1
+    if status in GRANTED_STATUSES:
+        counters['approved_quantity'] = quantity
+    return counters
+
+
+def _borrow_counters(returned, quantity):
+    return {'borrows': 1, 'quantity_borrowed': quantity, 'returns': 1 if returned else 0}
+
+
+def _add(model, owner_field, owner_id, day, deltas):
+    """Add ``deltas`` to the owner's row for ``day``, creating it if needed"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas or owner_id is None:
+        return
+    rows = model.objects.filter(**{owner_field: owner_id, 'day': day})
+    increments = {field: F(field) + delta for field, delta in deltas.items()}
+    if rows.update(**increments) or all(delta < 0 for delta in deltas.values()):
+        # Nothing to take away from a row that is gone, e.g. one deleted
+        # along with its user or supply
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**{owner_field: owner_id, 'day': day}, **deltas)
+    except IntegrityError:
+        # Created by a concurrent write in the meantime
+        rows.update(**increments)
+
+
+def _apply(old, new, counters):
+    """
+    Move the contribution of state ``old`` to state ``new`` (either may be
+    None). States are ``(user_id, supply_id, day, *counter_args)``.
+    """
+    from .models import SupplyDailyActivity, UserDailyActivity
+
+    for model, owner_field, position in ((UserDailyActivity, 'user_id', 0), (SupplyDailyActivity, 'supply_id', 1)):
+        changes = defaultdict(lambda: defaultdict(int))
+        if old is not None:
+            for field, value in counters(*old[3:]).items():
+                changes[(old[position], old[2])][field] -= value
+        if new is not None:
+            for field, value in counters(*new[3:]).items():
+                changes[(new[position], new[2])][field] += value
+        for (owner_id, day), deltas in changes.items():
+            _add(model, owner_field, owner_id, day, deltas)
+
+
+def track_request(request, deleted=False):
+    """Move ``request``'s contribution from ``request._rollup_state`` to its current state"""
+    new = None if deleted else request_state(request)
+    _apply(getattr(request, '_rollup_state', None), new, _request_counters)
+
+
+def track_borrow(item, deleted=False):
+    """Move ``item``'s contribution from ``item._rollup_state`` to its current state"""
+    new = None if deleted else borrow_state(item)
+    _apply(getattr(item, '_rollup_state', None), new, _borrow_counters)
+
+
+def activity_totals(model, days=None, **lookup):
+    """
+    Summed counters of ``model`` rows matching ``lookup``, for the days in
+    ``days`` (``(first, last)``, inclusive) or all time.
+    """
+    rows = model.objects.filter(**lookup)
+    if days is not None:
+        rows = rows.filter(day__gte=days[0], day__lte=days[1])
+    totals = rows.aggregate(**{field: Sum(field) for field in COUNTER_FIELDS})
+    return {field: value or 0 for field, value in totals.items()}
+
+
+def request_counts(requests):
+    """The request counters of ``activity_totals`` for an arbitrary request queryset, in one query"""
+    return requests.order_by().aggregate(
+        requests=Count('pk'),
+        **{field: Count('pk', filter=Q(status=status)) for status, field in REQUEST_STATUS_FIELDS.items()},
+    )
+
+
+def rebuild_activity_rollups():
+    """Recompute every rollup row from the raw requests and borrows; returns the number of rows"""
+    from .models import BorrowedItem, SupplyDailyActivity, SupplyRequest, UserDailyActivity
+
+    total = 0
+    for model, owner_field, borrower_field in (
+        (UserDailyActivity, 'user_id', 'borrower_id'),
+        (SupplyDailyActivity, 'supply_id', 'supply_id'),
+    ):
+        rows = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+        requests = (
+            SupplyRequest.objects.order_by()
+            .annotate(day=TruncDate('created_at'))
+            .values(owner_field, 'day', 'status')
+            .annotate(count=Count('pk'), quantity=Sum('quantity_requested'))
+        )
+        for group in requests:
+            row = rows[(group[owner_field], group['day'])]
+            for field, value in _request_counters(group['status'], group['quantity']).items():
+                row[field] += value if field in ('quantity_requested', 'approved_quantity') else group['count']
+        borrows = (
+            BorrowedItem.objects.order_by()
+            .annotate(day=TruncDate('borrowed_at'))
+            .values(borrower_field, 'day')
+            .annotate(
+                count=Count('pk'),
+                returned=Count('pk', filter=Q(returned_at__isnull=False)),
+                quantity=Sum('borrowed_quantity'),
+            )
+        )
+        for group in borrows:
+            row = rows[(group[borrower_field], group['day'])]
+            row['borrows'] += group['count']
+            row['returns'] += group['returned']
+            row['quantity_borrowed'] += group['quantity']
+
+        with transaction.atomic():
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                [model(**{owner_field: owner_id, 'day': day}, **counters) for (owner_id, day), counters in rows.items()],
+                batch_size=1000,
+            )
+        total += len(rows)
+    return total
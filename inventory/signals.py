@@ -1,14 +1,44 @@
 """
 Django signals for automatic analytics tracking
 """
-from django.db.models.signals import post_save
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
+from .images import IMAGE_FIELDS, needs_processing, queue_image_variants
 from .models import (
-    SupplyRequest, BorrowedItem, User,
-    RequestorBorrowerAnalytics, UserActivityLog, MostRequestedItem
+    Supply, SupplyRequest, BorrowedItem, User, InventoryTransaction,
+    RequestorBorrowerAnalytics, UserActivityLog, MostRequestedItem, SupplyCategory
 )
+from .catalog_index import INDEXED_MODELS, queue_catalog_index_build
+from .counters import add_counters
+from .rollups import GRANTED_STATUSES, borrow_state, request_state, track_borrow, track_request
+from .table_versions import bump_table_versions
+
+# Models whose table version (table_versions.py) is bumped on every save/delete
+VERSIONED_MODELS = (Supply, SupplyCategory, SupplyRequest, BorrowedItem, User, InventoryTransaction)
+
+
+def bump_table_version(sender, **kwargs):
+    """Invalidate cached results computed from the sender's table"""
+    bump_table_versions(sender)
+
+
+for _model in VERSIONED_MODELS:
+    post_save.connect(bump_table_version, sender=_model, dispatch_uid=f'bump-version-save-{_model.__name__}')
+    post_delete.connect(bump_table_version, sender=_model, dispatch_uid=f'bump-version-delete-{_model.__name__}')
+
+
+def rebuild_catalog_index(sender, **kwargs):
+    """Refresh the scanner's shared supply index once the write commits"""
+    queue_catalog_index_build()
+
+
+for _model in INDEXED_MODELS:
+    post_save.connect(rebuild_catalog_index, sender=_model, dispatch_uid=f'catalog-index-save-{_model.__name__}')
+    post_delete.connect(rebuild_catalog_index, sender=_model, dispatch_uid=f'catalog-index-delete-{_model.__name__}')
 
 
 @receiver(post_save, sender=User)
@@ -18,23 +48,70 @@ def create_analytics_record(sender, instance, created, **kwargs):
         RequestorBorrowerAnalytics.objects.get_or_create(user=instance)
 
 
+@receiver(post_save, sender=Supply)
+@receiver(post_save, sender=User)
+def process_uploaded_images(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Queue resizing when an image no longer matches its recorded derivatives"""
+    if raw:
+        return
+    deferred = instance.get_deferred_fields()
+    for field_name, variants_field in IMAGE_FIELDS[sender.__name__].items():
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        if field_name in deferred or variants_field in deferred:
+            continue
+        if needs_processing(getattr(instance, field_name), getattr(instance, variants_field)):
+            queue_image_variants(instance, field_name)
+
+
+def count_request(previous, supply_request):
+    """
+    Update the running counters for ``supply_request`` moving from the stored
+    state ``previous`` (None for a new request, see rollups.request_state)
+    """
+    was = previous[3] if previous is not None else None
+    approved = (supply_request.status in GRANTED_STATUSES) - (was in GRANTED_STATUSES)
+    rejected = (supply_request.status == 'rejected') - (was == 'rejected')
+    if previous is None:
+        now = timezone.now()
+        add_counters(
+            RequestorBorrowerAnalytics, supply_request.user_id, latest={'last_request_date': now},
+            total_requests=1, approved_requests=approved, rejected_requests=rejected,
+        )
+        add_counters(MostRequestedItem, supply_request.supply_id, latest={'last_requested': now}, request_count=1)
+    else:
+        add_counters(
+            RequestorBorrowerAnalytics, supply_request.user_id,
+            approved_requests=approved, rejected_requests=rejected,
+        )
+
+
+def count_borrow(previous, item):
+    """
+    Update the running counters for ``item`` moving from the stored state
+    ``previous`` (None for a new borrow, see rollups.borrow_state)
+    """
+    returned = (item.returned_at is not None) - (previous is not None and previous[3])
+    overdue = returned > 0 and item.return_deadline is not None and item.return_deadline < timezone.now().date()
+    if previous is None:
+        now = timezone.now()
+        add_counters(
+            RequestorBorrowerAnalytics, item.borrower_id, latest={'last_borrow_date': now},
+            total_borrowings=1, returned_items=returned, overdue_items=-overdue,
+        )
+        add_counters(MostRequestedItem, item.supply_id, latest={'last_borrowed': now}, borrow_count=1)
+    else:
+        add_counters(RequestorBorrowerAnalytics, item.borrower_id, returned_items=returned, overdue_items=-overdue)
+    return returned > 0
+
+
 @receiver(post_save, sender=SupplyRequest)
-def track_request_activity(sender, instance, created, **kwargs):
+def track_request_activity(sender, instance, created, raw=False, **kwargs):
     """Track supply request activity"""
+    if raw:
+        return
+    count_request(getattr(instance, '_rollup_state', None), instance)
     if created:
-        # Update analytics
-        analytics, _ = RequestorBorrowerAnalytics.objects.get_or_create(user=instance.user)
-        analytics.total_requests += 1
-        analytics.last_request_date = timezone.now()
-        
-        if instance.status == 'approved' or instance.status == 'released':
-            analytics.approved_requests += 1
-        elif instance.status == 'rejected':
-            analytics.rejected_requests += 1
-        
-        analytics.save()
-        
-        # Create activity log
         UserActivityLog.objects.create(
             user=instance.user,
             activity_type='request',
@@ -42,37 +119,15 @@ def track_request_activity(sender, instance, created, **kwargs):
             quantity=instance.quantity_requested,
             description=instance.purpose[:100]
         )
-        
-        # Update most requested items
-        most_requested, _ = MostRequestedItem.objects.get_or_create(supply=instance.supply)
-        most_requested.request_count += 1
-        most_requested.last_requested = timezone.now()
-        most_requested.save()
-    
-    else:  # Updated request
-        # Update analytics if status changed to approved/rejected
-        if instance.status in ['approved', 'released']:
-            analytics, _ = RequestorBorrowerAnalytics.objects.get_or_create(user=instance.user)
-            # Check if we already counted this as approved
-            if instance.approved_at and (timezone.now() - instance.approved_at).total_seconds() < 60:
-                # This was just approved/released
-                if not hasattr(instance, '_approval_tracked'):
-                    analytics.approved_requests += 1
-                    analytics.save()
-                    instance._approval_tracked = True
 
 
 @receiver(post_save, sender=BorrowedItem)
-def track_borrow_activity(sender, instance, created, **kwargs):
+def track_borrow_activity(sender, instance, created, raw=False, **kwargs):
     """Track borrow/return activity"""
+    if raw:
+        return
+    just_returned = count_borrow(getattr(instance, '_rollup_state', None), instance)
     if created:
-        # Update analytics
-        analytics, _ = RequestorBorrowerAnalytics.objects.get_or_create(user=instance.borrower)
-        analytics.total_borrowings += 1
-        analytics.last_borrow_date = timezone.now()
-        analytics.save()
-        
-        # Create activity log
         UserActivityLog.objects.create(
             user=instance.borrower,
             activity_type='borrow',
@@ -80,32 +135,103 @@ def track_borrow_activity(sender, instance, created, **kwargs):
             quantity=instance.borrowed_quantity,
             description=f'Borrowed until {instance.return_deadline}'
         )
-        
-        # Update most requested items
-        most_requested, _ = MostRequestedItem.objects.get_or_create(supply=instance.supply)
-        most_requested.borrow_count += 1
-        most_requested.last_borrowed = timezone.now()
-        most_requested.save()
-    
-    else:  # Updated borrow item (e.g., returned)
-        if instance.returned_at and not hasattr(instance, '_return_tracked'):
-            # Item was just returned
-            analytics, _ = RequestorBorrowerAnalytics.objects.get_or_create(user=instance.borrower)
-            analytics.returned_items += 1
-            
-            # Check for overdue
-            if instance.is_overdue:
-                analytics.overdue_items = max(0, analytics.overdue_items - 1)
-            
-            analytics.save()
-            
-            # Create activity log
-            UserActivityLog.objects.create(
-                user=instance.borrower,
-                activity_type='return',
-                supply=instance.supply,
-                quantity=instance.borrowed_quantity,
-                description=f'Returned item (was borrowed for {instance.duration_display})'
-            )
-            
-            instance._return_tracked = True
+    elif just_returned:
+        UserActivityLog.objects.create(
+            user=instance.borrower,
+            activity_type='return',
+            supply=instance.supply,
+            quantity=instance.borrowed_quantity,
+            description=f'Returned item (was borrowed for {instance.duration_display})'
+        )
+
+
+# Fields the activity rollups and counters read, and what an instance
+# contributes to them; the stored state is loaded before every write
+ROLLUP_FIELDS = {
+    SupplyRequest: (('user', 'supply', 'created_at', 'status', 'quantity_requested'), request_state),
+    BorrowedItem: (('borrower', 'supply', 'borrowed_at', 'returned_at', 'borrowed_quantity'), borrow_state),
+}
+
+
+def load_rollup_state(sender, instance, raw=False, **kwargs):
+    """
+    Read what the stored row contributes to the activity rollups before it is
+    overwritten or deleted; the instance itself may be stale or partly loaded
+    """
+    if raw:
+        return
+    if instance.pk is None or instance._state.adding:
+        instance._rollup_state = None
+        return
+    fields, state = ROLLUP_FIELDS[sender]
+    stored = sender.objects.filter(pk=instance.pk).only(*fields).first()
+    instance._rollup_state = state(stored) if stored is not None else None
+
+
+def update_rollups(sender, instance, raw=False, **kwargs):
+    """Apply a saved or deleted request/borrow to the daily activity rollups"""
+    if raw:
+        return
+    track = track_request if sender is SupplyRequest else track_borrow
+    track(instance, deleted=kwargs.get('signal') is post_delete)
+
+
+for _model in ROLLUP_FIELDS:
+    pre_save.connect(load_rollup_state, sender=_model, dispatch_uid=f'rollup-pre-save-{_model.__name__}')
+    pre_delete.connect(load_rollup_state, sender=_model, dispatch_uid=f'rollup-pre-delete-{_model.__name__}')
+    post_save.connect(update_rollups, sender=_model, dispatch_uid=f'rollup-save-{_model.__name__}')
+    post_delete.connect(update_rollups, sender=_model, dispatch_uid=f'rollup-delete-{_model.__name__}')
+
+
+def track_bulk_approvals(supply_requests):
+    """
+    Record approvals made with a queryset update (which does not fire
+    post_save) in the analytics. ``supply_requests`` are the requests as
+    loaded before the update, while still pending.
+    """
+    for supply_request in supply_requests:
+        previous = request_state(supply_request)
+        supply_request._rollup_state = previous
+        supply_request.status = 'approved'
+        track_request(supply_request)
+        count_request(previous, supply_request)
+
+
+def track_bulk_returns(borrowed_items):
+    """
+    Record return activity for borrowed items that were marked returned with a
+    queryset update (which does not fire post_save), e.g. batch QR returns.
+    """
+    if not borrowed_items:
+        return
+
+    today = timezone.now().date()
+    returns_per_user = Counter()
+    overdue_per_user = Counter()
+    for item in borrowed_items:
+        returns_per_user[item.borrower_id] += 1
+        if item.return_deadline is not None and item.return_deadline < today:
+            overdue_per_user[item.borrower_id] += 1
+
+    for user_id, count in returns_per_user.items():
+        add_counters(
+            RequestorBorrowerAnalytics, user_id,
+            returned_items=count, overdue_items=-overdue_per_user[user_id],
+        )
+
+    UserActivityLog.objects.bulk_create([
+        UserActivityLog(
+            user_id=item.borrower_id,
+            activity_type='return',
+            supply_id=item.supply_id,
+            quantity=item.borrowed_quantity,
+            description=f'Returned item (was borrowed for {item.duration_display})'
+        )
+        for item in borrowed_items
+    ])
+
+    for item in borrowed_items:
+        # The items carry their new returned_at; before the update they were out
+        user_id, supply_id, day, _, quantity = borrow_state(item)
+        item._rollup_state = (user_id, supply_id, day, False, quantity)
+        track_borrow(item)
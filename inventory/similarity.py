@@ -0,0 +1,177 @@
+"""
+Trigram index for finding similar supply names.
+
+Names are normalised to lowercase alphanumeric tokens and broken into
+padded character trigrams per token, so word order does not matter ("A4
+Bond Paper" and "Bond Paper A4" have the same trigram set). Similarity is
+the Jaccard index of the two trigram sets.
+
+Lookups use prefix filtering (as in PPJoin) instead of comparing against
+every name. Trigrams are put in one global order, rarest first. If two sets
+of sizes m and n have Jaccard similarity >= t, the first m - ceil(t * m) + 1
+trigrams of one and the first n - ceil(t * n) + 1 of the other share at
+least one trigram. Only those prefixes are put in the posting lists, so a
+lookup touches few candidates even when common words ("paper", "black")
+appear in most names. Each candidate is then verified exactly.
+
+Posting lists are read rarest first and a lookup stops once ``limit``
+matches have been found (or MAX_CANDIDATES names checked). Names with few
+look-alikes get an exact answer; in a long run of near-identical names
+("Item 1" ... "Item 50000") a lookup stays cheap and returns close matches,
+though not necessarily the closest.
+"""
+import math
+import re
+from array import array
+
+# Default Jaccard similarity at which two names are reported as similar
+DEFAULT_THRESHOLD = 0.6
+# Upper bound on names verified per lookup
+MAX_CANDIDATES = 2000
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_NO_KEY = object()
+
+
+def name_tokens(name):
+    return _TOKEN_RE.findall(name.lower())
+
+
+def name_trigrams(name):
+    """Set of padded character trigrams over the tokens of ``name``"""
+    grams = set()
+    for token in name_tokens(name):
+        padded = f' {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _prefix_length(size, threshold):
+    return size - math.ceil(threshold * size) + 1
+
+
+class TrigramIndex:
+    """
+    In-memory index of ``(key, name)`` pairs answering "which names are
+    similar to this one" without a full scan. Names passed to the constructor
+    fix the trigram order; names added later are indexed the same way.
+    """
+
+    def __init__(self, items=(), threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._gram_ids = {}
+        self._gram_rank = []
+        self._postings = []
+        self._keys = []
+        self._names = []
+        self._grams = []
+        self._slots = {}
+        self._removed = 0
+        self._built = False
+
+        # Rank trigrams by how many names contain them, so prefixes hold rare ones
+        items = [(key, name, name_trigrams(name)) for key, name in items]
+        frequency = {}
+        for _, _, grams in items:
+            for gram in grams:
+                frequency[gram] = frequency.get(gram, 0) + 1
+        for gram in sorted(frequency, key=frequency.get):
+            self._new_gram(gram)
+        self._built = True
+        for key, name, grams in items:
+            self._add(key, name, grams)
+
+    def __len__(self):
+        return len(self._keys) - self._removed
+
+    def _new_gram(self, gram):
+        """
+        Register a trigram. Ranks are unique: trigrams seen at construction
+        count up from 0 (rarest first); later ones count down from -1, so
+        they sort before every trigram the index was built with.
+        """
+        gram_id = self._gram_ids[gram] = len(self._postings)
+        self._gram_rank.append(-(gram_id + 1) if self._built else gram_id)
+        self._postings.append(array('I'))
+        return gram_id
+
+    def _ordered(self, gram_ids):
+        return sorted(gram_ids, key=self._gram_rank.__getitem__)
+
+    def add(self, key, name):
+        self._add(key, name, name_trigrams(name))
+
+    def _add(self, key, name, grams):
+        slot = len(self._keys)
+        gram_ids = self._gram_ids
+        ids = frozenset([
+            gram_ids[gram] if gram in gram_ids else self._new_gram(gram)
+            for gram in grams
+        ])
+        self._keys.append(key)
+        self._names.append(name)
+        self._grams.append(ids)
+        self._slots.setdefault(key, []).append(slot)
+        for gram_id in self._ordered(ids)[:_prefix_length(len(ids), self.threshold)]:
+            self._postings[gram_id].append(slot)
+
+    def discard(self, key):
+        """
+        Remove every name added under ``key``. The slots stay in the posting
+        lists with no trigrams, which the length filter skips; rebuild the
+        index once many names have been removed.
+        """
+        for slot in self._slots.pop(key, ()):
+            self._grams[slot] = frozenset()
+            self._keys[slot] = _NO_KEY
+            self._removed += 1
+
+    @property
+    def removed(self):
+        """Number of discarded names still taking up slots"""
+        return self._removed
+
+    def similar(self, name, limit=5, exclude=_NO_KEY):
+        """
+        ``[(key, name, score), ...]`` for indexed names whose similarity to
+        ``name`` is at least the index threshold, best first (see the module
+        docstring for when the search stops early). ``exclude`` is a
+        key to leave out (e.g. the item being compared); keys may be None.
+        """
+        threshold = self.threshold
+        trigrams = name_trigrams(name)
+        query_size = len(trigrams)
+        if not query_size:
+            return []
+        # Trigrams the index has never seen sort first and match nothing,
+        # but still take their place in the query's prefix
+        known = [self._gram_ids[gram] for gram in trigrams if gram in self._gram_ids]
+        prefix = _prefix_length(query_size, threshold) - (query_size - len(known))
+        if prefix <= 0:
+            return []
+        grams = frozenset(known)
+
+        matches = []
+        seen = set()
+        all_grams, keys = self._grams, self._keys
+        # Length filter: sizes too far apart cannot reach the threshold
+        min_size, max_size = threshold * query_size, query_size / threshold
+        for gram_id in self._ordered(known)[:prefix]:
+            for slot in self._postings[gram_id][:MAX_CANDIDATES - len(seen)]:
+                if slot in seen:
+                    continue
+                seen.add(slot)
+                other = all_grams[slot]
+                size = len(other)
+                if size < min_size or size > max_size:
+                    continue
+                shared = len(grams & other)
+                score = shared / (query_size + size - shared)
+                if score >= threshold and keys[slot] != exclude:
+                    matches.append((keys[slot], self._names[slot], round(score, 3)))
+                    if len(matches) >= limit:
+                        break
+            if len(matches) >= limit or len(seen) >= MAX_CANDIDATES:
+                break
+        matches.sort(key=lambda match: -match[2])
+        return matches[:limit]
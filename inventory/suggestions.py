@@ -0,0 +1,382 @@
+"""
+Description/category/stock suggestions for the supply form's name field.
+
+The form asks on every keystroke, so calls to the external model are kept
+off the request's critical path:
+
+- answers are kept in an in-process LRU cache (SUPPLY_SUGGESTION_CACHE_SIZE
+  entries, SUPPLY_SUGGESTION_CACHE_TTL seconds), keyed on the normalized name
+- identical requests in flight share one model call (single-flight)
+- calls run in a small thread pool (SUPPLY_SUGGESTION_MAX_CONCURRENCY); when
+  it is busy the keyword heuristic answers at once instead of queueing
+- a request waits at most SUPPLY_SUGGESTION_DEADLINE seconds, then gets the
+  heuristic; the call keeps running and caches its answer for the next
+  keystroke
+
+Before any of that, the name is looked up among the organisation's own
+supplies (CatalogNeighbours): when an existing item is similar enough
+(SUPPLY_SUGGESTION_LOCAL_CONFIDENCE), the category, unit, minimum stock
+level and description of the closest items are returned without a model
+call. Weaker matches still beat the keyword heuristic as the fallback.
+
+The model is reached through a client object with ``suggest(name, timeout)``
+returning a dict. SUPPLY_SUGGESTION_CLIENT names its class (default
+GeminiClient, used when google-generativeai and GEMINI_API_KEY are
+available); tests pass a fake one to SuggestionService directly.
+"""
+import atexit
+import json
+import statistics
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import background
+from .models import Supply, SupplyCategory
+from .similarity import TrigramIndex
+from .table_versions import table_versions
+
+# Optional Gemini import for AI suggestions
+try:
+    import google.generativeai as genai
+    GENAI_AVAILABLE = True
+except (ImportError, TypeError) as e:
+    GENAI_AVAILABLE = False
+    print(f"[WARNING] Gemini API not available: {type(e).__name__}: {e}")
+
+SUGGESTION_PROMPT = """You are a supply management assistant. Analyze this supply item: "{name}"
+
+Provide ONLY a JSON response (no other text) with these fields:
+- description: 1-2 sentence description of what this item is used for
+- category: Suggest ONE category (Electronics, Office Supplies, Safety Equipment, Furniture, Cleaning, Educational, Other)
+- suggested_quantity: typical stock level (as a number between 10-500)
+- unit: Most appropriate unit of measurement (pieces, boxes, packages, sets, etc)
+
+Respond ONLY with valid JSON."""
+
+# Keyword -> (category, suggested quantity, unit), checked in order
+HEURISTIC_RULES = [
+    (['pen', 'paper', 'notebook', 'stapler', 'marker', 'scissors', 'envelope'], ('Office Supplies', 100, 'pieces')),
+    (['battery', 'charger', 'adapter', 'cable', 'mouse', 'keyboard', 'monitor'], ('Electronics', 20, 'pieces')),
+    (['glove', 'mask', 'helmet', 'goggles'], ('Safety Equipment', 50, 'pieces')),
+    (['detergent', 'soap', 'mop', 'broom', 'disinfectant', 'cleaner'], ('Cleaning', 30, 'bottles')),
+    (['chair', 'table', 'desk', 'cabinet'], ('Furniture', 10, 'sets')),
+    (['projector', 'marker', 'whiteboard', 'chalk'], ('Educational', 15, 'pieces')),
+]
+
+
+def normalize_name(name):
+    return ' '.join(name.lower().split())
+
+
+def heuristic_suggestion(name):
+    """Keyword-based suggestion used without the model, or when it is slow, busy or failing"""
+    name_lower = name.lower()
+    category, suggested_quantity, unit = 'Other', 50, 'pieces'
+    for keywords, suggestion in HEURISTIC_RULES:
+        if any(k in name_lower for k in keywords):
+            category, suggested_quantity, unit = suggestion
+            break
+
+    if category != 'Other':
+        description = f"{name} is a common item used for general {category.lower()} needs."
+    else:
+        description = f"{name} is a commonly stocked supply item."
+    return {
+        'description': description,
+        'category': category,
+        'suggested_quantity': suggested_quantity,
+        'unit': unit,
+        'source': 'heuristic',
+    }
+
+
+class CatalogNeighbours:
+    """
+    Trigram index over the names of existing supplies, answering with the
+    category, unit, minimum stock level and description of the closest ones.
+
+    Kept per process and brought up to date when the Supply or
+    SupplyCategory table version has changed, like the catalog snapshot
+    (catalog.py): only rows saved since the previous refresh, or whose
+    category was, are re-indexed, and a count and sum of ids catches
+    deletions. A full rebuild runs when that check fails, when many names
+    have been replaced, and every FULL_REBUILD_INTERVAL seconds.
+
+    Refreshes run in a background thread, queued by the lookup that finds
+    the index out of date; lookups meanwhile answer from the previous index,
+    or with nothing (the keyword heuristic) before the first one is built.
+    """
+    # Lowest similarity of a name reported as a neighbour
+    THRESHOLD = 0.4
+    NEIGHBOURS = 5
+    FULL_REBUILD_INTERVAL = 3600
+    REBUILD_OVERLAP = timedelta(minutes=5)
+    FIELDS = ('id', 'name', 'category__name', 'unit', 'min_stock_level', 'description')
+
+    def __init__(self):
+        # Guards lookups against the refresh thread swapping or updating the index
+        self._lock = threading.Lock()
+        self._refresh_pending = False
+        self._index = None
+        self._rows = {}
+        self._versions = None
+        self._built_at = None
+        self._full_built_at = 0
+
+    def _stamp(self):
+        totals = Supply.objects.aggregate(count=Count('id'), ids=Sum('id'))
+        return totals['count'], totals['ids'] or 0
+
+    def _update(self, since):
+        index, rows = self._index, self._rows
+        changed_categories = SupplyCategory.objects.filter(updated_at__gte=since).values('pk')
+        changed = list(
+            Supply.objects
+            .filter(Q(updated_at__gte=since) | Q(category__in=changed_categories))
+            .values_list(*self.FIELDS)
+        )
+        with self._lock:
+            for pk, name, *row in changed:
+                index.discard(pk)
+                index.add(pk, name)
+                rows[pk] = row
+            indexed = (len(rows), sum(rows))
+            compact = index.removed <= len(rows)
+        return self._stamp() == indexed and compact
+
+    def _rebuild(self):
+        rows = {}
+        names = []
+        for pk, name, *row in Supply.objects.values_list(*self.FIELDS).iterator(chunk_size=2000):
+            rows[pk] = row
+            names.append((pk, name))
+        index = TrigramIndex(names, threshold=self.THRESHOLD)
+        with self._lock:
+            self._index, self._rows = index, rows
+        self._full_built_at = time.time()
+
+    def _stale(self, versions):
+        return self._index is None or versions != self._versions
+
+    def _refresh(self):
+        try:
+            versions = table_versions(Supply, SupplyCategory)
+            started = timezone.now()
+            if (
+                self._index is None
+                or time.time() - self._full_built_at >= self.FULL_REBUILD_INTERVAL
+                or not self._update(self._built_at - self.REBUILD_OVERLAP)
+            ):
+                self._rebuild()
+            with self._lock:
+                self._versions = versions
+            self._built_at = started
+        except Exception as e:
+            print(f"[WARNING] Supply name index refresh failed: {type(e).__name__}: {e}")
+        finally:
+            with self._lock:
+                self._refresh_pending = False
+
+    def suggest(self, name):
+        """Suggestion drawn from the existing supplies closest to ``name``, or None without any"""
+        versions = table_versions(Supply, SupplyCategory)
+        with self._lock:
+            if not self._refresh_pending and self._stale(versions):
+                self._refresh_pending = True
+                # A single background thread, so refreshes never overlap
+                background.submit('catalog-neighbours', self._refresh)
+            if self._index is None:
+                return None
+            matches = self._index.similar(name, limit=self.NEIGHBOURS)
+            neighbours = [(self._rows[pk], score) for pk, _, score in matches]
+        if not neighbours:
+            return None
+
+        categories, units = Counter(), Counter()
+        for (category, unit, _, _), score in neighbours:
+            categories[category] += score
+            units[unit] += score
+        category = categories.most_common(1)[0][0]
+        (_, _, _, description), confidence = neighbours[0]
+        return {
+            'description': description,
+            'category': category,
+            'suggested_quantity': int(statistics.median(
+                min_stock_level for (row_category, _, min_stock_level, _), _ in neighbours
+                if row_category == category
+            )),
+            'unit': units.most_common(1)[0][0],
+            'source': 'catalog',
+            'confidence': confidence,
+        }
+
+
+class GeminiClient:
+    """Suggestions from Gemini; configured once per process rather than per request"""
+    model_name = 'gemini-3-pro-preview'
+
+    def __init__(self):
+        api_key = getattr(settings, 'GEMINI_API_KEY', None)
+        if not (GENAI_AVAILABLE and api_key):
+            raise RuntimeError('Gemini is not configured')
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(self.model_name)
+
+    def suggest(self, name, timeout):
+        response = self.model.generate_content(
+            SUGGESTION_PROMPT.format(name=name),
+            request_options={'timeout': timeout},
+        )
+        response_text = response.text.strip()
+
+        # Clean up the response if it has markdown code blocks
+        if response_text.startswith('```'):
+            response_text = response_text.split('```')[1]
+            if response_text.startswith('json'):
+                response_text = response_text[4:]
+        return json.loads(response_text.strip())
+
+
+class LRUCache:
+    """Thread-safe mapping keeping the ``max_entries`` most recently used keys for ``ttl`` seconds"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SuggestionService:
+    def __init__(self, client=None, neighbours=None, local_confidence=0.75,
+                 cache_size=512, cache_ttl=24 * 3600, deadline=3.0, max_concurrency=4):
+        self.client = client
+        self.neighbours = neighbours
+        self.local_confidence = local_confidence
+        self.cache = LRUCache(cache_size, cache_ttl)
+        self.deadline = deadline
+        self.max_concurrency = max_concurrency
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self):
+        # Created under self._lock by suggest()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='supply-suggestions')
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def _call_model(self, key, name, future):
+        try:
+            result = self.client.suggest(name, timeout=self.deadline * 5)
+            suggestion = {
+                'description': result.get('description', ''),
+                'category': result.get('category', ''),
+                'suggested_quantity': result.get('suggested_quantity', 50),
+                'unit': result.get('unit', 'pieces'),
+                'source': 'ai',
+            }
+            self.cache.set(key, suggestion)
+            future.set_result(suggestion)
+        except Exception as e:
+            print(f"[WARNING] Supply suggestion call failed: {type(e).__name__}: {e}")
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def suggest(self, name):
+        """Suggestion for ``name``, from the catalog, the cache, the model, or a fallback"""
+        local = self.neighbours.suggest(name) if self.neighbours is not None else None
+        if local is not None and local['confidence'] >= self.local_confidence:
+            return local
+        fallback = local or heuristic_suggestion(name)
+        if self.client is None:
+            return fallback
+        key = normalize_name(name)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                if len(self._inflight) >= self.max_concurrency:
+                    # Every model slot is busy: answer now rather than queue
+                    return fallback
+                future = self._inflight[key] = Future()
+                self._get_pool().submit(self._call_model, key, name, future)
+
+        try:
+            return future.result(timeout=self.deadline)
+        except FutureTimeoutError:
+            # Still running; its answer is cached for the next request
+            return fallback
+        except Exception:
+            return fallback
+
+
+_service_lock = threading.Lock()
+_service = None
+
+
+def get_suggestion_service():
+    """Process-wide SuggestionService built from settings"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            client = None
+            client_path = getattr(settings, 'SUPPLY_SUGGESTION_CLIENT', 'inventory.suggestions.GeminiClient')
+            if client_path:
+                try:
+                    client = import_string(client_path)()
+                except Exception as e:
+                    print(f"[WARNING] Supply suggestions use the heuristic only: {type(e).__name__}: {e}")
+            _service = SuggestionService(
+                client=client,
+                neighbours=CatalogNeighbours(),
+                local_confidence=getattr(settings, 'SUPPLY_SUGGESTION_LOCAL_CONFIDENCE', 0.75),
+                cache_size=getattr(settings, 'SUPPLY_SUGGESTION_CACHE_SIZE', 512),
+                cache_ttl=getattr(settings, 'SUPPLY_SUGGESTION_CACHE_TTL', 24 * 3600),
+                deadline=getattr(settings, 'SUPPLY_SUGGESTION_DEADLINE', 3.0),
+                max_concurrency=getattr(settings, 'SUPPLY_SUGGESTION_MAX_CONCURRENCY', 4),
+            )
+        return _service
+
+
+@atexit.register
+def _shutdown_service():
+    if _service is not None:
+        _service.shutdown()
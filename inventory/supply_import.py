@@ -0,0 +1,345 @@
+"""
+Bulk supply import from CSV.
+
+Large files are uploaded in resumable chunks (see ``append_chunk``) and
+parsed straight from disk by a background worker. Rows are streamed in chunks and each chunk is imported in two passes. The
+first pass parses and validates the rows against categories and supplies
+pre-loaded into dicts, so it issues no queries per row. The second pass
+writes the valid rows in one transaction: new supplies with ``bulk_create``
+and existing ones with a single ``executemany`` UPDATE. QR codes for new
+supplies are queued for background rendering after the import.
+"""
+import codecs
+import csv
+import os
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .background import run_after_commit
+from .models import ImportUpload, Supply, SupplyCategory
+from .qr_rendering import queue_supply_qr_bulk
+from .similarity import TrigramIndex
+from .table_versions import bump_table_versions
+
+REQUIRED_COLUMNS = {'name', 'category', 'quantity', 'unit', 'description'}
+# Rows written per bulk_create/executemany and per transaction
+IMPORT_BATCH_SIZE = 1000
+# Row errors / duplicate warnings returned to the browser; totals are always reported
+MAX_REPORTED_ERRORS = 500
+# Similar existing names listed per new row
+DUPLICATE_MATCHES_PER_ROW = 3
+
+UPDATE_FIELDS = [
+    'category', 'quantity', 'unit', 'description', 'min_stock_level',
+    'cost_per_unit', 'location', 'is_consumable', 'updated_at',
+]
+
+
+# Bytes copied from the request stream per read when appending a chunk
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (empty, missing columns, not CSV)"""
+
+
+class UploadOffsetMismatch(Exception):
+    """A chunk did not start where the stored part file ends"""
+
+    def __init__(self, received):
+        super().__init__(f'Upload is at byte {received}')
+        self.received = received
+
+
+def read_csv(uploaded_file):
+    """
+    ``csv.DictReader`` over an uploaded (or any binary) file, decoded as it is
+    read instead of loading the whole upload into one string. Raises
+    ImportFileError when the header is missing or lacks a required column.
+    """
+    uploaded_file.seek(0)
+    reader = csv.DictReader(codecs.iterdecode(uploaded_file, 'utf-8-sig'))
+    if not reader.fieldnames:
+        raise ImportFileError('CSV file is empty')
+    missing = REQUIRED_COLUMNS - {name.strip() for name in reader.fieldnames}
+    if missing:
+        raise ImportFileError(f'Missing required columns: {", ".join(sorted(missing))}')
+    return reader
+
+
+def parse_row(row):
+    """Validate one CSV row; returns the cleaned values or raises ValueError"""
+    category_name = (row.get('category') or '').strip()
+    if not category_name:
+        raise ValueError('Category is required')
+    supply_name = (row.get('name') or '').strip()
+    if not supply_name:
+        raise ValueError('Supply name is required')
+
+    try:
+        quantity = int(row.get('quantity') or 0)
+        min_stock = int(row.get('min_stock_level') or 5)
+        cost_per_unit = Decimal((row.get('cost_per_unit') or '0').strip()).quantize(Decimal('0.01'))
+    except (ValueError, InvalidOperation) as e:
+        raise ValueError(f'Invalid data - {e}')
+    if quantity < 0 or min_stock < 0:
+        raise ValueError('Invalid data - quantity and min_stock_level cannot be negative')
+    if abs(cost_per_unit) >= 10 ** 8:
+        raise ValueError('Invalid data - cost_per_unit is too large')
+
+    return {
+        'name': supply_name,
+        'category_name': category_name,
+        'quantity': quantity,
+        'unit': (row.get('unit') or 'pieces').strip(),
+        'description': (row.get('description') or '').strip(),
+        'min_stock_level': min_stock,
+        'cost_per_unit': cost_per_unit,
+        'location': (row.get('location') or 'Main Storage').strip(),
+        'is_consumable': (row.get('is_consumable') or 'false').strip().lower() in ('true', 'yes', '1'),
+    }
+
+
+def update_supplies(supplies):
+    """
+    Write UPDATE_FIELDS for existing supplies with one parameterised UPDATE
+    run through ``executemany``. ``bulk_update`` builds a CASE expression per
+    field and row in Python, which dominates large imports.
+    """
+    if not supplies:
+        return
+    fields = [Supply._meta.get_field(name) for name in UPDATE_FIELDS]
+    pk_field = Supply._meta.pk
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(Supply._meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(pk_field.column),
+    )
+    params = [
+        [field.get_db_prep_save(getattr(supply, field.attname), connection) for field in fields]
+        + [supply.pk]
+        for supply in supplies
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _chunks(rows, size):
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_supplies(rows, progress=None):
+    """
+    Import parsed CSV ``rows`` (dicts, e.g. from ``read_csv``). Supplies are
+    matched by name: existing ones are updated, others are created, and a
+    name repeated in the file is applied in file order.
+
+    Each new name is also looked up in a trigram index of existing names (and
+    names earlier in the file) to flag likely duplicates such as "A4 Bond
+    Paper" vs "Bond Paper A4"; flagged rows are still imported.
+
+    Rows are consumed IMPORT_BATCH_SIZE at a time, so memory stays flat for
+    very large files; ``progress(rows_done)`` is called after each chunk.
+    Returns a dict with ``created``, ``updated``, ``errors`` (row messages),
+    ``duplicates`` (``{'row', 'name', 'matches'}``), both capped at
+    MAX_REPORTED_ERRORS, and ``error_count`` / ``duplicate_count``.
+    """
+    errors = []
+    duplicates = []
+    duplicate_count = 0
+    categories = dict(SupplyCategory.objects.values_list('name', 'pk'))
+    existing = {}
+    for supply_id, name in Supply.objects.values_list('pk', 'name'):
+        existing.setdefault(name, []).append(supply_id)
+    name_index = TrigramIndex((ids[0], name) for name, ids in existing.items())
+
+    created_count = updated_count = rows_done = 0
+    created_ids = []
+    # Start at 2 because row 1 is header
+    for chunk in _chunks(enumerate(rows, start=2), IMPORT_BATCH_SIZE):
+        rows_done += len(chunk)
+
+        # Pass 1: validate, keeping the last row for each supply name
+        pending = {}
+        chunk_created = chunk_updated = 0
+        for row_num, row in chunk:
+            try:
+                values = parse_row(row)
+            except ValueError as e:
+                errors.append(f"Row {row_num}: {e}")
+                continue
+            if len(existing.get(values['name'], [])) > 1:
+                errors.append(f"Row {row_num}: More than one supply is named \"{values['name']}\"")
+                continue
+            if values['name'] in existing or values['name'] in pending:
+                chunk_updated += 1
+            else:
+                chunk_created += 1
+                matches = name_index.similar(values['name'], limit=DUPLICATE_MATCHES_PER_ROW)
+                if matches:
+                    duplicate_count += 1
+                    if len(duplicates) < MAX_REPORTED_ERRORS:
+                        duplicates.append({
+                            'row': row_num,
+                            'name': values['name'],
+                            'matches': [
+                                {'id': key, 'name': name, 'score': score} for key, name, score in matches
+                            ],
+                        })
+                # Catch near-duplicates later in the same file too (no id yet)
+                name_index.add(None, values['name'])
+            values['row_num'] = row_num
+            pending[values['name']] = values
+
+        # Pass 2: write the chunk in one transaction
+        to_create, to_update = [], []
+        try:
+            with transaction.atomic():
+                new_categories = {values['category_name'] for values in pending.values()} - categories.keys()
+                if new_categories:
+                    SupplyCategory.objects.bulk_create([SupplyCategory(name=name) for name in sorted(new_categories)])
+                    categories.update(
+                        SupplyCategory.objects.filter(name__in=new_categories).values_list('name', 'pk')
+                    )
+                    bump_table_versions(SupplyCategory)
+
+                now = timezone.now()
+                for values in pending.values():
+                    supply = Supply(
+                        category_id=categories[values['category_name']],
+                        updated_at=now,
+                        **{key: value for key, value in values.items() if key not in ('category_name', 'row_num')}
+                    )
+                    if values['name'] in existing:
+                        supply.pk = existing[values['name']][0]
+                        to_update.append(supply)
+                    else:
+                        to_create.append(supply)
+                created = Supply.objects.bulk_create(to_create)
+                update_supplies(to_update)
+                bump_table_versions(Supply)
+        except Exception as e:
+            # Categories created for this chunk were rolled back too
+            categories = dict(SupplyCategory.objects.values_list('name', 'pk'))
+            row_nums = [values['row_num'] for values in pending.values()] or [row_num for row_num, _ in chunk]
+            errors.append(f"Rows {min(row_nums)}-{max(row_nums)}: {e}")
+        else:
+            created_count += chunk_created
+            updated_count += chunk_updated
+            if any(supply.pk is None for supply in created):
+                # Backends that don't return primary keys from bulk_create
+                names = [supply.name for supply in created]
+                created = Supply.objects.filter(name__in=names).only('pk', 'name')
+            for supply in created:
+                existing[supply.name] = [supply.pk]
+                created_ids.append(supply.pk)
+
+        if progress is not None:
+            progress(rows_done)
+
+    # Render QR codes for new supplies off the request path
+    if created_ids:
+        queue_supply_qr_bulk(created_ids)
+
+    return {
+        'created': created_count,
+        'updated': updated_count,
+        'errors': errors[:MAX_REPORTED_ERRORS],
+        'error_count': len(errors),
+        'duplicates': duplicates,
+        'duplicate_count': duplicate_count,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Resumable uploads
+# ---------------------------------------------------------------------------
+
+def upload_path(upload):
+    return os.path.join(settings.IMPORT_UPLOAD_DIR, f'{upload.pk}.part')
+
+
+def received_bytes(upload):
+    """Bytes stored so far - the offset the next chunk must start at"""
+    try:
+        return os.path.getsize(upload_path(upload))
+    except FileNotFoundError:
+        return 0
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Append ``length`` bytes read from ``stream`` to the upload's part file.
+    The chunk must start at the current end of the file, so a client that
+    lost a response can ask for the offset and resend from there; a chunk cut
+    off mid-way leaves the bytes that did arrive. Returns the new size.
+    """
+    os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+    length = min(length, upload.size - offset)
+    with open(upload_path(upload), 'ab') as part:
+        if part.tell() != offset:
+            raise UploadOffsetMismatch(part.tell())
+        remaining = length
+        while remaining > 0:
+            data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+            if not data:
+                break
+            part.write(data)
+            remaining -= len(data)
+        return part.tell()
+
+
+def discard_upload(upload):
+    try:
+        os.remove(upload_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def prune_stale_uploads():
+    """Drop uploads (and their part files) untouched for IMPORT_UPLOAD_TTL seconds"""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_UPLOAD_TTL', 24 * 3600))
+    for upload in ImportUpload.objects.filter(updated_at__lt=cutoff).exclude(status='processing'):
+        discard_upload(upload)
+        upload.delete()
+
+
+def queue_upload_import(upload):
+    """Parse and import a completed upload in the background after commit"""
+    # A single worker thread, so large imports run one at a time
+    run_after_commit('supply-import', run_upload_import, upload.pk)
+
+
+def run_upload_import(upload_id):
+    """
+    Import an assembled upload, streaming the CSV from disk. Progress (bytes
+    and rows read) is written back after every chunk of rows.
+    """
+    upload = ImportUpload.objects.get(pk=upload_id)
+    uploads = ImportUpload.objects.filter(pk=upload_id)
+    try:
+        with open(upload_path(upload), 'rb') as raw:
+            def progress(rows_done):
+                uploads.update(bytes_processed=raw.tell(), rows_processed=rows_done, updated_at=timezone.now())
+
+            result = import_supplies(read_csv(raw), progress=progress)
+        uploads.update(status='completed', bytes_processed=upload.size, result=result, updated_at=timezone.now())
+    except (ImportFileError, csv.Error, UnicodeDecodeError) as e:
+        uploads.update(status='failed', error=str(e), updated_at=timezone.now())
+    except Exception as e:
+        print(f"[WARNING] Supply import {upload_id} failed: {type(e).__name__}: {e}")
+        uploads.update(status='failed', error=f'Error processing file: {e}', updated_at=timezone.now())
+    finally:
+        discard_upload(upload)
@@ -0,0 +1,73 @@
+"""
+Per-table version counters kept in the cache backend.
+
+Every save or delete of a model in VERSIONED_MODELS bumps that model's
+counter once the transaction commits (signals.py). Code that changes rows
+without signals (``QuerySet.update``, ``bulk_create``, raw SQL) calls
+``bump_table_versions`` itself. Cached results are stored under keys that
+include the versions of every table they were computed from, so a write
+makes the old entries unreachable immediately: no TTL has to be tuned for
+freshness.
+
+Counters live in the cache, which CACHES keeps shared by every process
+(Redis, or the database cache without it). A bump stores a new random
+version rather than incrementing, since ``incr`` is a read and a write on
+the database backend and two concurrent bumps could otherwise land on the
+same value.
+"""
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(model):
+    return f'table-version:{model._meta.label_lower}'
+
+
+def _new_version():
+    # Random, so a counter that was evicted never comes back at a value an
+    # older cache entry was stored under; fits the catalog index's uint64
+    return secrets.randbits(63)
+
+
+def table_versions(*models):
+    """Current version of each model's table, in the order given"""
+    keys = [_version_key(model) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _new_version(), None)
+            found[key] = cache.get(key)
+    return tuple(found[key] for key in keys)
+
+
+def _bump(models):
+    cache.set_many({_version_key(model): _new_version() for model in models}, None)
+
+
+def bump_table_versions(*models):
+    """Invalidate everything cached from these tables once the current transaction commits"""
+    transaction.on_commit(lambda: _bump(models))
+
+
+def versioned_cache_key(prefix, models, *parts):
+    """Cache key for a result of ``prefix`` computed from ``models`` with inputs ``parts``"""
+    versions = '.'.join(str(version) for version in table_versions(*models))
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+    return f'{prefix}:{versions}:{digest}'
+
+
+def cached_for_tables(prefix, models, parts, compute):
+    """
+    ``compute()``, cached until a row of one of ``models`` changes. ``parts``
+    are the other inputs the result depends on (filters, user role, ...).
+    """
+    key = versioned_cache_key(prefix, models, *parts)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, getattr(settings, 'VERSIONED_CACHE_TIMEOUT', 24 * 3600))
+    return value
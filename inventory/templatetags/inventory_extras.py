@@ -1,5 +1,8 @@
 from django import template
 
+from ..images import image_sources, image_srcset as build_image_srcset
+from ..qr_views import qr_image_url as build_qr_image_url
+
 register = template.Library()
 
 @register.filter(name='abs')
@@ -8,3 +11,24 @@ def abs_filter(value):
         return abs(int(value))
     except (ValueError, TypeError):
         return value
+
+@register.simple_tag
+def qr_image_url(obj, fmt='png', batch=None):
+    """Content-addressed QR image URL for a supply or supply request"""
+    return build_qr_image_url(obj, fmt=fmt, batch=batch)
+
+@register.simple_tag
+def image_srcset(file, variants, fmt='webp'):
+    """srcset of the resized copies of an uploaded image ('webp' or 'jpg')"""
+    return build_image_srcset(file, variants, fmt)
+
+@register.inclusion_tag('inventory/partials/responsive_image.html')
+def responsive_image(file, variants, alt='', css_class='', sizes='100vw', loading='lazy'):
+    """<picture> serving resized WebP/JPEG copies of an uploaded image, or the original until they exist"""
+    return {
+        'image': image_sources(file, variants),
+        'alt': alt,
+        'css_class': css_class,
+        'sizes': sizes,
+        'loading': loading,
+    }
@@ -3,6 +3,10 @@ from django.contrib.auth import views as auth_views
 from . import views
 from . import analytics_views
 from . import stock_adjustment_views
+from . import qr_views
+from . import export_views
+from . import import_views
+from . import catalog_views
 
 urlpatterns = [
     # Authentication
@@ -16,12 +20,17 @@ urlpatterns = [
     
     # Dashboard
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/panels/<slug:panel>/', views.dashboard_panel, name='dashboard_panel'),
     
     # Supply Management
     path('supplies/', views.supply_list, name='supply_list'),
     path('supplies/create/', views.supply_create, name='supply_create'),
     path('supplies/import/', views.supply_import, name='supply_import'),
     path('supplies/import/process/', views.supply_import_process, name='supply_import_process'),
+    path('supplies/import/uploads/', import_views.import_upload_start, name='import_upload_start'),
+    path('supplies/import/uploads/<uuid:upload_id>/', import_views.import_upload_status, name='import_upload_status'),
+    path('supplies/import/uploads/<uuid:upload_id>/chunk/', import_views.import_upload_chunk, name='import_upload_chunk'),
+    path('supplies/import/uploads/<uuid:upload_id>/complete/', import_views.import_upload_complete, name='import_upload_complete'),
     path('supplies/bulk-delete/', views.bulk_delete_supplies, name='bulk_delete_supplies'),
     path('supplies/history/', views.transaction_list, name='transaction_list'),
     path('supplies/<int:pk>/', views.supply_detail, name='supply_detail'),
@@ -31,6 +40,8 @@ urlpatterns = [
     path('supplies/<int:pk>/generate-qr/', views.generate_qr_code, name='generate_qr_code'),
     path('supplies/<int:pk>/qr/', views.get_qr_code, name='get_qr_code'),
     path('supplies/generate-qr-bulk/', views.generate_qr_codes_bulk, name='generate_qr_codes_bulk'),
+    path('qr/<str:kind>/<int:pk>/<str:digest>.<str:fmt>', qr_views.qr_image, name='qr_image'),
+    path('qr/labels/', qr_views.qr_label_sheet, name='qr_label_sheet'),
     
     # Category Management
     path('categories/', views.category_list, name='category_list'),
@@ -41,6 +52,8 @@ urlpatterns = [
     path('api/categories/create/', views.create_category_api, name='create_category_api'),
     path('api/categories/list/', views.get_categories_api, name='get_categories_api'),
     path('api/categories/<int:pk>/supplies/', views.get_category_supplies_api, name='get_category_supplies_api'),
+    path('api/catalog/<str:digest>.json', catalog_views.supply_catalog, name='supply_catalog'),
+    path('api/supplies/autocomplete/', views.supply_autocomplete, name='supply_autocomplete'),
     
     # Supply Suggestions (AI)
     path('api/supply-suggestions/', views.get_supply_suggestions, name='get_supply_suggestions'),
@@ -88,6 +101,9 @@ urlpatterns = [
     path('reports/export/supplies/pdf/', views.export_supplies_pdf, name='export_supplies_pdf'),
     path('reports/export/requests/pdf/', views.export_requests_pdf, name='export_requests_pdf'),
     path('reports/export/transactions/pdf/', views.export_transactions_pdf, name='export_transactions_pdf'),
+    path('reports/export/jobs/', export_views.export_job_start, name='export_job_start'),
+    path('reports/export/jobs/<uuid:job_id>/', export_views.export_job_status, name='export_job_status'),
+    path('reports/export/jobs/<uuid:job_id>/download/', export_views.export_job_download, name='export_job_download'),
     
     # User Management
     path('user-management/', views.user_management, name='user_management'),
@@ -2,32 +2,22 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.db.models import Q, Count, Sum, F, Exists, OuterRef
+from django.db import transaction
+from django.db.models import Q, Count, Sum, F, Max
+from django.db.models.functions import Lower
 from django.utils import timezone
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 from django_htmx.http import HttpResponseClientRefresh
 import json
 import uuid
 import csv
-from io import StringIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
 from django.conf import settings
 
-# Optional Gemini import for AI suggestions
-try:
-    import google.generativeai as genai
-    GENAI_AVAILABLE = True
-except (ImportError, TypeError) as e:
-    GENAI_AVAILABLE = False
-    print(f"[WARNING] Gemini API not available: {type(e).__name__}: {e}")
-
 from .models import (
     User, Supply, SupplyCategory, SupplyRequest, 
     QRScanLog, InventoryTransaction, BorrowedItem
@@ -35,10 +25,22 @@ from .models import (
 from .models import Notification
 from .forms import (
     CustomUserCreationForm, SupplyForm, SupplyRequestForm, 
-    SupplyCategoryForm, QRScanForm, BorrowedItemForm, BorrowRequestForm
+    SupplyCategoryForm, QRScanForm, BorrowedItemForm, BorrowRequestForm,
+    SUPPLY_SCOPES, supply_option_data, supply_scope_queryset
 )
 from .forms import UserProfileForm
 from .utils import check_low_stock_alerts, has_overdue_items, get_user_overdue_items, ensure_low_stock_notifications, ensure_overdue_notifications
+from .signals import track_bulk_approvals, track_bulk_returns
+from .suggestions import get_suggestion_service
+from .qr_rendering import queue_request_qr, queue_supply_qr, queue_supply_qr_bulk
+from .qr_views import qr_image_url
+from .label_sheets import LABEL_SEGMENT_PAGES, LABEL_TEMPLATES
+from .exports import tabular_export
+from .table_versions import bump_table_versions, cached_for_tables
+from .catalog import current_catalog
+from .catalog_index import indexed_supply
+from .reports import REPORTS, report_kpis, report_page, report_pdf, report_table
+from .supply_import import ImportFileError, import_supplies, read_csv
 from django.views.decorators.http import require_POST
 
 
@@ -104,45 +106,97 @@ def profile_update(request):
 @login_required
 def dashboard(request):
     user = request.user
-    
-    # Proactively check for low stock items and notify staff
-    if user.role in ['admin', 'gso_staff']:
-        ensure_low_stock_notifications()
-        ensure_overdue_notifications()
+    context = {'user': user}
+    context.update(dashboard_counts(user))
+    if user.role == 'department_user':
+        context['has_overdue_items'] = context['overdue_count'] > 0
+    # Panels are loaded by the page itself (dashboard_panel)
+    return render(request, 'inventory/dashboard.html', context)
 
-    context = {
-        'user': user,
-        'total_supplies': Supply.objects.count(),
-        'low_stock_count': Supply.objects.filter(quantity__lte=F('min_stock_level')).count(),
+
+def dashboard_counts(user):
+    """
+    Stat card counts, one conditional aggregate per table, reused until one
+    of the tables changes. Department users only count their own requests
+    and overdue items.
+    """
+    is_staff = user.role in ['admin', 'gso_staff']
+    today = timezone.now().date()
+
+    def compute():
+        counts = Supply.objects.aggregate(
+            total_supplies=Count('pk'),
+            low_stock_count=Count('pk', filter=Q(quantity__lte=F('min_stock_level'))),
+        )
+        requests = SupplyRequest.objects.all() if is_staff else SupplyRequest.objects.filter(user=user)
+        counts.update(requests.aggregate(
+            total_requests=Count('pk'),
+            pending_requests_count=Count('pk', filter=Q(status='pending')),
+        ))
+        borrowed = BorrowedItem.objects.filter(returned_at__isnull=True)
+        if not is_staff:
+            borrowed = borrowed.filter(borrower=user)
+        counts.update(borrowed.aggregate(
+            overdue_count=Count('pk', filter=Q(return_deadline__lt=today)),
+        ))
+        return counts
+
+    return cached_for_tables(
+        'dashboard-counts', (Supply, SupplyRequest, BorrowedItem),
+        (is_staff, None if is_staff else user.pk, today), compute
+    )
+
+
+def _overdue_panel(user):
+    ensure_overdue_notifications()
+    return {
+        'overdue_items_list': BorrowedItem.objects.filter(
+            returned_at__isnull=True, return_deadline__lt=timezone.now().date()
+        ).select_related('supply', 'borrower').order_by('return_deadline')[:10],
     }
-    
-    # Role-specific request counts
-    if user.role == 'admin':
-        context['total_requests'] = SupplyRequest.objects.count()
-        context['pending_requests_count'] = SupplyRequest.objects.filter(status='pending').count()
-        context['recent_requests'] = SupplyRequest.objects.order_by('-created_at')[:10]
-        context['low_stock_items'] = Supply.objects.filter(quantity__lte=F('min_stock_level'))[:10]
-        context['recently_borrowed'] = BorrowedItem.objects.filter(returned_at__isnull=True).order_by('-borrowed_at')[:10]
-        context['overdue_items_list'] = BorrowedItem.objects.filter(returned_at__isnull=True, return_deadline__lt=timezone.now().date()).order_by('return_deadline')[:10]
-    elif user.role == 'gso_staff':
-        context['total_requests'] = SupplyRequest.objects.count()
-        context['pending_requests_count'] = SupplyRequest.objects.filter(status='pending').count()
-        context['gso_pending_requests'] = SupplyRequest.objects.filter(status='pending').order_by('-created_at')[:10]
-        context['recent_approvals'] = SupplyRequest.objects.filter(approved_by=user).order_by('-approved_at')[:5]
-        context['low_stock_items'] = Supply.objects.filter(quantity__lte=F('min_stock_level'))[:10]
-        context['recently_borrowed'] = BorrowedItem.objects.filter(returned_at__isnull=True).order_by('-borrowed_at')[:10]
-        context['overdue_items_list'] = BorrowedItem.objects.filter(returned_at__isnull=True, return_deadline__lt=timezone.now().date()).order_by('return_deadline')[:10]
-    else:  # department_user
-        # For department users, only show their own requests
-        user_requests = SupplyRequest.objects.filter(user=user)
-        context['total_requests'] = user_requests.count()
-        context['pending_requests_count'] = user_requests.filter(status='pending').count()
-        context['my_requests'] = user_requests.order_by('-created_at')[:10]
-        context['my_borrowed_items'] = BorrowedItem.objects.filter(borrower=user, returned_at__isnull=True).order_by('-borrowed_at')[:10]
-        context['has_overdue_items'] = has_overdue_items(user)
-        context['overdue_items'] = get_user_overdue_items(user)
-    
-    return render(request, 'inventory/dashboard.html', context)
+
+
+def _low_stock_panel(user):
+    ensure_low_stock_notifications()
+    return {
+        'low_stock_items': Supply.objects.filter(
+            quantity__lte=F('min_stock_level')
+        ).select_related('category')[:10],
+    }
+
+
+# Panel -> (template, roles allowed or None for everyone, context builder)
+DASHBOARD_PANELS = {
+    'overdue': ('inventory/partials/dashboard_overdue.html', ['admin', 'gso_staff'], _overdue_panel),
+    'borrowed': ('inventory/partials/dashboard_borrowed.html', ['admin', 'gso_staff'], lambda user: {
+        'recently_borrowed': BorrowedItem.objects.filter(
+            returned_at__isnull=True
+        ).select_related('supply', 'borrower').order_by('-borrowed_at')[:10],
+    }),
+    'low-stock': ('inventory/partials/dashboard_low_stock.html', ['admin', 'gso_staff'], _low_stock_panel),
+    'recent-requests': ('inventory/partials/dashboard_recent_requests.html', ['admin', 'gso_staff'], lambda user: {
+        'recent_requests': SupplyRequest.objects.select_related('user', 'supply').order_by('-created_at')[:10],
+    }),
+    'my-borrowed': ('inventory/partials/dashboard_my_borrowed.html', None, lambda user: {
+        'my_borrowed_items': BorrowedItem.objects.filter(
+            borrower=user, returned_at__isnull=True
+        ).select_related('supply').order_by('-borrowed_at')[:10],
+    }),
+    'my-requests': ('inventory/partials/dashboard_my_requests.html', None, lambda user: {
+        'my_requests': SupplyRequest.objects.filter(user=user).select_related('supply').order_by('-created_at')[:10],
+    }),
+}
+
+
+@login_required
+def dashboard_panel(request, panel):
+    """One of the dashboard's list panels, fetched by the page after it has loaded"""
+    if panel not in DASHBOARD_PANELS:
+        raise Http404('Unknown dashboard panel')
+    template_name, roles, get_context = DASHBOARD_PANELS[panel]
+    if roles is not None and request.user.role not in roles:
+        return HttpResponse(status=403)
+    return render(request, template_name, get_context(request.user))
 
 
 @login_required
@@ -155,6 +209,26 @@ def mark_all_notifications_read(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+# Rendered into cached partials in place of the CSRF token, then swapped for
+# the viewer's own token on every response
+CSRF_TOKEN_PLACEHOLDER = '__csrf_token_placeholder__'
+
+
+def render_cached_partial(request, template_name, models, parts, get_context):
+    """
+    Render an HTMX partial, reusing the HTML until a row of one of ``models``
+    changes. ``parts`` must hold everything else the HTML depends on
+    (filters, user role, ...). Partials only see ``user`` and the context
+    from ``get_context()``, which is not called on a cache hit.
+    """
+    def render_partial():
+        context = get_context()
+        context.update({'user': request.user, 'csrf_token': CSRF_TOKEN_PLACEHOLDER})
+        return render_to_string(template_name, context)
+
+    html = cached_for_tables(f'partial:{template_name}', models, parts, render_partial)
+    return HttpResponse(html.replace(CSRF_TOKEN_PLACEHOLDER, get_token(request)))
+
 @login_required
 def supply_list(request):
     # Ensure admins/GSO staff have low-stock notifications for current low supplies
@@ -167,9 +241,6 @@ def supply_list(request):
     supplies = Supply.objects.all()
     categories = SupplyCategory.objects.all()
     
-    # Get low stock count
-    low_stock_count = Supply.objects.filter(quantity__lte=F('min_stock_level')).count()
-    
     # Search functionality - enhanced search
     search = request.GET.get('search', '').strip()
     # Handle "undefined" values from HTMX
@@ -252,14 +323,21 @@ def supply_list(request):
         'search': search,
         'category_filter': category_filter,
         'stock_filter': stock_filter,
-        'low_stock_count': low_stock_count,
         'sort_by': sort_by,
         'sort_order': sort_order,
+        'label_templates': LABEL_TEMPLATES,
+        'label_segment_pages': LABEL_SEGMENT_PAGES,
     }
     
     if request.htmx:
-        return render(request, 'inventory/partials/supply_list.html', context)
+        return render_cached_partial(
+            request, 'inventory/partials/supply_list.html', (Supply, SupplyCategory),
+            (request.user.role, search, category_filter, stock_filter, sort_by, sort_order),
+            lambda: context
+        )
     
+    # Get low stock count
+    context['low_stock_count'] = Supply.objects.filter(quantity__lte=F('min_stock_level')).count()
     return render(request, 'inventory/supply_list.html', context)
 
 @login_required
@@ -301,7 +379,7 @@ def supply_create(request):
         form = SupplyForm(request.POST, request.FILES)
         if form.is_valid():
             supply = form.save()
-            supply.generate_qr_code()
+            queue_supply_qr(supply)
             messages.success(request, f'Supply "{supply.name}" created successfully.')
             return redirect('supply_detail', pk=supply.pk)
     else:
@@ -317,7 +395,8 @@ def supply_import(request):
         return redirect('supply_list')
     
     context = {
-        'categories': SupplyCategory.objects.all()
+        'categories': SupplyCategory.objects.all(),
+        'max_upload_mb': settings.IMPORT_UPLOAD_MAX_SIZE // (1024 * 1024),
     }
     return render(request, 'inventory/supply_import.html', context)
 
@@ -337,90 +416,15 @@ def supply_import_process(request):
         return JsonResponse({'success': False, 'error': 'Please upload a CSV file'})
     
     try:
-        # Read CSV file
-        decoded_file = csv_file.read().decode('utf-8')
-        csv_reader = csv.DictReader(StringIO(decoded_file))
-        
-        if not csv_reader.fieldnames:
-            return JsonResponse({'success': False, 'error': 'CSV file is empty'})
-        
-        # Validate required columns
-        required_columns = {'name', 'category', 'quantity', 'unit', 'description'}
-        csv_columns = set(csv_reader.fieldnames)
-        
-        if not required_columns.issubset(csv_columns):
-            missing = required_columns - csv_columns
-            return JsonResponse({
-                'success': False, 
-                'error': f'Missing required columns: {", ".join(missing)}'
-            })
-        
-        # Process rows
-        created_count = 0
-        updated_count = 0
-        errors = []
-        
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because row 1 is header
-            try:
-                # Get category
-                category_name = row.get('category', '').strip()
-                if not category_name:
-                    errors.append(f"Row {row_num}: Category is required")
-                    continue
-                
-                category, _ = SupplyCategory.objects.get_or_create(name=category_name)
-                
-                # Get or create supply
-                supply_name = row.get('name', '').strip()
-                if not supply_name:
-                    errors.append(f"Row {row_num}: Supply name is required")
-                    continue
-                
-                quantity = int(row.get('quantity', 0))
-                unit = row.get('unit', 'pieces').strip()
-                description = row.get('description', '').strip()
-                min_stock = int(row.get('min_stock_level', 5))
-                cost_per_unit = float(row.get('cost_per_unit', 0.00))
-                location = row.get('location', 'Main Storage').strip()
-                is_consumable = row.get('is_consumable', 'false').lower() in ('true', 'yes', '1')
-                
-                supply, created = Supply.objects.update_or_create(
-                    name=supply_name,
-                    defaults={
-                        'category': category,
-                        'quantity': quantity,
-                        'unit': unit,
-                        'description': description,
-                        'min_stock_level': min_stock,
-                        'cost_per_unit': cost_per_unit,
-                        'location': location,
-                        'is_consumable': is_consumable,
-                    }
-                )
-                
-                # Generate QR code if new
-                if created:
-                    supply.generate_qr_code()
-                    created_count += 1
-                else:
-                    updated_count += 1
-                    
-            except ValueError as e:
-                errors.append(f"Row {row_num}: Invalid data - {str(e)}")
-            except Exception as e:
-                errors.append(f"Row {row_num}: {str(e)}")
-        
-        return JsonResponse({
-            'success': True,
-            'created': created_count,
-            'updated': updated_count,
-            'errors': errors
-        })
-        
-    except csv.Error as e:
+        result = import_supplies(read_csv(csv_file))
+    except ImportFileError as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    except (csv.Error, UnicodeDecodeError) as e:
         return JsonResponse({'success': False, 'error': f'CSV parsing error: {str(e)}'})
     except Exception as e:
         return JsonResponse({'success': False, 'error': f'Error processing file: {str(e)}'})
+    
+    return JsonResponse({'success': True, **result})
 
 @login_required
 def supply_edit(request, pk):
@@ -475,53 +479,59 @@ def request_list(request):
             Q(user__username__icontains=search)
         )
     
-    # Grouping requests (by date and user for simple grouping if no group_id)
-    # In a real app, you'd have a Batch/RequestGroup model.
-    # Here we'll group by a combination of created_at date and user.
-    from collections import defaultdict
-    grouped_requests = defaultdict(list)
-    
-    for req in requests_qs.order_by('-created_at'):
-        # If purpose has a special pattern like [BATCH:xyz], use that
-        # Otherwise group by (user, date)
-        group_key = (req.user_id, req.created_at.strftime('%Y-%m-%d %H:%M'))
-        grouped_requests[group_key].append(req)
-    
-    processed_groups = []
-    for key, items in grouped_requests.items():
-        first_item = items[0]
-        # Determine status of the group
-        statuses = set(item.status for item in items)
-        if len(statuses) == 1:
-            group_status = statuses.pop()
-        else:
-            group_status = 'mixed'
+    def build_context():
+        # Grouping requests (by date and user for simple grouping if no group_id)
+        # In a real app, you'd have a Batch/RequestGroup model.
+        # Here we'll group by a combination of created_at date and user.
+        from collections import defaultdict
+        grouped_requests = defaultdict(list)
+    
+        for req in requests_qs.order_by('-created_at'):
+            # If purpose has a special pattern like [BATCH:xyz], use that
+            # Otherwise group by (user, date)
+            group_key = (req.user_id, req.created_at.strftime('%Y-%m-%d %H:%M'))
+            grouped_requests[group_key].append(req)
+    
+        processed_groups = []
+        for key, items in grouped_requests.items():
+            first_item = items[0]
+            # Determine status of the group
+            statuses = set(item.status for item in items)
+            if len(statuses) == 1:
+                group_status = statuses.pop()
+            else:
+                group_status = 'mixed'
             
-        is_borrowing = any(item.purpose.startswith('[BORROWING]') for item in items)
-        
-        processed_groups.append({
-            'id': f"{first_item.user_id}-{first_item.created_at.strftime('%Y%m%d%H%M')}",
-            'group_id': None, # Could be implemented if needed
-            'items': items,
-            'user': first_item.user,
-            'status': group_status,
-            'created_at': first_item.created_at,
-            'is_borrowing': is_borrowing
-        })
-    
-    # Sort groups by date
-    processed_groups.sort(key=lambda x: x['created_at'], reverse=True)
+            is_borrowing = any(item.purpose.startswith('[BORROWING]') for item in items)
+        
+            processed_groups.append({
+                'id': f"{first_item.user_id}-{first_item.created_at.strftime('%Y%m%d%H%M')}",
+                'group_id': None, # Could be implemented if needed
+                'items': items,
+                'user': first_item.user,
+                'status': group_status,
+                'created_at': first_item.created_at,
+                'is_borrowing': is_borrowing
+            })
     
-    context = {
-        'requests': processed_groups,
-        'status_filter': status_filter,
-        'search': search,
-    }
+        # Sort groups by date
+        processed_groups.sort(key=lambda x: x['created_at'], reverse=True)
     
+        return {
+            'requests': processed_groups,
+            'status_filter': status_filter,
+            'search': search,
+        }
+
     if request.htmx:
-        return render(request, 'inventory/partials/request_list.html', context)
+        # Department users only see their own requests
+        owner = user.pk if user.role == 'department_user' else None
+        return render_cached_partial(
+            request, 'inventory/partials/request_list.html', (SupplyRequest, Supply, User),
+            (user.role, owner, status_filter, search), build_context
+        )
     
-    return render(request, 'inventory/request_list.html', context)
+    return render(request, 'inventory/request_list.html', build_context())
 
 @login_required
 def request_create(request):
@@ -537,36 +547,25 @@ def request_create(request):
             supply_request.save()
             
             # Generate QR code for the request
-            supply_request.generate_borrowing_qr_code()
+            queue_request_qr(supply_request)
             
             messages.success(request, f'Request {supply_request.request_id} created successfully.')
             return redirect('request_detail', pk=supply_request.pk)
     else:
         form = SupplyRequestForm(user=request.user)
     
-    # Prepare supplies data for the template - only consumable items with stock
-    supplies_data = [
-        {
-            'id': s.pk,
-            'name': s.name,
-            'stock': s.quantity,
-            'unit': s.unit or 'pieces',
-            'is_consumable': True
-        }
-        for s in Supply.objects.filter(quantity__gt=0, is_consumable=True).order_by('name')
-    ]
-    
+    # Supplies data is fetched by the page from the shared catalog snapshot
     context = {
         'form': form,
         'action': 'Create',
-        'supplies_json': json.dumps(supplies_data)
+        'catalog_url': reverse('supply_catalog', args=[current_catalog()['digest']]),
     }
     
     return render(request, 'inventory/request_form.html', context)
 
 @login_required
 def request_detail(request, pk):
-    supply_request = get_object_or_404(SupplyRequest, pk=pk)
+    supply_request = get_object_or_404(SupplyRequest.objects.select_related('user', 'supply'), pk=pk)
     
     # Check permissions
     user = request.user
@@ -586,37 +585,13 @@ def request_detail(request, pk):
     
     is_batch = batch_items.count() > 1
     
-    # Ensure a unified QR code exists for the batch if items are approved or released
-    if is_batch and any(item.status in ['approved', 'released'] for item in batch_items):
-        # Try to find an existing QR code among batch items
-        shared_qr = None
-        for item in batch_items:
-            if item.borrowing_qr_code and item.borrowing_qr_code.name:
-                shared_qr = item.borrowing_qr_code
-                break
-        
-        if not shared_qr:
-            # Generate a new unified QR code for the batch
-            group_id = f"{supply_request.user.id}-{supply_request.created_at.strftime('%Y%m%d%H%M')}"
-            supply_request.generate_borrowing_qr_code(group_id=group_id)
-            shared_qr = supply_request.borrowing_qr_code
-            
-        # Ensure all items in the batch use the same QR code in the DB
-        # and ensure the current supply_request object has it set
-        qr_name = shared_qr.name
-        for item in batch_items:
-            if not item.borrowing_qr_code or item.borrowing_qr_code.name != qr_name:
-                item.borrowing_qr_code = qr_name
-                item.save()
-        
-        # Explicitly set it on the main request being viewed to ensure template sees it
-        if not supply_request.borrowing_qr_code or supply_request.borrowing_qr_code.name != qr_name:
-            supply_request.borrowing_qr_code = shared_qr
-    
+    # QR images are rendered on demand by the qr_image endpoint; batches share one code
     context = {
         'supply_request': supply_request,
         'batch_items': batch_items,
-        'is_batch': is_batch
+        'is_batch': is_batch,
+        'qr_png_url': qr_image_url(supply_request, 'png', batch=is_batch),
+        'qr_svg_url': qr_image_url(supply_request, 'svg', batch=is_batch),
     }
     
     return render(request, 'inventory/request_detail.html', context)
@@ -658,17 +633,19 @@ def request_approve(request, pk):
             created_at__minute=supply_request.created_at.minute
         )
         
-        batch_qs.filter(status='pending').update(
+        pending = list(batch_qs.filter(status='pending'))
+        SupplyRequest.objects.filter(pk__in=[r.pk for r in pending], status='pending').update(
             status='approved',
             approved_by=request.user,
             approved_at=now
         )
+        track_bulk_approvals(pending)
+        bump_table_versions(SupplyRequest)
         
         # Proactively generate batch QR code for unified scanning
         if batch_qs.count() > 1:
             group_id = f"{supply_request.user.id}-{supply_request.created_at.strftime('%Y%m%d%H%M')}"
-            supply_request.generate_borrowing_qr_code(group_id=group_id)
-            batch_qs.update(borrowing_qr_code=supply_request.borrowing_qr_code.name)
+            queue_request_qr(supply_request, group_id=group_id, batch_ids=batch_qs.values_list('pk', flat=True))
         
         if request.htmx:
             messages.success(request, f'Request {supply_request.request_id} approved successfully.')
@@ -797,7 +774,23 @@ def request_release(request, pk):
 def qr_scanner(request):
     return render(request, 'inventory/qr_scanner.html')
 
+def _version_etag(name, *parts):
+    """ETag from a resource name and its version stamp (counts, ids, timestamps)"""
+    return '-'.join([name] + [
+        f'{part.timestamp():.6f}' if hasattr(part, 'timestamp') else str(part)
+        for part in parts
+    ])
+
+
+def recent_scans_etag(request):
+    # Scan logs are append-only, so the count and newest id identify the list
+    stamp = QRScanLog.objects.filter(scanned_by=request.user).aggregate(count=Count('id'), last=Max('id'))
+    return _version_etag('scans', request.user.pk, stamp['count'], stamp['last'])
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=recent_scans_etag)
 def get_recent_scans(request):
     """API endpoint to fetch recent QR scans for the current user, grouped by batch"""
     try:
@@ -863,6 +856,11 @@ def get_recent_scans(request):
             'error': str(e)
         }, status=500)
 
+# A released request's borrow record is written in the same view call as
+# its released_at, so a batch return only closes records this close to it
+BATCH_RETURN_MATCH_WINDOW = timezone.timedelta(minutes=1)
+
+
 @login_required
 @require_http_methods(['POST'])
 def process_qr_scan(request):
@@ -1013,6 +1011,116 @@ def process_qr_scan(request):
                         'message': msg,
                         'errors': error_items
                     })
+
+                elif action == 'return' and is_borrowing_batch:
+                    # Batch Return Logic - resolve every open borrow record for the
+                    # released items in one query and restock with one update per supply.
+                    # Consumable (SUPPLY-REQ-BATCH-) batches have nothing to return and
+                    # fall through to the invalid action response below
+                    released_items = [req for req in batch_items if req.status == 'released']
+                    if not released_items:
+                        return JsonResponse({'error': 'No released items in this batch are awaiting return.'}, status=400)
+
+                    now = timezone.now()
+                    released_times = [req.released_at for req in released_items if req.released_at]
+                    with transaction.atomic():
+                        open_borrows = list(
+                            BorrowedItem.objects.select_for_update().filter(
+                                borrower_id=user_id,
+                                supply_id__in={req.supply_id for req in released_items},
+                                returned_at__isnull=True,
+                                borrowed_at__gte=min(released_times, default=now) - BATCH_RETURN_MATCH_WINDOW,
+                                borrowed_at__lte=max(released_times, default=now) + BATCH_RETURN_MATCH_WINDOW,
+                            )
+                        ) if released_times else []
+
+                        # Match each released request to the open borrow record written
+                        # when it was released, so a repeated scan finds nothing left to
+                        # close instead of returning another borrow of the same supply.
+                        # Prefer an exact quantity match, then the closest in time
+                        to_return = []
+                        error_items = []
+                        for req in released_items:
+                            candidates = [
+                                b for b in open_borrows
+                                if b.supply_id == req.supply_id and req.released_at
+                                and abs(b.borrowed_at - req.released_at) <= BATCH_RETURN_MATCH_WINDOW
+                            ]
+                            if not candidates:
+                                error_items.append(f"{req.supply.name} (No active borrow record)")
+                                continue
+                            candidates.sort(key=lambda b: abs(b.borrowed_at - req.released_at))
+                            match = next((b for b in candidates if b.borrowed_quantity == req.quantity_requested), candidates[0])
+                            open_borrows.remove(match)
+                            to_return.append(match)
+
+                        if not to_return:
+                            return JsonResponse({'error': 'No active borrowed items found for this batch.', 'errors': error_items}, status=400)
+
+                        # Aggregate the quantity to restore per supply
+                        restock = {}
+                        for borrowed_item in to_return:
+                            restock[borrowed_item.supply_id] = restock.get(borrowed_item.supply_id, 0) + borrowed_item.borrowed_quantity
+
+                        supplies = Supply.objects.select_for_update().in_bulk(list(restock))
+                        for supply_id, returned_quantity in restock.items():
+                            updates = {'quantity': F('quantity') + returned_quantity, 'updated_at': now}
+                            if location:
+                                updates['location'] = location
+                            Supply.objects.filter(pk=supply_id).update(**updates)
+
+                        BorrowedItem.objects.filter(pk__in=[b.pk for b in to_return]).update(
+                            returned_at=now,
+                            location_when_returned=location or None
+                        )
+                        bump_table_versions(Supply, BorrowedItem)
+
+                        # Running quantities so each transaction row records the correct before/after values
+                        running = {supply_id: supplies[supply_id].quantity for supply_id in restock}
+                        reason = f"Returned via Batch QR Scan (Group: {group_id})"
+                        transactions = []
+                        scan_logs = []
+                        for borrowed_item in to_return:
+                            supply = supplies[borrowed_item.supply_id]
+                            previous_quantity = running[supply.pk]
+                            running[supply.pk] = previous_quantity + borrowed_item.borrowed_quantity
+                            transactions.append(InventoryTransaction(
+                                supply=supply,
+                                transaction_type='in',
+                                quantity=borrowed_item.borrowed_quantity,
+                                previous_quantity=previous_quantity,
+                                new_quantity=running[supply.pk],
+                                reason=reason,
+                                performed_by=request.user
+                            ))
+                            scan_logs.append(QRScanLog(
+                                supply=supply,
+                                scanned_by=request.user,
+                                action='return',
+                                location=location or supply.location,
+                                notes=f"{notes} {reason}".strip() if notes else reason
+                            ))
+                            borrowed_item.returned_at = now
+
+                        InventoryTransaction.objects.bulk_create(transactions)
+                        bump_table_versions(InventoryTransaction)
+                        QRScanLog.objects.bulk_create(scan_logs)
+                        track_bulk_returns(to_return)
+
+                    count = len(to_return)
+                    msg = f'Successfully returned {count} items.'
+                    if error_items:
+                        msg += f' Failed items: {", ".join(error_items)}'
+
+                    return JsonResponse({
+                        'success': True,
+                        'is_batch': True,
+                        'count': count,
+                        'message': msg,
+                        'errors': error_items
+                    })
+                else:
+                    return JsonResponse({'error': 'Invalid batch action.'}, status=400)
             elif qr_data.startswith('BORROW-') or qr_data.startswith('SUPPLY-REQ-'):
                 # This is a borrowing or supply request QR code
                 parts = qr_data.split('-')
@@ -1272,7 +1380,10 @@ def process_qr_scan(request):
             else:
                 supply_id = int(qr_data)
             
-            supply = Supply.objects.get(pk=supply_id)
+            # Read-only scans are answered from the shared index when it is current
+            supply = indexed_supply(supply_id) if action == 'scan' else None
+            if supply is None:
+                supply = Supply.objects.get(pk=supply_id)
             
             # Store previous quantity for transaction logging
             previous_quantity = supply.quantity
@@ -1405,14 +1516,14 @@ def process_qr_scan(request):
                 } for t in recent_transactions]
             
             # Check if item is currently borrowed (released but not returned)
-            is_item_borrowed = False
-            borrowed_item = BorrowedItem.objects.filter(
-                supply=supply,
-                returned_at__isnull=True  # Item is borrowed if returned_at is null
-            ).order_by('-borrowed_at').first()
-            
-            if borrowed_item:
-                is_item_borrowed = True
+            if hasattr(supply, 'is_borrowed'):
+                # Recorded in the index
+                is_item_borrowed = supply.is_borrowed
+            else:
+                is_item_borrowed = BorrowedItem.objects.filter(
+                    supply=supply,
+                    returned_at__isnull=True  # Item is borrowed if returned_at is null
+                ).exists()
             
             return JsonResponse({
                 'success': True,
@@ -1449,105 +1560,34 @@ def reports(request):
     search_query = request.GET.get('search', '')
     status_filter = request.GET.get('status', '')
     
-    # Generate basic analytics
-    total_supplies = Supply.objects.count()
-    low_stock_items = Supply.objects.filter(quantity__lte=F('min_stock_level')).count()
-    total_requests = SupplyRequest.objects.count()
-    pending_requests = SupplyRequest.objects.filter(status='pending').count()
-    released_requests = SupplyRequest.objects.filter(status='released').count()
-    
-    # Recent activity - apply filters
-    recent_requests = SupplyRequest.objects.order_by('-created_at')[:10]
-    recent_transactions = InventoryTransaction.objects.order_by('-created_at')[:10]
-    
-    # Filtered requests for report view
-    filtered_requests = SupplyRequest.objects.all()
-    filtered_transactions = InventoryTransaction.objects.all()
-    filtered_supplies = Supply.objects.all()
-    
-    # Apply date filters
-    if date_from:
-        try:
-            from datetime import datetime
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-            filtered_requests = filtered_requests.filter(created_at__gte=date_from_obj)
-            filtered_transactions = filtered_transactions.filter(created_at__gte=date_from_obj)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            from datetime import datetime
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
-            # Add 1 day to include the entire day
-            from datetime import timedelta
-            date_to_obj = date_to_obj + timedelta(days=1)
-            filtered_requests = filtered_requests.filter(created_at__lt=date_to_obj)
-            filtered_transactions = filtered_transactions.filter(created_at__lt=date_to_obj)
-        except ValueError:
-            pass
-    
-    # Apply search filter
-    if search_query:
-        filtered_requests = filtered_requests.filter(
-            Q(request_id__icontains=search_query) |
-            Q(supply__name__icontains=search_query) |
-            Q(user__username__icontains=search_query)
+    context = {}
+    if report_type == 'overview':
+        context.update(report_kpis())
+        context['recent_requests'] = SupplyRequest.objects.select_related('user', 'supply').order_by('-created_at')[:10]
+        context['recent_transactions'] = (
+            InventoryTransaction.objects.select_related('supply', 'performed_by').order_by('-created_at')[:10]
         )
-        filtered_supplies = filtered_supplies.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__name__icontains=search_query)
-        )
-    
-    # Apply status filter for requests
-    if status_filter:
-        # Support regular SupplyRequest.status values
-        if status_filter in dict(SupplyRequest.STATUS_CHOICES).keys():
-            filtered_requests = filtered_requests.filter(status=status_filter)
-        # Support borrowed/returned pseudo-statuses derived from BorrowedItem
-        elif status_filter in ['borrowed', 'returned']:
-            borrowed_qs = BorrowedItem.objects.filter(
-                supply=OuterRef('supply'),
-                borrower=OuterRef('user')
-            )
-            if status_filter == 'borrowed':
-                borrowed_qs = borrowed_qs.filter(returned_at__isnull=True)
-            else:
-                borrowed_qs = borrowed_qs.filter(returned_at__isnull=False)
+    elif report_type in REPORTS:
+        context[f'filtered_{report_type}'] = report_page(report_type, request.GET, request.GET.get('page'))
+        # Filters for the pagination links
+        page_query = request.GET.copy()
+        page_query.pop('page', None)
+        context['page_query'] = page_query.urlencode()
 
-            filtered_requests = filtered_requests.filter(Exists(borrowed_qs), purpose__startswith='[BORROWING]')
-        else:
-            filtered_requests = filtered_requests.none()
-    
-    # Order by creation date
-    filtered_requests = filtered_requests.order_by('-created_at')
-    filtered_transactions = filtered_transactions.select_related('supply', 'performed_by').order_by('-created_at')
-    
     # Get unique status choices for the filter and include borrowed/returned
     request_statuses = list(SupplyRequest.STATUS_CHOICES) + [
         ('borrowed', 'Borrowed Item'),
         ('returned', 'Returned Item')
     ]
     
-    context = {
-        'total_supplies': total_supplies,
-        'low_stock_items': low_stock_items,
-        'total_requests': total_requests,
-        'pending_requests': pending_requests,
-        'released_requests': released_requests,
-        'recent_requests': recent_requests,
-        'recent_transactions': recent_transactions,
+    context.update({
         'report_type': report_type,
-        'filtered_requests': filtered_requests,
-        'filtered_transactions': filtered_transactions,
-        'filtered_supplies': filtered_supplies,
         'date_from': date_from,
         'date_to': date_to,
         'search_query': search_query,
         'status_filter': status_filter,
         'request_statuses': request_statuses,
-    }
+    })
     
     # If this is an HTMX request for filtered data, return partial
     if request.htmx:
@@ -1562,247 +1602,33 @@ def reports(request):
 
 @login_required
 def export_supplies_csv(request):
-    """Export supplies to CSV format with filters"""
+    """Export supplies as streamed CSV/NDJSON (optionally gzipped) with filters"""
     if request.user.role not in ['admin', 'gso_staff']:
         messages.error(request, 'You do not have permission to export reports.')
         return redirect('dashboard')
     
-    # Get filter parameters
-    search_query = request.GET.get('search', '')
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    
-    # Start with all supplies
-    supplies = Supply.objects.select_related('category').all()
-    
-    # Apply search filter
-    if search_query:
-        supplies = supplies.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__name__icontains=search_query)
-        )
-    
-    # Apply date filters
-    if date_from:
-        try:
-            from datetime import datetime
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-            supplies = supplies.filter(created_at__gte=date_from_obj)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            from datetime import datetime
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
-            from datetime import timedelta
-            date_to_obj = date_to_obj + timedelta(days=1)
-            supplies = supplies.filter(created_at__lt=date_to_obj)
-        except ValueError:
-            pass
-    
-    # Create the HttpResponse object with CSV header
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="supplies_report.csv"'
-    
-    # Create a CSV writer
-    writer = csv.writer(response)
-    
-    # Write the header row
-    writer.writerow([
-        'ID', 'Name', 'Category', 'Description', 'Quantity', 
-        'Min Stock Level', 'Unit', 'Cost Per Unit', 'Location', 
-        'Created At', 'Updated At'
-    ])
-    
-    # Write data rows
-    for supply in supplies:
-        writer.writerow([
-            supply.id,
-            supply.name,
-            supply.category.name if supply.category else '',
-            supply.description,
-            supply.quantity,
-            supply.min_stock_level,
-            supply.unit,
-            supply.cost_per_unit,
-            supply.location,
-            supply.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            supply.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    return response
+    columns, rows = report_table('supplies', request.GET)
+    return tabular_export(request, 'supplies_report', columns, rows)
 
 @login_required
 def export_requests_csv(request):
-    """Export supply requests to CSV format with filters"""
+    """Export supply requests as streamed CSV/NDJSON (optionally gzipped) with filters"""
     if request.user.role not in ['admin', 'gso_staff']:
         messages.error(request, 'You do not have permission to export reports.')
         return redirect('dashboard')
     
-    # Get filter parameters
-    search_query = request.GET.get('search', '')
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    status_filter = request.GET.get('status', '')
-    
-    # Start with all requests
-    requests = SupplyRequest.objects.select_related('user', 'supply', 'approved_by', 'released_by').all()
-    
-    # Apply search filter
-    if search_query:
-        requests = requests.filter(
-            Q(request_id__icontains=search_query) |
-            Q(supply__name__icontains=search_query) |
-            Q(user__username__icontains=search_query)
-        )
-    
-    # Apply date filters
-    if date_from:
-        try:
-            from datetime import datetime
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-            requests = requests.filter(created_at__gte=date_from_obj)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            from datetime import datetime
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
-            from datetime import timedelta
-            date_to_obj = date_to_obj + timedelta(days=1)
-            requests = requests.filter(created_at__lt=date_to_obj)
-        except ValueError:
-            pass
-    
-    # Apply status filter
-    if status_filter:
-        # Support regular SupplyRequest.status values
-        if status_filter in dict(SupplyRequest.STATUS_CHOICES).keys():
-            requests = requests.filter(status=status_filter)
-        # Support borrowed/returned pseudo-statuses which are derived from BorrowedItem
-        elif status_filter in ['borrowed', 'returned']:
-            # Build an Exists subquery to find BorrowedItem matching the request's supply and user
-            borrowed_qs = BorrowedItem.objects.filter(
-                supply=OuterRef('supply'),
-                borrower=OuterRef('user')
-            )
-            if status_filter == 'borrowed':
-                borrowed_qs = borrowed_qs.filter(returned_at__isnull=True)
-            else:
-                borrowed_qs = borrowed_qs.filter(returned_at__isnull=False)
-
-            requests = requests.filter(Exists(borrowed_qs), purpose__startswith='[BORROWING]')
-        else:
-            # Unrecognized status - no results
-            requests = requests.none()
-    
-    # Create the HttpResponse object with CSV header
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="requests_report.csv"'
-    
-    # Create a CSV writer
-    writer = csv.writer(response)
-    
-    # Write the header row
-    writer.writerow([
-        'Request ID', 'User', 'Supply', 'Quantity Requested', 
-        'Purpose', 'Status', 'Approved By', 'Approved At', 
-        'Released By', 'Released At', 'Created At', 'Updated At'
-    ])
-    
-    # Write data rows
-    for req in requests:
-        writer.writerow([
-            req.request_id,
-            req.user.username,
-            req.supply.name,
-            req.quantity_requested,
-            req.purpose,
-            req.status,
-            req.approved_by.username if req.approved_by else '',
-            req.approved_at.strftime('%Y-%m-%d %H:%M:%S') if req.approved_at else '',
-            req.released_by.username if req.released_by else '',
-            req.released_at.strftime('%Y-%m-%d %H:%M:%S') if req.released_at else '',
-            req.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            req.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    return response
+    columns, rows = report_table('requests', request.GET)
+    return tabular_export(request, 'requests_report', columns, rows)
 
 @login_required
 def export_transactions_csv(request):
-    """Export inventory transactions to CSV format with filters"""
+    """Export inventory transactions as streamed CSV/NDJSON (optionally gzipped) with filters"""
     if request.user.role not in ['admin', 'gso_staff']:
         messages.error(request, 'You do not have permission to export reports.')
         return redirect('dashboard')
     
-    # Get filter parameters
-    search_query = request.GET.get('search', '')
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    
-    # Start with all transactions
-    transactions = InventoryTransaction.objects.select_related('supply', 'performed_by').all()
-    
-    # Apply search filter
-    if search_query:
-        transactions = transactions.filter(
-            Q(supply__name__icontains=search_query) |
-            Q(reason__icontains=search_query) |
-            Q(performed_by__username__icontains=search_query)
-        )
-    
-    # Apply date filters
-    if date_from:
-        try:
-            from datetime import datetime
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-            transactions = transactions.filter(created_at__gte=date_from_obj)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            from datetime import datetime
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
-            from datetime import timedelta
-            date_to_obj = date_to_obj + timedelta(days=1)
-            transactions = transactions.filter(created_at__lt=date_to_obj)
-        except ValueError:
-            pass
-    
-    # Create the HttpResponse object with CSV header
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="transactions_report.csv"'
-    
-    # Create a CSV writer
-    writer = csv.writer(response)
-    
-    # Write the header row
-    writer.writerow([
-        'ID', 'Supply', 'Transaction Type', 'Quantity', 
-        'Previous Quantity', 'New Quantity', 'Reason', 
-        'Performed By', 'Created At'
-    ])
-    
-    # Write data rows
-    for transaction in transactions:
-        writer.writerow([
-            transaction.id,
-            transaction.supply.name,
-            transaction.transaction_type,
-            transaction.quantity,
-            transaction.previous_quantity,
-            transaction.new_quantity,
-            transaction.reason,
-            transaction.performed_by.username,
-            transaction.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    return response
+    columns, rows = report_table('transactions', request.GET)
+    return tabular_export(request, 'transactions_report', columns, rows)
 
 @login_required
 @require_http_methods(['POST'])
@@ -1840,24 +1666,18 @@ def generate_qr_codes_bulk(request):
         messages.error(request, 'No supplies selected for QR code generation.')
         return redirect('supply_list')
     
-    generated_count = 0
-    failed_count = 0
-    
-    for supply_id in supply_ids:
-        try:
-            supply = Supply.objects.get(pk=supply_id)
-            if not supply.qr_code:
-                supply.generate_qr_code()
-                generated_count += 1
-        except Supply.DoesNotExist:
-            failed_count += 1
-        except Exception as e:
-            failed_count += 1
+    # Only supplies that exist and still lack a QR code need rendering
+    pending_ids = list(
+        Supply.objects.filter(pk__in=[sid for sid in supply_ids if sid.isdigit()])
+        .filter(Q(qr_code='') | Q(qr_code__isnull=True))
+        .values_list('pk', flat=True)
+    )
     
-    if generated_count > 0:
-        messages.success(request, f'Successfully generated QR codes for {generated_count} supply item(s).')
-    if failed_count > 0:
-        messages.error(request, f'Failed to generate QR codes for {failed_count} supply item(s).')
+    if pending_ids:
+        queue_supply_qr_bulk(pending_ids)
+        messages.success(request, f'QR code generation queued for {len(pending_ids)} supply item(s). They will appear shortly.')
+    else:
+        messages.info(request, 'All selected supply items already have QR codes.')
     
     # Redirect back to the referring page or supply list
     next_url = request.GET.get('next') or request.META.get('HTTP_REFERER')
@@ -1915,38 +1735,36 @@ def bulk_delete_supplies(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': f'Error deleting supplies: {str(e)}'})
 
+def supply_qr_etag(request, pk):
+    updated_at = Supply.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    return _version_etag('supply-qr', pk, updated_at) if updated_at else None
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=supply_qr_etag)
 def get_qr_code(request, pk):
     """Get QR code for a supply item (AJAX endpoint)"""
     supply = get_object_or_404(Supply, pk=pk)
     
-    # Generate QR code if it doesn't exist
-    if not supply.qr_code:
-        try:
-            supply.generate_qr_code()
-        except Exception as e:
-            return JsonResponse({'success': False, 'error': f'Failed to generate QR code: {str(e)}'})
-    
-    # Make sure we return the QR code URL even if it already existed
-    if supply.qr_code:
-        return JsonResponse({
-            'success': True,
-            'qr_url': supply.qr_code.url,
-            'supply_name': supply.name,
-            'supply_id': supply.id
-        })
-    else:
-        return JsonResponse({'success': False, 'error': 'QR code not available'})
+    # The image is rendered on demand by the qr_image endpoint
+    return JsonResponse({
+        'success': True,
+        'qr_url': qr_image_url(supply),
+        'supply_name': supply.name,
+        'supply_id': supply.id
+    })
 
 def landing_page(request):
     """Landing page for non-authenticated users"""
     if request.user.is_authenticated:
         return redirect('dashboard')
     
-    # Get real statistics from the database
-    total_supplies = Supply.objects.count()
-    total_requests = SupplyRequest.objects.count()
-    active_users = User.objects.count()
+    # Get real statistics from the database, counted again only after a write
+    total_supplies, total_requests, active_users = cached_for_tables(
+        'landing-stats', (Supply, SupplyRequest, User), (),
+        lambda: (Supply.objects.count(), SupplyRequest.objects.count(), User.objects.count())
+    )
     
     # Calculate satisfaction rate (simulated)
     satisfaction_rate = 98 if total_requests > 0 else 0
@@ -1967,111 +1785,7 @@ def export_supplies_pdf(request):
         messages.error(request, 'You do not have permission to export reports.')
         return redirect('dashboard')
     
-    # Get filter parameters
-    search_query = request.GET.get('search', '')
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    
-    # Start with all supplies
-    supplies = Supply.objects.select_related('category').all()
-    
-    # Apply search filter
-    if search_query:
-        supplies = supplies.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__name__icontains=search_query)
-        )
-    
-    # Apply date filters
-    if date_from:
-        try:
-            from datetime import datetime
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-            supplies = supplies.filter(created_at__gte=date_from_obj)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            from datetime import datetime
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
-            from datetime import timedelta
-            date_to_obj = date_to_obj + timedelta(days=1)
-            supplies = supplies.filter(created_at__lt=date_to_obj)
-        except ValueError:
-            pass
-    
-    # Create the HttpResponse object with PDF header
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="supplies_report.pdf"'
-    
-    # Create a PDF document
-    doc = SimpleDocTemplate(response, pagesize=A4)
-    elements = []
-    
-    # Sample stylesheet
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1  # Center alignment
-    )
-    
-    # Title
-    title = Paragraph("Supplies Report", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Add filter info
-    if search_query or date_from or date_to:
-        filter_text = "Filters Applied: "
-        filters = []
-        if search_query:
-            filters.append(f"Search: {search_query}")
-        if date_from:
-            filters.append(f"From: {date_from}")
-        if date_to:
-            filters.append(f"To: {date_to}")
-        filter_text += " | ".join(filters)
-        elements.append(Paragraph(filter_text, styles['Normal']))
-        elements.append(Spacer(1, 0.2*inch))
-    
-    # Table data
-    data = [['ID', 'Name', 'Category', 'Quantity', 'Min Stock', 'Unit', 'Location']]
-    for supply in supplies:
-        data.append([
-            str(supply.id),
-            supply.name,
-            supply.category.name if supply.category else '',
-            str(supply.quantity),
-            str(supply.min_stock_level),
-            supply.unit,
-            supply.location
-        ])
-    
-    # Create table
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table)
-    
-    # Build PDF
-    doc.build(elements)
-    
-    return response
+    return report_pdf('supplies', request.GET).response('supplies_report.pdf')
 
 @login_required
 def export_requests_pdf(request):
@@ -2080,117 +1794,7 @@ def export_requests_pdf(request):
         messages.error(request, 'You do not have permission to export reports.')
         return redirect('dashboard')
     
-    # Get filter parameters
-    search_query = request.GET.get('search', '')
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    status_filter = request.GET.get('status', '')
-    
-    # Start with all requests
-    requests = SupplyRequest.objects.select_related('user', 'supply').all()
-    
-    # Apply search filter
-    if search_query:
-        requests = requests.filter(
-            Q(request_id__icontains=search_query) |
-            Q(supply__name__icontains=search_query) |
-            Q(user__username__icontains=search_query)
-        )
-    
-    # Apply date filters
-    if date_from:
-        try:
-            from datetime import datetime
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-            requests = requests.filter(created_at__gte=date_from_obj)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            from datetime import datetime
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
-            from datetime import timedelta
-            date_to_obj = date_to_obj + timedelta(days=1)
-            requests = requests.filter(created_at__lt=date_to_obj)
-        except ValueError:
-            pass
-    
-    # Apply status filter
-    if status_filter:
-        requests = requests.filter(status=status_filter)
-    
-    # Create the HttpResponse object with PDF header
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="requests_report.pdf"'
-    
-    # Create a PDF document
-    doc = SimpleDocTemplate(response, pagesize=A4)
-    elements = []
-    
-    # Sample stylesheet
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1  # Center alignment
-    )
-    
-    # Title
-    title = Paragraph("Supply Requests Report", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Add filter info
-    if search_query or date_from or date_to or status_filter:
-        filter_text = "Filters Applied: "
-        filters = []
-        if search_query:
-            filters.append(f"Search: {search_query}")
-        if date_from:
-            filters.append(f"From: {date_from}")
-        if date_to:
-            filters.append(f"To: {date_to}")
-        if status_filter:
-            filters.append(f"Status: {status_filter}")
-        filter_text += " | ".join(filters)
-        elements.append(Paragraph(filter_text, styles['Normal']))
-        elements.append(Spacer(1, 0.2*inch))
-    
-    # Table data
-    data = [['Request ID', 'User', 'Supply', 'Quantity', 'Status', 'Created']]
-    for req in requests:
-        data.append([
-            req.request_id,
-            req.user.username,
-            req.supply.name,
-            str(req.quantity_requested),
-            req.status.title(),
-            req.created_at.strftime('%Y-%m-%d')
-        ])
-    
-    # Create table
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table)
-    
-    # Build PDF
-    doc.build(elements)
-    
-    return response
+    return report_pdf('requests', request.GET).response('requests_report.pdf')
 
 @login_required
 def export_transactions_pdf(request):
@@ -2199,111 +1803,7 @@ def export_transactions_pdf(request):
         messages.error(request, 'You do not have permission to export reports.')
         return redirect('dashboard')
     
-    # Get filter parameters
-    search_query = request.GET.get('search', '')
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    
-    # Start with all transactions
-    transactions = InventoryTransaction.objects.select_related('supply', 'performed_by').all()
-    
-    # Apply search filter
-    if search_query:
-        transactions = transactions.filter(
-            Q(supply__name__icontains=search_query) |
-            Q(reason__icontains=search_query) |
-            Q(performed_by__username__icontains=search_query)
-        )
-    
-    # Apply date filters
-    if date_from:
-        try:
-            from datetime import datetime
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-            transactions = transactions.filter(created_at__gte=date_from_obj)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            from datetime import datetime
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
-            from datetime import timedelta
-            date_to_obj = date_to_obj + timedelta(days=1)
-            transactions = transactions.filter(created_at__lt=date_to_obj)
-        except ValueError:
-            pass
-    
-    # Create the HttpResponse object with PDF header
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="transactions_report.pdf"'
-    
-    # Create a PDF document
-    doc = SimpleDocTemplate(response, pagesize=A4)
-    elements = []
-    
-    # Sample stylesheet
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1  # Center alignment
-    )
-    
-    # Title
-    title = Paragraph("Inventory Transactions Report", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Add filter info
-    if search_query or date_from or date_to:
-        filter_text = "Filters Applied: "
-        filters = []
-        if search_query:
-            filters.append(f"Search: {search_query}")
-        if date_from:
-            filters.append(f"From: {date_from}")
-        if date_to:
-            filters.append(f"To: {date_to}")
-        filter_text += " | ".join(filters)
-        elements.append(Paragraph(filter_text, styles['Normal']))
-        elements.append(Spacer(1, 0.2*inch))
-    
-    # Table data
-    data = [['Supply', 'Type', 'Quantity', 'Previous', 'New', 'Performed By', 'Date']]
-    for transaction in transactions:
-        data.append([
-            transaction.supply.name,
-            transaction.transaction_type.title(),
-            str(transaction.quantity),
-            str(transaction.previous_quantity),
-            str(transaction.new_quantity),
-            transaction.performed_by.username,
-            transaction.created_at.strftime('%Y-%m-%d')
-        ])
-    
-    # Create table
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table)
-    
-    # Build PDF
-    doc.build(elements)
-    
-    return response
+    return report_pdf('transactions', request.GET).response('transactions_report.pdf')
 
 @login_required
 def user_management(request):
@@ -2636,17 +2136,19 @@ def approve_borrow_request(request, pk):
                 created_at__minute=supply_request.created_at.minute
             )
             
-            synchronized_count = batch_qs.filter(status='pending').exclude(pk=supply_request.pk).update(
+            pending = list(batch_qs.filter(status='pending').exclude(pk=supply_request.pk))
+            synchronized_count = SupplyRequest.objects.filter(pk__in=[r.pk for r in pending], status='pending').update(
                 status='approved',
                 approved_by=request.user,
                 approved_at=now
             )
+            track_bulk_approvals(pending)
+            bump_table_versions(SupplyRequest)
             
             # Proactively generate/sync batch QR code
             if batch_qs.count() > 1:
                 group_id = f"{supply_request.user.id}-{supply_request.created_at.strftime('%Y%m%d%H%M')}"
-                supply_request.generate_borrowing_qr_code(group_id=group_id)
-                batch_qs.update(borrowing_qr_code=supply_request.borrowing_qr_code.name)
+                queue_request_qr(supply_request, group_id=group_id, batch_ids=batch_qs.values_list('pk', flat=True))
             
             if synchronized_count > 0:
                 messages.success(request, f'Batch approved successfully. {synchronized_count + 1} items are now ready for release.')
@@ -2674,7 +2176,7 @@ def approve_borrow_request(request, pk):
                 supply_request.save()
 
                 # Also synchronize approval for other pending items in the same batch
-                SupplyRequest.objects.filter(
+                pending = list(SupplyRequest.objects.filter(
                     user=supply_request.user,
                     status='pending',
                     created_at__year=supply_request.created_at.year,
@@ -2682,11 +2184,14 @@ def approve_borrow_request(request, pk):
                     created_at__day=supply_request.created_at.day,
                     created_at__hour=supply_request.created_at.hour,
                     created_at__minute=supply_request.created_at.minute
-                ).update(
+                ))
+                SupplyRequest.objects.filter(pk__in=[r.pk for r in pending], status='pending').update(
                     status='approved',
                     approved_by=request.user,
                     approved_at=now
                 )
+                track_bulk_approvals(pending)
+                bump_table_versions(SupplyRequest)
 
                 # Update supply quantity
                 previous_quantity = supply_request.supply.quantity
@@ -2770,7 +2275,7 @@ def request_borrow_item(request):
                 supply_request.save()
 
                 # Generate borrowing QR code
-                supply_request.generate_borrowing_qr_code()
+                queue_request_qr(supply_request)
 
                 messages.success(
                     request,
@@ -2782,32 +2287,9 @@ def request_borrow_item(request):
     else:
         form = BorrowRequestForm()
     
-    # Prepare supplies data for the template - only non-consumable items with stock
-    # Separate into equipment and materials
-    equipment_supplies = []
-    material_supplies = []
-    
-    for s in Supply.objects.filter(quantity__gt=0, is_consumable=False).order_by('name'):
-        supply_data = {
-            'id': s.pk,
-            'name': s.name,
-            'stock': s.quantity,
-            'unit': s.unit or 'pieces',
-            'category': s.category.name,
-            'location': s.location,
-            'is_consumable': False
-        }
-        
-        if s.category.is_material:
-            material_supplies.append(supply_data)
-        else:
-            equipment_supplies.append(supply_data)
-    
+    # The item picker is built from the form's queryset (category joined in)
     context = {
         'form': form,
-        'equipment_supplies_json': json.dumps(equipment_supplies),
-        'material_supplies_json': json.dumps(material_supplies),
-        'non_consumable_supplies': json.dumps(equipment_supplies + material_supplies),
         'can_borrow': not has_overdues,
         'overdue_items': overdue_items,
     }
@@ -2875,15 +2357,13 @@ def request_borrow_batch(request):
                     
                     if first_request:
                         # Generate ONE borrowing QR code for the first request in the batch
-                        # with the group_id so scanning it finds all items.
-                        first_request.generate_borrowing_qr_code(group_id=group_id)
-                        
-                        # Apply the same QR code to all other requests in the batch
-                        if len(batch_requests) > 1:
-                            qr_code_file = first_request.borrowing_qr_code
-                            for req in batch_requests[1:]:
-                                req.borrowing_qr_code = qr_code_file
-                                req.save()
+                        # with the group_id so scanning it finds all items, and apply
+                        # the same QR code to all other requests in the batch.
+                        queue_request_qr(
+                            first_request,
+                            group_id=group_id,
+                            batch_ids=[req.pk for req in batch_requests]
+                        )
                     
                     messages.success(
                         request,
@@ -2893,29 +2373,9 @@ def request_borrow_batch(request):
                 except ValueError as e:
                     messages.error(request, f'Error creating borrow request: {str(e)}')
     
-    # Prepare supplies data for the template - only non-consumable items with stock
-    equipment_supplies = []
-    material_supplies = []
-    
-    for s in Supply.objects.filter(quantity__gt=0, is_consumable=False).order_by('name'):
-        supply_data = {
-            'id': s.pk,
-            'name': s.name,
-            'stock': s.quantity,
-            'unit': s.unit or 'pieces',
-            'category': s.category.name,
-            'location': s.location,
-            'is_consumable': False
-        }
-        
-        if s.category.is_material:
-            material_supplies.append(supply_data)
-        else:
-            equipment_supplies.append(supply_data)
-    
+    # Equipment and materials are fetched by the page from the shared catalog snapshot
     context = {
-        'equipment_supplies_json': json.dumps(equipment_supplies),
-        'material_supplies_json': json.dumps(material_supplies),
+        'catalog_url': reverse('supply_catalog', args=[current_catalog()['digest']]),
         'can_borrow': not has_overdues,
         'overdue_items': overdue_items,
     }
@@ -3214,22 +2674,41 @@ def create_category_api(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+def categories_etag(request):
+    stamp = SupplyCategory.objects.aggregate(count=Count('id'), changed=Max('updated_at'))
+    return _version_etag('categories', stamp['count'], stamp['changed'])
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=categories_etag)
 def get_categories_api(request):
     """
     API endpoint to get all supply categories as JSON
     """
     try:
-        categories = SupplyCategory.objects.all().order_by('name').values('id', 'name')
+        categories = cached_for_tables(
+            'categories-api', (SupplyCategory,), (),
+            lambda: list(SupplyCategory.objects.all().order_by('name').values('id', 'name'))
+        )
         return JsonResponse({
             'success': True,
-            'categories': list(categories)
+            'categories': categories
         })
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+def category_supplies_etag(request, pk):
+    stamp = SupplyCategory.objects.filter(pk=pk).annotate(
+        count=Count('supplies'), changed=Max('supplies__updated_at')
+    ).values_list('updated_at', 'count', 'changed').first()
+    return _version_etag('category-supplies', pk, *stamp) if stamp else None
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=category_supplies_etag)
 def get_category_supplies_api(request, pk):
     """
     Return JSON list of supplies in a given category.
@@ -3251,12 +2730,62 @@ def get_category_supplies_api(request, pk):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+
+AUTOCOMPLETE_PAGE_SIZE = 20
+
+
+@login_required
+@require_http_methods(["GET"])
+def supply_autocomplete(request):
+    """
+    Supplies of a picker ``scope`` whose name starts with ``q`` (ignoring
+    case), in name order, AUTOCOMPLETE_PAGE_SIZE at a time. The prefix is a
+    range on the lower-cased name index, and further pages continue after
+    the last supply shown (``after``) rather than skipping rows, so each page
+    reads only the index entries it returns.
+    """
+    scope = request.GET.get('scope', 'all')
+    if scope not in SUPPLY_SCOPES:
+        return JsonResponse({'success': False, 'error': 'Unknown scope'}, status=400)
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    supplies = supply_scope_queryset(scope).only(
+        'id', 'name', 'quantity', 'unit', 'min_stock_level', 'location', 'is_consumable',
+        'category__name', 'category__is_material'
+    ).annotate(name_key=Lower('name')).order_by('name_key', 'pk')
+    query = request.GET.get('q', '').strip().lower()
+    if query:
+        # Every key starting with the prefix sorts between it and prefix + the highest code point
+        supplies = supplies.filter(name_key__gte=query, name_key__lt=query + '\U0010ffff')
+
+    after = request.GET.get('after', '')
+    if after.isdigit():
+        # Continue after the last supply of the previous page
+        last_key = Supply.objects.filter(pk=after).values_list(Lower('name'), flat=True).first()
+        if last_key is not None:
+            supplies = supplies.filter(Q(name_key__gt=last_key) | Q(name_key=last_key, pk__gt=after))
+
+    # One extra row tells whether another page follows
+    rows = list(supplies[:AUTOCOMPLETE_PAGE_SIZE + 1])
+    shown = rows[:AUTOCOMPLETE_PAGE_SIZE]
+    return JsonResponse({
+        'success': True,
+        'results': [supply_option_data(supply) for supply in shown],
+        'page': page,
+        'has_more': len(rows) > AUTOCOMPLETE_PAGE_SIZE,
+        'after': shown[-1].pk if shown else None,
+    })
+
 @login_required
 @require_http_methods(["POST"])
 def get_supply_suggestions(request):
     """
     API endpoint to get AI-powered supply suggestions using Gemini API.
-    Returns description, category suggestion, and recommended stock level.
+    Returns description, category suggestion, and recommended stock level,
+    plus ``source`` ('ai' or 'heuristic').
     """
     try:
         data = json.loads(request.body)
@@ -3265,99 +2794,9 @@ def get_supply_suggestions(request):
         if not supply_name or len(supply_name) < 2:
             return JsonResponse({'error': 'Supply name too short'}, status=400)
 
-        # If Gemini is available and an API key is configured, use it.
-        api_key = getattr(settings, 'GEMINI_API_KEY', None)
-        if GENAI_AVAILABLE and api_key:
-            try:
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel('gemini-3-pro-preview')
-
-                prompt = f"""You are a supply management assistant. Analyze this supply item: "{supply_name}"
-
-Provide ONLY a JSON response (no other text) with these fields:
-- description: 1-2 sentence description of what this item is used for
-- category: Suggest ONE category (Electronics, Office Supplies, Safety Equipment, Furniture, Cleaning, Educational, Other)
-- suggested_quantity: typical stock level (as a number between 10-500)
-- unit: Most appropriate unit of measurement (pieces, boxes, packages, sets, etc)
-
-Respond ONLY with valid JSON."""
-
-                response = model.generate_content(prompt)
-                response_text = response.text.strip()
-
-                # Clean up the response if it has markdown code blocks
-                if response_text.startswith('```'):
-                    response_text = response_text.split('```')[1]
-                    if response_text.startswith('json'):
-                        response_text = response_text[4:]
-                response_text = response_text.strip()
-
-                result = json.loads(response_text)
-
-                return JsonResponse({
-                    'success': True,
-                    'description': result.get('description', ''),
-                    'category': result.get('category', ''),
-                    'suggested_quantity': result.get('suggested_quantity', 50),
-                    'unit': result.get('unit', 'pieces')
-                })
-            except json.JSONDecodeError as e:
-                return JsonResponse({'error': f'Invalid JSON response from API: {str(e)}'}, status=500)
-            except Exception as e:
-                # If the external API call fails, fall through to a local heuristic fallback
-                print(f"[WARNING] Gemini API call failed: {type(e).__name__}: {e}")
-
-        # Fallback heuristics when Gemini or API key is not available
-        name_lower = supply_name.lower()
-        suggested_quantity = 50
-        unit = 'pieces'
-        category = 'Other'
-
-        office_keywords = ['pen', 'paper', 'notebook', 'stapler', 'marker', 'scissors', 'envelope']
-        electronics_keywords = ['battery', 'charger', 'adapter', 'cable', 'mouse', 'keyboard', 'monitor']
-        safety_keywords = ['glove', 'mask', 'helmet', 'goggles']
-        cleaning_keywords = ['detergent', 'soap', 'mop', 'broom', 'disinfectant', 'cleaner']
-        furniture_keywords = ['chair', 'table', 'desk', 'cabinet']
-        educational_keywords = ['projector', 'marker', 'whiteboard', 'chalk']
-
-        if any(k in name_lower for k in office_keywords):
-            category = 'Office Supplies'
-            suggested_quantity = 100
-            unit = 'pieces'
-        elif any(k in name_lower for k in electronics_keywords):
-            category = 'Electronics'
-            suggested_quantity = 20
-            unit = 'pieces'
-        elif any(k in name_lower for k in safety_keywords):
-            category = 'Safety Equipment'
-            suggested_quantity = 50
-            unit = 'pieces'
-        elif any(k in name_lower for k in cleaning_keywords):
-            category = 'Cleaning'
-            suggested_quantity = 30
-            unit = 'bottles'
-        elif any(k in name_lower for k in furniture_keywords):
-            category = 'Furniture'
-            suggested_quantity = 10
-            unit = 'sets'
-        elif any(k in name_lower for k in educational_keywords):
-            category = 'Educational'
-            suggested_quantity = 15
-            unit = 'pieces'
-        else:
-            # Default fallback: try to infer plurality
-            if supply_name.endswith('s'):
-                unit = 'pieces'
-
-        description = f"{supply_name} is a common item used for general {category.lower()} needs." if category != 'Other' else f"{supply_name} is a commonly stocked supply item."
-
-        return JsonResponse({
-            'success': True,
-            'description': description,
-            'category': category,
-            'suggested_quantity': suggested_quantity,
-            'unit': unit
-        })
+        # Cached, coalesced and time-bounded; falls back to keyword heuristics
+        suggestion = get_suggestion_service().suggest(supply_name)
+        return JsonResponse({'success': True, **suggestion})
     except json.JSONDecodeError as e:
         return JsonResponse({'error': f'Invalid JSON in request body: {str(e)}'}, status=400)
     except Exception as e:
@@ -3487,17 +2926,15 @@ def bulk_request_create(request):
             if first_request:
                 if len(batch_requests) == 1:
                     # Treat as a single request if only one item was selected
-                    first_request.generate_borrowing_qr_code()
+                    queue_request_qr(first_request)
                     messages.success(request, f'Request {first_request.request_id} created successfully.')
                 else:
-                    # Generate ONE QR code for the batch
-                    first_request.generate_borrowing_qr_code(group_id=group_id)
-                    
-                    # Apply same QR code to all items in batch
-                    qr_file = first_request.borrowing_qr_code.name
-                    for req in batch_requests[1:]:
-                        req.borrowing_qr_code = qr_file
-                        req.save()
+                    # Generate ONE QR code for the batch and apply it to all items
+                    queue_request_qr(
+                        first_request,
+                        group_id=group_id,
+                        batch_ids=[req.pk for req in batch_requests]
+                    )
                     messages.success(request, f'Batch of {len(batch_requests)} requests created successfully.')
                 
                 return redirect('request_detail', pk=first_request.pk)
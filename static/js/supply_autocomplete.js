@@ -0,0 +1,141 @@
+// Supply pickers (SupplyAutocomplete widget): the server renders a <select>
+// holding only the chosen supply; this swaps in a search box that fetches
+// matching supplies a page at a time. Pages can narrow the search by setting
+// select.dataset.scope and read the chosen supply from option.dataset.item.
+(function () {
+    const SEARCH_DELAY_MS = 200;
+
+    function initSupplyAutocomplete(select) {
+        if (select.dataset.autocompleteReady) return;
+        select.dataset.autocompleteReady = '1';
+
+        const wrapper = document.createElement('div');
+        wrapper.className = 'relative';
+        const input = document.createElement('input');
+        input.type = 'text';
+        input.id = select.id + '-search';
+        input.autocomplete = 'off';
+        input.className = 'form-input block w-full px-4 py-2 border border-gray-300 rounded-lg';
+        input.placeholder = select.dataset.placeholder || '';
+        // The hidden select can't show a validation message; the search box does
+        input.required = select.required;
+        select.required = false;
+        const results = document.createElement('div');
+        results.className = 'absolute z-20 w-full mt-1 bg-white border border-gray-200 rounded-lg shadow-lg max-h-64 overflow-y-auto hidden';
+
+        select.parentNode.insertBefore(wrapper, select);
+        wrapper.appendChild(input);
+        wrapper.appendChild(results);
+        wrapper.appendChild(select);
+        select.classList.add('hidden');
+        const label = document.querySelector('label[for="' + select.id + '"]');
+        if (label) label.htmlFor = input.id;
+
+        const chosen = select.selectedOptions[0];
+        if (chosen && chosen.value) {
+            input.value = chosen.dataset.item ? JSON.parse(chosen.dataset.item).name : chosen.textContent.trim();
+        }
+
+        let timer = null;
+        let latestRequest = 0;
+        let term = '';
+
+        function searchUrl(page, after) {
+            const url = new URL(select.dataset.autocompleteUrl, window.location.origin);
+            if (select.dataset.scope) url.searchParams.set('scope', select.dataset.scope);
+            url.searchParams.set('q', term);
+            url.searchParams.set('page', page);
+            // Later pages continue after the last supply shown
+            if (after) url.searchParams.set('after', after);
+            return url;
+        }
+
+        function load(page, after) {
+            const requestNumber = ++latestRequest;
+            fetch(searchUrl(page, after), { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+                .then(response => response.json())
+                .then(data => {
+                    // Answers to superseded searches are dropped
+                    if (requestNumber === latestRequest && data.success) render(data);
+                });
+        }
+
+        function render(data) {
+            if (data.page === 1) results.innerHTML = '';
+            const more = results.querySelector('[data-more]');
+            if (more) more.remove();
+
+            if (data.page === 1 && data.results.length === 0) {
+                const empty = document.createElement('div');
+                empty.className = 'px-4 py-2 text-sm text-gray-500';
+                empty.textContent = 'No matching supplies';
+                results.appendChild(empty);
+            }
+            data.results.forEach(item => {
+                const option = document.createElement('button');
+                option.type = 'button';
+                option.className = 'block w-full text-left px-4 py-2 text-sm hover:bg-indigo-50';
+                option.textContent = item.label;
+                option.addEventListener('click', () => choose(item));
+                results.appendChild(option);
+            });
+            if (data.has_more) {
+                const next = document.createElement('button');
+                next.type = 'button';
+                next.dataset.more = '1';
+                next.className = 'block w-full text-center px-4 py-2 text-sm text-indigo-600 hover:bg-indigo-50';
+                next.textContent = 'Show more';
+                next.addEventListener('click', () => load(data.page + 1, data.after));
+                results.appendChild(next);
+            }
+            results.classList.remove('hidden');
+        }
+
+        function setOption(value, text, item) {
+            select.innerHTML = '';
+            const option = new Option(text, value, true, true);
+            if (item) option.dataset.item = JSON.stringify(item);
+            select.appendChild(option);
+            select.dispatchEvent(new Event('change', { bubbles: true }));
+        }
+
+        function choose(item) {
+            input.value = item.name;
+            results.classList.add('hidden');
+            setOption(item.id, item.label, item);
+        }
+
+        function clear() {
+            input.value = '';
+            term = '';
+            results.innerHTML = '';
+            results.classList.add('hidden');
+            setOption('', '', null);
+        }
+
+        input.addEventListener('input', function () {
+            // Typing drops the previous choice
+            if (select.value) setOption('', '', null);
+            term = input.value.trim();
+            clearTimeout(timer);
+            timer = setTimeout(() => load(1), SEARCH_DELAY_MS);
+        });
+        input.addEventListener('focus', function () {
+            if (results.children.length) {
+                results.classList.remove('hidden');
+            } else {
+                term = input.value.trim();
+                load(1);
+            }
+        });
+        document.addEventListener('click', function (event) {
+            if (!wrapper.contains(event.target)) results.classList.add('hidden');
+        });
+
+        select.supplyAutocomplete = { clear: clear };
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-autocomplete-url]').forEach(initSupplyAutocomplete);
+    });
+})();
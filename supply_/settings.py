@@ -135,6 +135,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Media files (user uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Media is served through Django's permission checks. Once allowed, hand the
+# file to the front server: 'nginx' (X-Accel-Redirect to MEDIA_ACCEL_PREFIX,
+# an internal location aliasing MEDIA_ROOT), 'sendfile' (X-Sendfile for
+# Apache/lighttpd) or empty to stream it from Django
+MEDIA_ACCEL = os.getenv('MEDIA_ACCEL', '')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -150,4 +156,80 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
 # Gemini API Configuration
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
\ No newline at end of file
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+# Supply name suggestions (inventory/suggestions.py)
+# Client class used for model calls; empty = keyword heuristics only
+SUPPLY_SUGGESTION_CLIENT = os.getenv('SUPPLY_SUGGESTION_CLIENT', 'inventory.suggestions.GeminiClient')
+# Similarity (0-1) of an existing supply's name at which its details are
+# suggested without asking the model
+SUPPLY_SUGGESTION_LOCAL_CONFIDENCE = float(os.getenv('SUPPLY_SUGGESTION_LOCAL_CONFIDENCE', '0.75'))
+SUPPLY_SUGGESTION_CACHE_SIZE = int(os.getenv('SUPPLY_SUGGESTION_CACHE_SIZE', '512'))
+SUPPLY_SUGGESTION_CACHE_TTL = int(os.getenv('SUPPLY_SUGGESTION_CACHE_TTL', str(24 * 3600)))
+# Seconds a request waits for the model before answering with the heuristics
+SUPPLY_SUGGESTION_DEADLINE = float(os.getenv('SUPPLY_SUGGESTION_DEADLINE', '3'))
+# Model calls in flight per process; beyond it requests get the heuristics at once
+SUPPLY_SUGGESTION_MAX_CONCURRENCY = int(os.getenv('SUPPLY_SUGGESTION_MAX_CONCURRENCY', '4'))
+# QR code rendering
+# Render QR images in a background thread pool after the request commits
+QR_RENDER_ASYNC = os.getenv('QR_RENDER_ASYNC', 'True') == 'True'
+QR_RENDER_THREADS = int(os.getenv('QR_RENDER_THREADS', '2'))
+# Worker processes for bulk generation (empty = one per CPU, 0 = render in-thread)
+QR_RENDER_PROCESSES = int(os.getenv('QR_RENDER_PROCESSES')) if os.getenv('QR_RENDER_PROCESSES') else None
+# 'numpy' (vectorized, 1-bit PNG) or 'pil'; empty = numpy when installed
+QR_RENDER_BACKEND = os.getenv('QR_RENDER_BACKEND') or None
+# Report export jobs
+# Render exports in a background thread pool; artifacts are reused until the data changes
+EXPORT_JOBS_ASYNC = os.getenv('EXPORT_JOBS_ASYNC', 'True') == 'True'
+EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS', '2'))
+# Seconds a finished export is kept before it is deleted
+EXPORT_ARTIFACT_TTL = int(os.getenv('EXPORT_ARTIFACT_TTL', str(7 * 24 * 3600)))
+# Resumable CSV imports
+# Part files for chunked uploads live here until the import has run
+IMPORT_UPLOAD_DIR = os.getenv('IMPORT_UPLOAD_DIR', os.path.join(BASE_DIR, 'import_uploads'))
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', str(4 * 1024 * 1024)))
+IMPORT_UPLOAD_MAX_SIZE = int(os.getenv('IMPORT_UPLOAD_MAX_SIZE', str(1024 * 1024 * 1024)))
+# Seconds an unfinished upload is kept before it is discarded
+IMPORT_UPLOAD_TTL = int(os.getenv('IMPORT_UPLOAD_TTL', str(24 * 3600)))
+# Uploaded images
+# Strip metadata and build resized WebP/JPEG copies in a background thread pool
+IMAGE_PROCESSING_ASYNC = os.getenv('IMAGE_PROCESSING_ASYNC', 'True') == 'True'
+IMAGE_PROCESSING_THREADS = int(os.getenv('IMAGE_PROCESSING_THREADS', '1'))
+# Originals larger than this (longest side, px) are scaled down
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', '2048'))
+# Analytics counters
+# Buffer committed counter deltas and write them in bulk from a background
+# thread. Deltas buffered by a killed worker are lost until populate_analytics
+ANALYTICS_WRITE_BEHIND = os.getenv('ANALYTICS_WRITE_BEHIND', 'False') == 'True'
+# Seconds deltas are gathered before a buffered write
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv('ANALYTICS_FLUSH_INTERVAL', '1'))
+# Caching
+# Table versions (inventory/table_versions.py) must be shared by every worker
+# for invalidation to reach them: Redis when REDIS_URL is set, otherwise a
+# table in the database (created by migration 0029; after pointing CACHES
+# elsewhere run ``manage.py createcachetable``)
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'inventory_cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+# Seconds a versioned entry is kept; only reclaims space, since a write
+# makes old entries unreachable at once
+VERSIONED_CACHE_TIMEOUT = int(os.getenv('VERSIONED_CACHE_TIMEOUT', str(24 * 3600)))
+# Scanner lookups
+# Answer read-only scans from a shared mmap'd supply index. Deciding whether
+# it is current reads the table versions, a query of its own with the
+# database cache, hence off without REDIS_URL
+CATALOG_INDEX_ENABLED = os.getenv('CATALOG_INDEX_ENABLED', 'True' if REDIS_URL else 'False') == 'True'
+CATALOG_INDEX_ASYNC = os.getenv('CATALOG_INDEX_ASYNC', 'True') == 'True'
+CATALOG_INDEX_PATH = os.getenv('CATALOG_INDEX_PATH', os.path.join(BASE_DIR, 'catalog_index', 'supplies.idx'))
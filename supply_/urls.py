@@ -15,10 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from inventory import media_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 ]
@@ -26,7 +28,11 @@ urlpatterns = [
 from django.urls import include
 urlpatterns += [path('', include('inventory.urls'))] # Main inventory URLs
 
-# Serve media files during development
+# Media files are permission-checked by Django and sent by the front server (see MEDIA_ACCEL)
+urlpatterns += [
+    re_path(rf'^{settings.MEDIA_URL.strip("/")}/(?P<path>.+)$', media_views.protected_media, name='protected_media'),
+]
+
+# Serve static files during development
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file